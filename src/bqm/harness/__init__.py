@@ -1,3 +1,5 @@
+from bqm.harness.async_cradle import AsyncCradle
+from bqm.harness.blob import Blob
 from bqm.harness.commands import Command
 from bqm.harness.conf.config_parser import ConfigParser
 from bqm.harness.cradle import Cradle
@@ -6,6 +8,8 @@ from bqm.harness.file_launcher import FileLauncher
 from bqm.harness.launcher import Launcher, LauncherError
 
 __all__ = [
+    "AsyncCradle",
+    "Blob",
     "Command",
     "ConfigParser",
     "Cradle",
@@ -0,0 +1,195 @@
+import asyncio
+import inspect
+import logging
+import queue
+import signal
+import threading
+from abc import abstractmethod
+from typing import Any, AsyncIterator
+
+from bqm.harness.cradle import Cradle, ProcessHarnessError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCradle(Cradle):
+    """
+    Cradle for asyncio jobs. `async def run()` runs on an event loop the harness creates in
+    the job process:
+
+        class MyJob(AsyncCradle):
+            async def on_config(self, data):
+                await self._client.reconfigure(data)
+
+            async def run(self, *args):
+                async for msg in self.messages():   # or dispatch=True and on_<command> handlers
+                    ...
+
+    A reader thread blocks on the command queue and hands commands to the loop through an
+    asyncio.Queue; they are acked and decoded when the job takes them. With dispatch=True a
+    task on the loop runs the on_<command> handlers one command at a time, alongside the job's
+    own tasks. Handlers and on_shutdown_requested may be sync or async; sync ones run on the
+    loop, so they must not block.
+
+    On SIGTERM run() is cancelled (after on_shutdown_requested) and the process exits with 143.
+    get_msg, next_msg and messages must be called from the loop; wait_msg from any other thread.
+    """
+
+    def __init__(self, exit_on_error: bool = True, dispatch: bool = False):
+        super().__init__(exit_on_error=exit_on_error, dispatch=dispatch)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._commands: asyncio.Queue | None = None
+        self._terminated = False
+        self._shutdown_hook: asyncio.Future | None = None
+        self._main_task: asyncio.Task | None = None
+
+    @abstractmethod
+    async def run(self, *args): ...
+
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        return self._loop
+
+    def get_msg(self) -> dict[str, Any] | None:
+        """
+        non blocking. next command {"id", "cmd", "data"} or None if there is none
+        """
+        try:
+            return self._receive(self._commands.get_nowait())
+        except asyncio.QueueEmpty:
+            return None
+
+    def wait_msg(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """
+        block until a command arrives, from a thread other than the job's loop (e.g. a worker
+        started with asyncio.to_thread): next_msg runs on the loop. None if nothing arrived
+        within timeout seconds (timeout None waits forever)
+        """
+        loop = self._loop
+        if loop is None:
+            raise ProcessHarnessError("wait_msg needs the job's loop. It is only there while run() runs")
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise ProcessHarnessError("wait_msg would block the job's loop. Use await next_msg() on the loop")
+        try:
+            return asyncio.run_coroutine_threadsafe(self.next_msg(timeout), loop).result()
+        except RuntimeError as e:
+            raise ProcessHarnessError(f"The job's loop is gone: {e}")
+
+    async def next_msg(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """
+        wait for the next command. None if nothing arrived within timeout seconds (timeout None waits forever)
+        """
+        while True:
+            try:
+                raw = await asyncio.wait_for(self._commands.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            msg = self._receive(raw)
+            if msg is not None:
+                return msg
+
+    async def messages(self) -> AsyncIterator[dict[str, Any]]:
+        """
+        async iterator over incoming commands:
+            async for msg in self.messages():
+                ...
+        """
+        while True:
+            yield await self.next_msg()
+
+    def _request_shutdown(self, deadline: float | None):
+        if self._shutdown_requested:
+            return
+        self._shutdown_requested = True
+        try:
+            hook = self.on_shutdown_requested(deadline)
+        except Exception as e:
+            logger.error(f"on_shutdown_requested failed: {e}")
+            return
+        if inspect.isawaitable(hook):
+            self._shutdown_hook = asyncio.ensure_future(hook)
+            self._shutdown_hook.add_done_callback(self.__log_hook_error)
+
+    @staticmethod
+    def __log_hook_error(task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"on_shutdown_requested failed: {task.exception()}")
+
+    def __on_sigterm(self, main: asyncio.Task):
+        """
+        second stage of a harness shutdown: run the hook (if STOP did not already) and cancel
+        run() so finally blocks and async context managers still run
+        """
+        self._terminated = True
+        self._request_shutdown(None)
+        if self._shutdown_hook is not None and not self._shutdown_hook.done():
+            self._shutdown_hook.add_done_callback(lambda _: main.cancel())
+        else:
+            main.cancel()
+
+    def _interrupt(self, thread_id: int):
+        """
+        job thread (execution: thread): what SIGTERM does, on the job's loop
+        """
+        if self._loop is not None and self._main_task is not None:
+            self._loop.call_soon_threadsafe(self.__on_sigterm, self._main_task)
+
+    def __read_commands(self, stop: threading.Event):
+        """
+        reader thread: command queue -> asyncio queue. idle cost is a thread blocked on the queue
+        """
+        while not stop.is_set():
+            try:
+                raw = self._command_q.get(block=True, timeout=self.WAIT_POLL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._commands.put_nowait, raw)
+            except RuntimeError:
+                # loop closed
+                return
+
+    async def __dispatch_loop(self):
+        async for msg in self.messages():
+            try:
+                result = self.dispatch(msg)
+                if inspect.isawaitable(result):
+                    result = await result
+                self.reply(msg, result=result)
+            except Exception as e:
+                logger.error(f"Command handler failed for {msg['cmd']}: {e}")
+                self.reply(msg, error=str(e))
+
+    async def __run(self) -> Any:
+        self._loop = asyncio.get_running_loop()
+        self._commands = asyncio.Queue()
+        self._main_task = asyncio.current_task()
+        if threading.current_thread() is threading.main_thread():
+            self._loop.add_signal_handler(signal.SIGTERM, self.__on_sigterm, self._main_task)
+
+        stop = threading.Event()
+        reader = threading.Thread(target=self.__read_commands, args=(stop,), name="cradle-reader", daemon=True)
+        reader.start()
+        dispatcher = asyncio.create_task(self.__dispatch_loop(), name="cradle-dispatcher") if self._dispatch else None
+        try:
+            return await self.run()
+        finally:
+            stop.set()
+            if dispatcher is not None:
+                dispatcher.cancel()
+                await asyncio.gather(dispatcher, return_exceptions=True)
+
+    def _main(self) -> Any:
+        try:
+            return asyncio.run(self.__run())
+        except asyncio.CancelledError:
+            if self._terminated:
+                raise SystemExit(128 + signal.SIGTERM)
+            raise
+        finally:
+            self._loop = None
@@ -4,12 +4,15 @@ from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from starlette.exceptions import HTTPException
 from uvicorn import Config, Server
 
 from bqm.harness.conf.config_parser import ConfigParser
+from bqm.harness.json_response import json_response_class
+from bqm.harness.metrics import RequestMetrics, RequestMetricsMiddleware
+from bqm.harness.msg_factory import MessageFactory
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +21,10 @@ class ServiceInterface(ABC):
     def __init__(self, config: dict[str, Any]):
         logger.setLevel(logging.INFO)
         self._config = ConfigParser(config)
+        # every JSON response (handlers, MessageFactory and the error handlers) is rendered with the harness.json encoder
+        self._response_class = json_response_class(self._config.get_json())
+        MessageFactory.RESPONSE = self._response_class
+        logger.info(f"JSON responses rendered by {self._response_class.__name__}")
 
         @asynccontextmanager
         async def lifespan(app: FastAPI):
@@ -29,20 +36,22 @@ class ServiceInterface(ABC):
             finally:
                 await self.on_shutdown()
 
-        self._app = FastAPI(lifespan=lifespan)
+        self._app = FastAPI(lifespan=lifespan, default_response_class=self._response_class)
+        self._request_metrics = RequestMetrics()
+        self._app.add_middleware(RequestMetricsMiddleware, metrics=self._request_metrics)
         self._register_exception_handlers()
         self._register_routes()
 
     def _start_server(self):
         logger.info("Starting FastAPI server")
-        self._config = Config(
+        self._server_config = Config(
             app=self._app,
             host=self._config.get_iface(),
             port=self._config.get_port(),
             log_level="info",
             loop="asyncio",
         )
-        self._server = Server(self._config)
+        self._server = Server(self._server_config)
         self._server_task = asyncio.create_task(self._server.serve())
         logger.info("FastAPI server started")
 
@@ -55,6 +64,24 @@ class ServiceInterface(ABC):
         self._app.get("/kill")(self._kill)
         self._app.get("/status")(self._status)
         self._app.post("/data")(self._data)
+        self._app.post("/upload")(self._upload)
+        self._app.get("/jobs")(self._list_jobs)
+        self._app.get("/jobs/{job_id}/hb")(self._job_hb)
+        self._app.get("/jobs/{job_id}/start")(self._job_start)
+        self._app.get("/jobs/{job_id}/stop")(self._job_stop)
+        self._app.get("/jobs/{job_id}/pause")(self._job_pause)
+        self._app.get("/jobs/{job_id}/resume")(self._job_resume)
+        self._app.get("/jobs/{job_id}/kill")(self._job_kill)
+        self._app.get("/jobs/{job_id}/status")(self._job_status)
+        self._app.post("/jobs/{job_id}/data")(self._job_data)
+        self._app.post("/jobs/{job_id}/upload")(self._job_upload)
+        self._app.post("/commands")(self._commands)
+        self._app.get("/commands/{ticket_id}")(self._command_ticket)
+        self._app.get("/stream/status")(self._stream_status)
+        self._app.websocket("/ws")(self._ws)
+        self._app.get("/metrics")(self._metrics)
+        self._app.get("/profile/{kind}")(self._profile)
+        self._app.get("/jobs/{job_id}/profile/{kind}")(self._job_profile)
         logger.info(f"registered routes: {self._app.routes}")
 
     def _register_exception_handlers(self):
@@ -79,25 +106,79 @@ class ServiceInterface(ABC):
     @abstractmethod
     async def _data(self, req: Request) -> JSONResponse: ...
 
+    @abstractmethod
+    async def _upload(self, req: Request) -> JSONResponse: ...
+
     @abstractmethod
     async def _status(self, req: Request) -> JSONResponse: ...
 
     @abstractmethod
     async def _kill(self, req: Request) -> JSONResponse: ...
 
+    @abstractmethod
+    async def _list_jobs(self, req: Request) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_hb(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_start(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_stop(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_pause(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_resume(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_data(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_upload(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_status(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _job_kill(self, req: Request, job_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _command_ticket(self, req: Request, ticket_id: str) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _stream_status(self, req: Request) -> StreamingResponse: ...
+
+    @abstractmethod
+    async def _ws(self, ws: WebSocket): ...
+
+    @abstractmethod
+    async def _commands(self, req: Request) -> JSONResponse: ...
+
+    @abstractmethod
+    async def _metrics(self, req: Request) -> Response: ...
+
+    @abstractmethod
+    async def _profile(self, req: Request, kind: str) -> Response: ...
+
+    @abstractmethod
+    async def _job_profile(self, req: Request, job_id: str, kind: str) -> Response: ...
+
     async def _handle_http_exception(self, req: Request, exc: HTTPException) -> JSONResponse:
         if exc.status_code == 404:
-            return JSONResponse(
+            return self._response_class(
                 status_code=404,
                 content={"detail": f"Route not found: {req.url.path}"},
             )
-        return JSONResponse(
+        return self._response_class(
             status_code=exc.status_code,
             content={"detail": exc.detail},
         )
 
     async def _handle_service_exception(self, req: Request, exc: Exception) -> JSONResponse:
-        return JSONResponse(
+        return self._response_class(
             status_code=500,
             content={"detail": f"An internal error occurred: {exc}"},
         )
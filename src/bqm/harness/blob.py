@@ -0,0 +1,177 @@
+import asyncio
+import mmap
+import os
+import tempfile
+from typing import Any, AsyncIterator
+
+
+class BlobError(Exception):
+    pass
+
+
+# tmpfs, i.e. shared memory, where there is one
+DEFAULT_SPOOL_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class BlobSpool:
+    """
+    Harness side of bulk uploads. A request body is streamed chunk by chunk into a spool file
+    (on tmpfs by default, so it is shared memory) and only the file's descriptor
+    {"path", "size", "content-type", "params"} is sent to the job, which maps it.
+
+    The harness removes the file once every job it was sent to has replied, or after `ttl`
+    seconds. A job that mapped the file keeps its mapping after the removal.
+    """
+
+    DEFAULT_TTL = 300.0
+    # chunks are written to the spool file off the event loop, this many bytes at a time
+    WRITE_BATCH = 4 * 1024 * 1024
+
+    def __init__(self, directory: str = DEFAULT_SPOOL_DIR, max_bytes: int | None = None, ttl: float = DEFAULT_TTL):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._pending: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def receive(
+        self,
+        chunks: AsyncIterator[bytes],
+        content_type: str | None = None,
+        params: dict[str, str] | None = None,
+        size_hint: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        spool the chunks into a new file and return its descriptor. raises BlobError past max_bytes.
+        the writes run in the default executor, one batch at a time while the next one is received
+        """
+        if self._max_bytes is not None and size_hint is not None and size_hint > self._max_bytes:
+            raise BlobError(f"Upload of {size_hint} bytes exceeds the limit of {self._max_bytes} bytes")
+
+        loop = asyncio.get_running_loop()
+        fd, path = tempfile.mkstemp(prefix="harness-blob-", dir=self._directory)
+        self._pending.add(path)
+        size = 0
+        try:
+            with open(fd, "wb") as f:
+                batch, batched, writing = [], 0, None
+                try:
+                    async for chunk in chunks:
+                        size += len(chunk)
+                        if self._max_bytes is not None and size > self._max_bytes:
+                            raise BlobError(f"Upload exceeds the limit of {self._max_bytes} bytes")
+                        batch.append(chunk)
+                        batched += len(chunk)
+                        if batched >= BlobSpool.WRITE_BATCH:
+                            if writing is not None:
+                                await writing
+                            writing = loop.run_in_executor(None, f.writelines, batch)
+                            batch, batched = [], 0
+                    if batch:
+                        if writing is not None:
+                            await writing
+                        writing = loop.run_in_executor(None, f.writelines, batch)
+                    if writing is not None:
+                        await writing
+                finally:
+                    # the file is closed on the way out: not while the executor still writes to it
+                    if writing is not None and not writing.done():
+                        await asyncio.wait([writing])
+        except BaseException:
+            self.release(path)
+            raise
+
+        return {"path": path, "size": size, "content-type": content_type, "params": params or {}}
+
+    def release(self, path: str):
+        self._pending.discard(path)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def release_when_done(self, path: str, tickets: list):
+        """
+        remove the spool file once all tickets are finished (or after ttl seconds)
+        """
+
+        async def release():
+            try:
+                await asyncio.gather(*(t.wait(self._ttl) for t in tickets))
+            finally:
+                self.release(path)
+
+        task = asyncio.create_task(release())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        """
+        stop waiting on tickets and remove all spool files still around
+        """
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for path in list(self._pending):
+            self.release(path)
+
+
+class Blob:
+    """
+    Job side view of an uploaded blob. The spool file is mapped read only when the command is
+    received, so the data stays available for as long as the Blob (or any view of it) lives,
+    even after the harness removed the file. Nothing is copied:
+        view = blob.memoryview()
+        arr = blob.numpy(dtype="float64", shape=(-1, 3))
+    """
+
+    def __init__(self, descriptor: dict[str, Any]):
+        self._path = descriptor["path"]
+        self._size = descriptor["size"]
+        self._content_type = descriptor.get("content-type")
+        self._params = descriptor.get("params") or {}
+        self._mmap = None
+        if self._size:
+            with open(self._path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+
+    def size(self) -> int:
+        return self._size
+
+    def content_type(self) -> str | None:
+        return self._content_type
+
+    def params(self) -> dict[str, str]:
+        """
+        query parameters of the upload request
+        """
+        return self._params
+
+    def memoryview(self) -> memoryview:
+        if self._mmap is None:
+            return memoryview(b"")
+        return memoryview(self._mmap)
+
+    def numpy(self, dtype: Any = "uint8", shape: tuple[int, ...] | None = None, offset: int = 0):
+        """
+        read only numpy array over the blob
+        """
+        import numpy as np
+
+        arr = np.frombuffer(self.memoryview(), dtype=dtype, offset=offset)
+        return arr.reshape(shape) if shape is not None else arr
+
+    def close(self):
+        """
+        unmap. fails with BufferError while views returned by memoryview() or numpy() are alive;
+        without close the mapping goes away with the last view
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,152 @@
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any
+
+
+class CheckpointError(Exception):
+    pass
+
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), "harness-checkpoints")
+
+
+def default_checkpoint_dir(port: int | str) -> str:
+    """
+    checkpoint directory of the harness on port when checkpoint.dir is not configured: one per
+    harness on the host, the job ids ("main" for every single-job harness) only name files within it
+    """
+    return os.path.join(DEFAULT_CHECKPOINT_DIR, f"port-{port}")
+
+
+class CheckpointStore:
+    """
+    Latest checkpoint of one job, in a single file under `directory`.
+
+        | magic: 8s | pickle length: u64 | buffer count: u32 | pad: 4 | buffer lengths: u64 ... |
+        | pickle stream | buffer 0 | buffer 1 | ...                      (each section 64 byte aligned)
+
+    Objects are pickled with protocol 5. Large contiguous buffers (numpy arrays, bytearrays,
+    PickleBuffers) are taken out of band and written straight from their memory, one after
+    the other, rather than being copied into the pickle stream. A checkpoint is written to a
+    temporary file and renamed over the previous one, so a reader sees either the old or the
+    new checkpoint, never a partial one.
+
+    Loading maps the file copy-on-write and unpickles the buffers in place: numpy arrays
+    come back as views of the mapping, pages are only read when touched and only copied
+    when written to.
+    """
+
+    MAGIC = b"HCKPT001"
+    HEADER = struct.Struct("<8sQI4x")
+    LENGTH = struct.Struct("<Q")
+    ALIGN = 64
+
+    def __init__(self, directory: str, name: str, fsync: bool = False):
+        """
+        name: file name stem, the job id. fsync: make checkpoints survive power loss too, not
+        just process crashes (slower)
+        """
+        self._directory = directory
+        self._path = os.path.join(directory, f"{name}.ckpt")
+        self._fsync = fsync
+
+    def path(self) -> str:
+        return self._path
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path)
+
+    @staticmethod
+    def __padding(offset: int) -> int:
+        return -offset % CheckpointStore.ALIGN
+
+    def save(self, obj: Any) -> int:
+        """
+        write obj as the latest checkpoint. returns the size of the checkpoint in bytes
+        """
+        buffers: list[pickle.PickleBuffer] = []
+        try:
+            payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+            raws = [b.raw() for b in buffers]
+        except Exception as e:
+            raise CheckpointError(f"Cannot pickle checkpoint: {e}")
+
+        os.makedirs(self._directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=self._directory)
+        try:
+            with open(fd, "wb") as f:
+                header = CheckpointStore.HEADER.pack(CheckpointStore.MAGIC, len(payload), len(raws))
+                header += b"".join(CheckpointStore.LENGTH.pack(raw.nbytes) for raw in raws)
+                offset = 0
+                for section in [header, payload, *raws]:
+                    padding = CheckpointStore.__padding(offset)
+                    if padding:
+                        offset += f.write(b"\0" * padding)
+                    offset += f.write(section)
+                if self._fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            for b in buffers:
+                b.release()
+
+        if self._fsync:
+            dir_fd = os.open(self._directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return offset
+
+    def load(self) -> Any | None:
+        """
+        the latest checkpoint, or None if there is none
+        """
+        try:
+            with open(self._path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < CheckpointStore.HEADER.size:
+                    raise CheckpointError(f"Checkpoint {self._path} is truncated")
+                mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return None
+
+        view = memoryview(mapped)
+        magic, payload_len, count = CheckpointStore.HEADER.unpack_from(view, 0)
+        if magic != CheckpointStore.MAGIC:
+            raise CheckpointError(f"{self._path} is not a checkpoint")
+
+        offset = CheckpointStore.HEADER.size
+        lengths = []
+        for _ in range(count):
+            lengths.append(CheckpointStore.LENGTH.unpack_from(view, offset)[0])
+            offset += CheckpointStore.LENGTH.size
+
+        sections = []
+        for length in [payload_len, *lengths]:
+            offset += CheckpointStore.__padding(offset)
+            if offset + length > size:
+                raise CheckpointError(f"Checkpoint {self._path} is truncated")
+            sections.append(view[offset : offset + length])
+            offset += length
+
+        try:
+            return pickle.loads(sections[0], buffers=sections[1:])
+        except Exception as e:
+            raise CheckpointError(f"Cannot unpickle checkpoint {self._path}: {e}")
+
+    def clear(self):
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
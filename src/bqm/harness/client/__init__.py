@@ -0,0 +1,9 @@
+from bqm.harness.client.fleet import Fleet
+from bqm.harness.client.harness_client import ClientError, HarnessClient, connection_pool
+
+__all__ = [
+    "ClientError",
+    "Fleet",
+    "HarnessClient",
+    "connection_pool",
+]
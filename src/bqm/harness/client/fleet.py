@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from bqm.harness.client.harness_client import ClientError, HarnessClient, connection_pool
+from bqm.harness.client.responses import MetricsFrame, StatusFrame
+
+logger = logging.getLogger(__name__)
+
+
+class Fleet:
+    """
+    Sends the same request to many harnesses in parallel and collects the results, so a
+    fleet wide command takes about one round trip rather than one per harness:
+
+        async with Fleet(["http://h1:2222", "http://h2:2222", ...]) as fleet:
+            results = await fleet.pause(wait=2)
+            failed = {url: e for url, e in results.items() if isinstance(e, ClientError)}
+
+    All harnesses share one connection pool (max_connections in total, kept alive between
+    calls, see connection_pool). concurrency caps the requests in flight; None sends them
+    all at once.
+    Results map each harness url to its response, or to the ClientError it failed with.
+    """
+
+    DEFAULT_MAX_CONNECTIONS = 256
+
+    def __init__(
+        self,
+        urls: list[str],
+        timeout: float = HarnessClient.DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        concurrency: int | None = None,
+        http2: bool = False,
+    ):
+        self._client = connection_pool(timeout=timeout, max_connections=max_connections, http2=http2)
+        self._harnesses = {url.rstrip("/"): HarnessClient(url, client=self._client) for url in urls}
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    def urls(self) -> list[str]:
+        return list(self._harnesses)
+
+    def harness(self, url: str) -> HarnessClient:
+        return self._harnesses[url.rstrip("/")]
+
+    async def __call(self, harness: HarnessClient, call: Callable[[HarnessClient], Awaitable[Any]]) -> Any:
+        try:
+            if self._semaphore is None:
+                return await call(harness)
+            async with self._semaphore:
+                return await call(harness)
+        except ClientError as e:
+            logger.warning(f"Fleet request failed: {e}")
+            return e
+
+    async def map(self, call: Callable[[HarnessClient], Awaitable[Any]]) -> dict[str, Any]:
+        """
+        run call(harness) for every harness in parallel. url -> result or ClientError
+        """
+        results = await asyncio.gather(*(self.__call(h, call) for h in self._harnesses.values()))
+        return dict(zip(self._harnesses, results))
+
+    async def batch(self, commands: list[dict[str, Any]], wait: float | None = None) -> dict[str, Any]:
+        return await self.map(lambda h: h.batch(commands, wait=wait))
+
+    async def hb(self, job: str | None = None) -> dict[str, Any]:
+        return await self.map(lambda h: h.hb(job))
+
+    async def status(self, job: str | None = None) -> dict[str, Any]:
+        return await self.map(lambda h: h.status(job))
+
+    async def start(self, job: str | None = None, wait: float | None = None) -> dict[str, Any]:
+        return await self.batch([{"command": "start", "job": job}], wait=wait)
+
+    async def stop(self, job: str | None = None, wait: float | None = None) -> dict[str, Any]:
+        return await self.batch([{"command": "stop", "job": job}], wait=wait)
+
+    async def pause(self, job: str | None = None, wait: float | None = None) -> dict[str, Any]:
+        return await self.batch([{"command": "pause", "job": job}], wait=wait)
+
+    async def resume(self, job: str | None = None, wait: float | None = None) -> dict[str, Any]:
+        return await self.batch([{"command": "resume", "job": job}], wait=wait)
+
+    async def config(self, data: Any, job: str | None = None, wait: float | None = None) -> dict[str, Any]:
+        return await self.batch([{"command": "config", "job": job, "data": data}], wait=wait)
+
+    async def watch(self, job: str | None = None, types: tuple[str, ...] = ("status",)) -> AsyncIterator[tuple[str, StatusFrame | MetricsFrame]]:
+        """
+        (url, frame) from the status streams of all harnesses, merged, as they arrive.
+        each stream reconnects on its own
+        """
+        frames: asyncio.Queue = asyncio.Queue()
+
+        async def follow(harness: HarnessClient):
+            async for frame in harness.watch(job=job, types=types):
+                await frames.put((harness.url(), frame))
+
+        tasks = [asyncio.create_task(follow(h)) for h in self._harnesses.values()]
+        try:
+            while True:
+                yield await frames.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
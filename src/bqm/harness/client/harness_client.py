@@ -0,0 +1,212 @@
+import asyncio
+import importlib.util
+import json
+import logging
+from typing import Any, AsyncIterator
+
+import httpx
+
+from bqm.harness.client.responses import (
+    BatchResponse,
+    BroadcastResponse,
+    CommandResponse,
+    HbResponse,
+    JobEntry,
+    JobsHbResponse,
+    JobsStatusResponse,
+    MetricsFrame,
+    ShutdownResponse,
+    StatusFrame,
+    StatusResponse,
+    TicketResponse,
+    TicketsResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ClientError(Exception):
+    """
+    a request to a harness failed: connection error, timeout or an error status.
+    status and body are set when the harness answered
+    """
+
+    def __init__(self, url: str, message: str, status: int | None = None, body: Any = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status = status
+        self.body = body
+
+
+def connection_pool(
+    timeout: float = 10.0, max_connections: int = 100, keepalive_expiry: float = 60.0, http2: bool = False
+) -> httpx.AsyncClient:
+    """
+    httpx.AsyncClient keeping up to max_connections connections alive (across all hosts) for
+    keepalive_expiry seconds, to share between HarnessClients. http2 multiplexes the requests
+    to a harness over one connection; it needs the optional h2 package and falls back to
+    HTTP/1.1 without it. The harness itself (uvicorn) speaks HTTP/1.1 only, so http2 is for
+    harnesses behind an HTTP/2 capable proxy
+    """
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 needs the h2 package (the client-http2 extra). Using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections, keepalive_expiry=keepalive_expiry)
+    return httpx.AsyncClient(timeout=timeout, limits=limits, http2=http2)
+
+
+class HarnessClient:
+    """
+    Async client for one harness. Connections are kept alive and pooled by the underlying
+    httpx.AsyncClient, which can be shared between clients (see connection_pool and Fleet):
+
+        async with HarnessClient("http://host:2222") as harness:
+            await harness.pause(wait=2)
+            status = await harness.status()
+            async for frame in harness.watch():
+                ...
+
+    job: address a single job (/jobs/{job}/...); None addresses the root routes.
+    wait: wait up to that many seconds for the job(s) to reply to a command.
+    Responses are the decoded JSON bodies, typed after MessageFactory (see responses);
+    with several jobs the root routes answer with the Jobs* / broadcast shapes.
+    202 (replies still pending) is not an error.
+    """
+
+    DEFAULT_TIMEOUT = 10.0
+    # pause between reconnects of a watch
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, url: str, client: httpx.AsyncClient | None = None, timeout: float = DEFAULT_TIMEOUT, http2: bool = False):
+        self._url = url.rstrip("/")
+        self._owner = client is None
+        self._client = client if client is not None else connection_pool(timeout=timeout, http2=http2)
+
+    def url(self) -> str:
+        return self._url
+
+    def __path(self, route: str, job: str | None) -> str:
+        return f"/jobs/{job}{route}" if job is not None else route
+
+    @staticmethod
+    def __params(wait: float | None) -> dict[str, Any]:
+        return {"wait": wait} if wait is not None else {}
+
+    def __error(self, res: httpx.Response, body: Any) -> ClientError:
+        error = body.get("error", body.get("detail")) if isinstance(body, dict) else body
+        return ClientError(self._url, f"HTTP {res.status_code}: {error}", res.status_code, body)
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        path relative to the harness url. the decoded JSON body, ClientError on failure
+        """
+        try:
+            res = await self._client.request(method, f"{self._url}{path}", **kwargs)
+        except httpx.HTTPError as e:
+            raise ClientError(self._url, f"{type(e).__name__}: {e}")
+        try:
+            body = res.json()
+        except ValueError:
+            body = res.text
+        if res.status_code >= 400:
+            raise self.__error(res, body)
+        return body
+
+    async def hb(self, job: str | None = None) -> HbResponse | JobsHbResponse:
+        return await self.request("GET", self.__path("/hb", job))
+
+    async def status(self, job: str | None = None) -> StatusResponse | JobsStatusResponse:
+        return await self.request("GET", self.__path("/status", job))
+
+    async def jobs(self) -> dict[str, JobEntry]:
+        return await self.request("GET", "/jobs")
+
+    async def start(self, job: str | None = None, wait: float | None = None) -> CommandResponse | TicketResponse | BroadcastResponse | TicketsResponse:
+        return await self.request("GET", self.__path("/start", job), params=HarnessClient.__params(wait))
+
+    async def stop(self, job: str | None = None, wait: float | None = None) -> CommandResponse | TicketResponse | BroadcastResponse | TicketsResponse:
+        return await self.request("GET", self.__path("/stop", job), params=HarnessClient.__params(wait))
+
+    async def pause(self, job: str | None = None, wait: float | None = None) -> CommandResponse | TicketResponse | BroadcastResponse | TicketsResponse:
+        return await self.request("GET", self.__path("/pause", job), params=HarnessClient.__params(wait))
+
+    async def resume(self, job: str | None = None, wait: float | None = None) -> CommandResponse | TicketResponse | BroadcastResponse | TicketsResponse:
+        return await self.request("GET", self.__path("/resume", job), params=HarnessClient.__params(wait))
+
+    async def config(
+        self, data: Any, job: str | None = None, wait: float | None = None
+    ) -> CommandResponse | TicketResponse | BroadcastResponse | TicketsResponse:
+        return await self.request("POST", self.__path("/data", job), json=data, params=HarnessClient.__params(wait))
+
+    async def kill(self, job: str | None = None, now: bool = False) -> ShutdownResponse:
+        return await self.request("GET", self.__path("/kill", job), params={"now": "true"} if now else {})
+
+    async def batch(self, commands: list[dict[str, Any]], wait: float | None = None) -> BatchResponse:
+        """
+        several commands in one request (POST /commands):
+            [{"command": "pause"}, {"command": "config", "job": "a", "data": {...}}]
+        """
+        return await self.request("POST", "/commands", json=commands, params=HarnessClient.__params(wait))
+
+    async def ticket(self, ticket_id: str) -> TicketResponse:
+        return await self.request("GET", f"/commands/{ticket_id}")
+
+    async def __events(self) -> AsyncIterator[dict[str, Any]]:
+        """
+        frames of one /stream/status connection (server sent events). keepalives are skipped
+        """
+        timeout = httpx.Timeout(self._client.timeout.connect, read=None)
+        try:
+            async with self._client.stream("GET", f"{self._url}/stream/status", timeout=timeout) as res:
+                if res.status_code >= 400:
+                    await res.aread()
+                    raise self.__error(res, res.text)
+                data = []
+                async for line in res.aiter_lines():
+                    if line.startswith("data:"):
+                        data.append(line[5:].lstrip())
+                    elif not line and data:
+                        yield json.loads("\n".join(data))
+                        data = []
+        except httpx.HTTPError as e:
+            raise ClientError(self._url, f"{type(e).__name__}: {e}")
+
+    async def watch(
+        self, job: str | None = None, types: tuple[str, ...] = ("status",), reconnect: bool = True
+    ) -> AsyncIterator[StatusFrame | MetricsFrame]:
+        """
+        follow /stream/status: status frames as jobs publish them (add "metrics" to types for the
+        periodic process metrics), of one job or all. one connection, no polling. with reconnect
+        the stream is resumed after the harness restarts or the connection drops; the first
+        frames after a (re)connect are the current status of every job
+        """
+        while True:
+            try:
+                async for frame in self.__events():
+                    if frame.get("type") in types and (job is None or frame.get("job") == job):
+                        yield frame
+            except ClientError as e:
+                if not reconnect:
+                    raise
+                logger.warning(f"Watch interrupted: {e}. Reconnecting in {HarnessClient.RECONNECT_DELAY}s")
+            else:
+                if not reconnect:
+                    return
+            await asyncio.sleep(HarnessClient.RECONNECT_DELAY)
+
+    async def watch_status(self, job: str) -> AsyncIterator[dict[str, Any]]:
+        """
+        the job's status, every time it changes
+        """
+        async for frame in self.watch(job=job):
+            yield frame["status"]
+
+    async def close(self):
+        if self._owner:
+            await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
@@ -0,0 +1,181 @@
+# Shapes of the harness' JSON responses, as built by MessageFactory. They are TypedDicts: the
+# client hands back the decoded JSON as is (no conversion cost per response), the types only
+# document the keys for editors and type checkers.
+
+from typing import Any, Literal, TypedDict
+
+TicketStateName = Literal["SENT", "ACKED", "DONE", "FAILED"]
+
+ProcessState = TypedDict(
+    "ProcessState",
+    {
+        "pid": int | None,
+        "name": str,
+        "status": str,
+        "cpu-pct": float,
+        "mem-rss-mb": float,
+        "threads": int,
+        "open-files": list[Any],
+        "created": float,
+        "sampled-at": float | None,
+        "snapshot-age-s": float | None,
+    },
+    total=False,
+)
+
+
+class HbResponse(TypedDict):
+    status: bool
+    time: str
+    service: dict[str, Any]
+    process: ProcessState
+
+
+class JobHb(TypedDict):
+    status: bool
+    process: ProcessState
+
+
+class JobsHbResponse(TypedDict):
+    status: bool
+    time: str
+    service: dict[str, Any]
+    jobs: dict[str, JobHb]
+
+
+CommandResponse = TypedDict(
+    "CommandResponse",
+    {"status": Literal["SENT"], "command": str, "ticket": str | None, "target-process": int | None, "time": str},
+)
+
+ErrorResponse = TypedDict(
+    "ErrorResponse",
+    {"command": str, "status": Literal["ERROR"], "error": str, "target-process": int | None, "time": str},
+)
+
+
+class Ticket(TypedDict):
+    ticket: str
+    job: str
+    command: str
+    state: TicketStateName
+    result: Any
+    error: str | None
+    issued: float
+    updated: float
+
+
+class TicketResponse(Ticket):
+    time: str
+
+
+class TicketsResponse(TypedDict):
+    command: str
+    jobs: dict[str, Ticket]
+    time: str
+
+
+BroadcastTarget = TypedDict(
+    "BroadcastTarget",
+    {"status": Literal["SENT", "ERROR"], "ticket": str, "error": str, "target-process": int | None},
+    total=False,
+)
+
+
+class BroadcastResponse(TypedDict):
+    status: Literal["SENT", "PARTIAL"]
+    command: str
+    jobs: dict[str, BroadcastTarget]
+    time: str
+
+
+class BatchResult(TypedDict):
+    command: str
+    # a Ticket, or {"state": "ERROR", "error"} for a job which was not alive
+    jobs: dict[str, Ticket | dict[str, Any]]
+
+
+class BatchResponse(TypedDict):
+    command: str
+    results: list[BatchResult]
+    time: str
+
+
+Shutdown = TypedDict(
+    "Shutdown",
+    {
+        "reason": str,
+        "stage": Literal["requested", "stop", "terminate", "kill", "done"],
+        "requested-at": float,
+        "stage-deadline": float | None,
+        "exit-code": int | None,
+    },
+)
+
+
+class ShutdownResponse(TypedDict):
+    command: str
+    jobs: dict[str, Shutdown | None]
+    time: str
+
+
+Restarts = TypedDict("Restarts", {"policy": str, "count": int, "last-exit-code": int | None})
+
+StatusResponse = TypedDict(
+    "StatusResponse",
+    {
+        "process-status": dict[str, Any],
+        "target-process": int | None,
+        "restarts": Restarts,
+        "shutdown": Shutdown | None,
+        "memory-watchdog": dict[str, Any] | None,
+        "metrics": dict[str, Any],
+        "time": str,
+    },
+)
+
+JobStatus = TypedDict(
+    "JobStatus",
+    {
+        "process-status": dict[str, Any],
+        "target-process": int | None,
+        "alive": bool,
+        "restarts": Restarts,
+        "shutdown": Shutdown | None,
+        "memory-watchdog": dict[str, Any] | None,
+        "metrics": dict[str, Any],
+    },
+)
+
+
+class JobsStatusResponse(TypedDict):
+    jobs: dict[str, JobStatus]
+    time: str
+
+
+JobEntry = TypedDict("JobEntry", {"alive": bool, "target-process": int | None, "execution": str})
+
+
+class StatusFrame(TypedDict):
+    """
+    /stream/status frame published when a job's status changes
+    """
+
+    type: Literal["status"]
+    job: str
+    seq: int
+    time: float
+    status: dict[str, Any]
+
+
+class MetricsFrame(TypedDict):
+    """
+    /stream/status frame published every metrics-interval seconds
+    """
+
+    type: Literal["metrics"]
+    job: str
+    time: float
+    alive: bool
+    process: ProcessState
+    restarts: Restarts
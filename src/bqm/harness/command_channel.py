@@ -0,0 +1,139 @@
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from bqm.harness.commands import Command
+
+
+class CommandChannelError(Exception):
+    pass
+
+
+class TicketState(str, Enum):
+    SENT = "SENT"
+    ACKED = "ACKED"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+MSGPACK_TYPES = ["application/msgpack", "application/x-msgpack"]
+RAW_TYPES = ["application/octet-stream"]
+
+
+def decode_payload(body: bytes, content_type: str | None) -> Any:
+    """
+    decode a command body in the job process. the harness forwards the raw request
+    body, so the payload is deserialised exactly once:
+        application/msgpack         -> msgpack (needs the optional msgpack package)
+        application/octet-stream    -> the raw bytes
+        anything else               -> json
+    an empty body decodes to {}
+    """
+    if not body:
+        return {}
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise CommandChannelError("Received a msgpack payload but msgpack is not installed")
+        return msgpack.unpackb(body)
+    if media_type in RAW_TYPES:
+        return body
+    return json.loads(body)
+
+
+class CommandTicket:
+    """
+    harness side record of a command sent to a job, updated as the job acks and replies
+    """
+
+    def __init__(self, job_id: str, cmd: Command):
+        self._id = uuid.uuid4().hex
+        self._job_id = job_id
+        self._cmd = cmd
+        self._state = TicketState.SENT
+        self._result = None
+        self._error = None
+        self._issued = time.time()
+        self._updated = self._issued
+        self._finished = asyncio.Event()
+
+    def id(self) -> str:
+        return self._id
+
+    def state(self) -> TicketState:
+        return self._state
+
+    def finished(self) -> bool:
+        return self._state in (TicketState.DONE, TicketState.FAILED)
+
+    def update(self, state: TicketState, result: Any = None, error: str | None = None):
+        if self.finished():
+            return
+        self._state = state
+        self._result = result
+        self._error = error
+        self._updated = time.time()
+        if self.finished():
+            self._finished.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        wait for the job to reply. False on timeout
+        """
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "ticket": self._id,
+            "job": self._job_id,
+            "command": self._cmd,
+            "state": self._state,
+            "result": self._result,
+            "error": self._error,
+            "issued": self._issued,
+            "updated": self._updated,
+        }
+
+
+class CommandTracker:
+    """
+    The most recent `max_tickets` command tickets, by id. Only touched from the event loop.
+    """
+
+    DEFAULT_MAX_TICKETS = 1000
+
+    def __init__(self, max_tickets: int = DEFAULT_MAX_TICKETS):
+        self._max_tickets = max_tickets
+        self._tickets: OrderedDict[str, CommandTicket] = OrderedDict()
+
+    def issue(self, job_id: str, cmd: Command) -> CommandTicket:
+        ticket = CommandTicket(job_id, cmd)
+        self._tickets[ticket.id()] = ticket
+        while len(self._tickets) > self._max_tickets:
+            self._tickets.popitem(last=False)
+        return ticket
+
+    def get(self, ticket_id: str) -> CommandTicket | None:
+        return self._tickets.get(ticket_id)
+
+    def resolve(self, reply: dict[str, Any]):
+        """
+        apply a reply sent by a job: {"id", "state", "result", "error"}
+        """
+        ticket = self._tickets.get(reply.get("id"))
+        if ticket is None:
+            return
+        ticket.update(TicketState(reply["state"]), reply.get("result"), reply.get("error"))
@@ -8,4 +8,7 @@ class Command(str, Enum):
     PAUSE = "__pause__"
     RESUME = "__resume__"
     CONFIG = "__config__"
+    DATA = "__data__"
     KILL = "__kill__"
+    PROFILE = "__profile__"
+    BATCH = "__batch__"
@@ -6,10 +6,47 @@ from jsonschema import validate
 class ConfigParser:
     DEFAULT_HTTP_IFCE = "0.0.0.0"
     DEFAULT_HTTP_PORT = 2222
+    DEFAULT_SAMPLER_INTERVAL = 1.0
+    DEFAULT_STATUS_SLOT_SIZE = 64 * 1024
+    DEFAULT_METRICS_SLOTS = 256
 
     @staticmethod
     def validate(config: dict[str, Any]):
 
+        execution_schema = {"type": "string", "enum": ["process", "thread"]}
+        resources_schema = {
+            "type": "object",
+            "properties": {
+                "cpu-affinity": {"type": "array", "items": {"type": "integer", "minimum": 0}, "minItems": 1},
+                "nice": {"type": "integer", "minimum": -20, "maximum": 19},
+                "ionice": {
+                    "type": "object",
+                    "properties": {
+                        "class": {"enum": ["realtime", "best-effort", "idle"]},
+                        "value": {"type": "integer", "minimum": 0, "maximum": 7},
+                    },
+                },
+                "rlimits": {
+                    "type": "object",
+                    "additionalProperties": {
+                        "oneOf": [
+                            {"type": "number", "minimum": -1},
+                            {"type": "array", "items": {"type": "number", "minimum": -1}, "minItems": 2, "maxItems": 2},
+                        ]
+                    },
+                },
+                "memory": {
+                    "type": "object",
+                    "properties": {
+                        "soft-rss-mb": {"type": "number", "exclusiveMinimum": 0},
+                        "soft-action": {"enum": ["alert", "restart"]},
+                        "hard-rss-mb": {"type": "number", "exclusiveMinimum": 0},
+                        "hard-action": {"enum": ["alert", "restart"]},
+                    },
+                },
+            },
+        }
+
         schema = {
             "type": "object",
             "properties": {
@@ -24,9 +61,83 @@ class ConfigParser:
                             "type": "integer",
                             "minimum": 1024,
                         },
+                        "sampler-interval": {
+                            "type": "number",
+                            "exclusiveMinimum": 0,
+                        },
+                        "status-slot-size": {
+                            "type": "integer",
+                            "minimum": 1024,
+                        },
+                        "metrics-slots": {
+                            "type": "integer",
+                            "minimum": 1,
+                        },
+                        "restart": {
+                            "type": "object",
+                            "properties": {
+                                "policy": {"enum": ["always", "on-failure", "never"]},
+                                "max-restarts": {"type": "integer", "minimum": 0},
+                                "backoff-initial": {"type": "number", "minimum": 0},
+                                "backoff-max": {"type": "number", "minimum": 0},
+                                "backoff-multiplier": {"type": "number", "minimum": 1},
+                                "jitter": {"type": "number", "minimum": 0, "maximum": 1},
+                            },
+                        },
+                        "stream": {
+                            "type": "object",
+                            "properties": {
+                                "poll-interval": {"type": "number", "exclusiveMinimum": 0},
+                                "metrics-interval": {"type": "number", "exclusiveMinimum": 0},
+                                "keepalive": {"type": "number", "exclusiveMinimum": 0},
+                            },
+                        },
+                        "resources": resources_schema,
+                        "execution": execution_schema,
+                        "json": {"type": "string", "enum": ["auto", "orjson", "msgspec", "stdlib"]},
+                        "checkpoint": {
+                            "type": "object",
+                            "properties": {
+                                "dir": {"type": "string"},
+                                "fsync": {"type": "boolean"},
+                                "restore-on-start": {"type": "boolean"},
+                            },
+                        },
+                        "shutdown": {
+                            "type": "object",
+                            "properties": {
+                                "stop-timeout": {"type": "number", "minimum": 0},
+                                "term-timeout": {"type": "number", "minimum": 0},
+                            },
+                        },
+                        "upload": {
+                            "type": "object",
+                            "properties": {
+                                "dir": {"type": "string"},
+                                "max-bytes": {"type": "integer", "minimum": 0},
+                                "ttl": {"type": "number", "exclusiveMinimum": 0},
+                            },
+                        },
+                        "warm-spare": {
+                            "type": "object",
+                            "properties": {
+                                "enabled": {"type": "boolean"},
+                                "preload": {"type": "array", "items": {"type": "string"}},
+                            },
+                        },
                     },
                     "required": ["interface", "port"],
                 },
+                "jobs": {
+                    "type": "object",
+                    "additionalProperties": {
+                        "type": "object",
+                        "properties": {
+                            "resources": resources_schema,
+                            "execution": execution_schema,
+                        },
+                    },
+                },
             },
         }
 
@@ -65,3 +176,121 @@ class ConfigParser:
             return ConfigParser.DEFAULT_HTTP_PORT
 
         return self._config["harness"]["port"]
+
+    def get_sampler_interval(self) -> float:
+        """
+        seconds between background samples of the launched process metrics
+        """
+        if "harness" not in self._config:
+            return ConfigParser.DEFAULT_SAMPLER_INTERVAL
+        if "sampler-interval" not in self._config["harness"]:
+            return ConfigParser.DEFAULT_SAMPLER_INTERVAL
+
+        return self._config["harness"]["sampler-interval"]
+
+    def get_status_slot_size(self) -> int:
+        """
+        max size in bytes of a (json encoded) status published by the job
+        """
+        if "harness" not in self._config:
+            return ConfigParser.DEFAULT_STATUS_SLOT_SIZE
+        if "status-slot-size" not in self._config["harness"]:
+            return ConfigParser.DEFAULT_STATUS_SLOT_SIZE
+
+        return self._config["harness"]["status-slot-size"]
+
+    def get_metrics_slots(self) -> int:
+        """
+        max number of counters, gauges and histograms a job can register
+        """
+        if "harness" not in self._config:
+            return ConfigParser.DEFAULT_METRICS_SLOTS
+        if "metrics-slots" not in self._config["harness"]:
+            return ConfigParser.DEFAULT_METRICS_SLOTS
+
+        return self._config["harness"]["metrics-slots"]
+
+    def get_restart(self) -> dict[str, Any]:
+        """
+        restart policy section. empty (never restart) if not configured
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("restart", {})
+
+    def get_warm_spare(self) -> dict[str, Any]:
+        """
+        warm spare section: {"enabled": bool, "preload": [module, ...]}. empty if not configured
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("warm-spare", {})
+
+    def get_resources(self, job_id: str | None = None) -> dict[str, Any]:
+        """
+        resources section (affinity, nice, ionice, rlimits, memory watchdog) for a job:
+        harness.resources with the keys of jobs.<job id>.resources taking precedence
+        """
+        resources = dict(self._config["harness"].get("resources", {})) if "harness" in self._config else {}
+        if job_id is not None:
+            resources.update(self._config.get("jobs", {}).get(job_id, {}).get("resources", {}))
+
+        return resources
+
+    def get_execution(self, job_id: str | None = None) -> str:
+        """
+        how a job runs: "process" (default) or "thread" inside the harness process.
+        jobs.<job id>.execution takes precedence over harness.execution
+        """
+        execution = self._config["harness"].get("execution", "process") if "harness" in self._config else "process"
+        if job_id is not None:
+            execution = self._config.get("jobs", {}).get(job_id, {}).get("execution", execution)
+
+        return execution
+
+    def get_json(self) -> str:
+        """
+        JSON encoder of the responses: "auto" (default, the fastest installed), "orjson", "msgspec" or "stdlib"
+        """
+        if "harness" not in self._config:
+            return "auto"
+
+        return self._config["harness"].get("json", "auto")
+
+    def get_checkpoint(self) -> dict[str, Any]:
+        """
+        checkpoint store section: {"dir", "fsync"}. empty if not configured
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("checkpoint", {})
+
+    def get_shutdown(self) -> dict[str, Any]:
+        """
+        staged shutdown section: {"stop-timeout", "term-timeout"} (seconds). empty if not configured
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("shutdown", {})
+
+    def get_upload(self) -> dict[str, Any]:
+        """
+        bulk upload section: {"dir", "max-bytes", "ttl"}. empty if not configured
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("upload", {})
+
+    def get_stream(self) -> dict[str, Any]:
+        """
+        status streaming section: {"poll-interval", "metrics-interval", "keepalive"} (seconds)
+        """
+        if "harness" not in self._config:
+            return {}
+
+        return self._config["harness"].get("stream", {})
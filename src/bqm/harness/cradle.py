@@ -1,45 +1,414 @@
+import asyncio
+import collections
+import contextlib
+import ctypes
+import logging
 import queue
+import signal
 import sys
+import threading
 from abc import ABC, abstractmethod
 from multiprocessing import Queue
-from typing import Any
+from typing import Any, AsyncIterator
 
+from bqm.harness.blob import Blob
+from bqm.harness.checkpoint import CheckpointError, CheckpointStore
+from bqm.harness.command_channel import TicketState, decode_payload
 from bqm.harness.commands import Command
+from bqm.harness.metrics import MetricsRegistry, Timing
+from bqm.harness.profiler import profile
+from bqm.harness.status_slot import StatusSlot
+
+logger = logging.getLogger(__name__)
 
 
 class ProcessHarnessError(Exception):
     pass
 
 
+class Terminated(SystemExit):
+    """
+    raised in a job thread (execution: thread) in place of SIGTERM
+    """
+
+    def __init__(self):
+        super().__init__(128 + signal.SIGTERM)
+
+
 class Cradle(ABC):
 
-    def __init__(self, exit_on_error: bool = True):
+    # command -> name of the handler method the dispatcher calls
+    HANDLERS = {
+        Command.START: "on_start",
+        Command.STOP: "on_stop",
+        Command.PAUSE: "on_pause",
+        Command.RESUME: "on_resume",
+        Command.CONFIG: "on_config",
+        Command.DATA: "on_data",
+    }
+
+    # upper bound (seconds) on how long a blocked waiter takes to notice it was asked to stop
+    WAIT_POLL = 0.5
+
+    def __init__(self, exit_on_error: bool = True, dispatch: bool = False):
         self._exit_on_error = exit_on_error
+        self._dispatch = dispatch
+        self._dispatcher = None
+        self._dispatcher_stop = threading.Event()
+        self._shutdown_requested = False
+        self._checkpoints = None
+        self._restore = True
+        self._control_q = None
+        self._metrics = None
+        # commands taken off the queue for a messages() iterator cancelled before it got them
+        self._pending = collections.deque()
+        self._pending_lock = threading.Lock()
 
     @abstractmethod
     def run(self, *args): ...
 
-    def set_queues(self, command_q: Queue, status_q: Queue):
+    def set_queues(
+        self, command_q: Queue, status_slot: StatusSlot, reply_q: Queue = None, metrics: MetricsRegistry = None, control_q: Queue = None
+    ):
         self._command_q = command_q
-        self._status_q = status_q
+        self._status_slot = status_slot
+        self._reply_q = reply_q
+        self._metrics = metrics
+        self._control_q = control_q
+
+    def set_checkpoint_store(self, store: CheckpointStore):
+        self._checkpoints = store
 
-    def get_msg(self) -> tuple[Command | None, dict | None]:
+    def set_restore(self, restore: bool):
+        """
+        whether the next start calls on_restore with the latest checkpoint
+        """
+        self._restore = restore
+
+    def _receive(self, msg: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        ack the command and decode its payload. an uploaded blob is mapped, not read.
+        a command whose payload cannot be decoded is failed back to the sender and dropped
+        """
+        self.__send_reply(msg, TicketState.ACKED)
         try:
-            if not self._command_q.empty():
-                return self._command_q.get(block=False)
+            if "blob" in msg:
+                msg["data"] = Blob(msg.pop("blob"))
             else:
-                return None
+                msg["data"] = decode_payload(msg.pop("body", b""), msg.pop("content-type", None))
+        except Exception as e:
+            logger.error(f"Dropping command {msg['cmd']}. Failed to decode its payload: {e}")
+            self.__send_reply(msg, TicketState.FAILED, error=f"Failed to decode payload: {e}")
+            return None
+
+        if msg["cmd"] == Command.STOP and isinstance(msg["data"], dict) and "shutdown" in msg["data"]:
+            self._request_shutdown(msg["data"]["shutdown"].get("deadline"))
+        return msg
+
+    def _request_shutdown(self, deadline: float | None):
+        if self._shutdown_requested:
+            return
+        self._shutdown_requested = True
+        try:
+            self.on_shutdown_requested(deadline)
+        except Exception as e:
+            logger.error(f"on_shutdown_requested failed: {e}")
+
+    def __on_sigterm(self, signum, frame):
+        """
+        second stage of a harness shutdown: run the hook (if STOP did not already) and
+        unwind run() with SystemExit so finally blocks and context managers still run
+        """
+        self._request_shutdown(None)
+        raise SystemExit(128 + signum)
+
+    def get_msg(self) -> dict[str, Any] | None:
+        """
+        non blocking. next command {"id", "cmd", "data"} or None if there is none
+        """
+        if self._pending:
+            return self.__take_pending()
+        try:
+            return self._receive(self._command_q.get_nowait())
+        except queue.Empty:
+            return None
+
+    def __take_pending(self) -> dict[str, Any] | None:
+        try:
+            return self._pending.popleft()
+        except IndexError:
+            return None
+
+    def wait_msg(self, timeout: float | None = None) -> dict[str, Any] | None:
+        """
+        block until a command arrives. None if nothing arrived within timeout seconds
+        (timeout None waits forever)
+        """
+        if self._pending:
+            return self.__take_pending()
+        try:
+            return self._receive(self._command_q.get(block=True, timeout=timeout))
         except queue.Empty:
             return None
 
-    def set_status(self, status: dict[str, Any]) -> bool:
-        return self._status_q.put(status)
+    def __send_reply(self, msg: dict[str, Any], state: TicketState, result: Any = None, error: str | None = None):
+        if self._reply_q is None or "id" not in msg:
+            return
+        self._reply_q.put({"id": msg["id"], "state": state, "result": result, "error": error})
+
+    def reply(self, msg: dict[str, Any], result: Any = None, error: str | None = None):
+        """
+        report the outcome of a command to the caller waiting on its ticket.
+        result must be json serialisable
+        """
+        self.__send_reply(msg, TicketState.FAILED if error else TicketState.DONE, result=result, error=error)
+
+    async def messages(self) -> AsyncIterator[dict[str, Any]]:
+        """
+        async iterator over incoming commands:
+            async for msg in self.messages():
+                ...
+        the blocking wait runs in an executor thread and wakes up every WAIT_POLL
+        seconds so an abandoned iterator does not pin the thread forever. a command the
+        executor thread takes after the iterating task was cancelled is not lost: the next
+        get_msg, wait_msg or messages() returns it first
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            handoff = {"abandoned": False}
+            waiting = loop.run_in_executor(None, self.__wait_handoff, handoff)
+            try:
+                await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                with self._pending_lock:
+                    handoff["abandoned"] = True
+                    if handoff.get("msg") is not None:
+                        self._pending.append(handoff.pop("msg"))
+                raise
+            msg = handoff.get("msg")
+            if msg is not None:
+                yield msg
+
+    def __wait_handoff(self, handoff: dict[str, Any]):
+        """
+        executor side of messages(): the command goes to the iterator, or back to the pending
+        buffer when the iterator was cancelled meanwhile. both under the lock, so never to neither
+        """
+        msg = self.wait_msg(self.WAIT_POLL)
+        with self._pending_lock:
+            if msg is not None and handoff["abandoned"]:
+                self._pending.append(msg)
+            else:
+                handoff["msg"] = msg
+
+    def dispatch(self, msg: dict[str, Any]) -> Any:
+        """
+        call the handler method registered for the command in msg
+        """
+        handler_name = self.HANDLERS.get(msg["cmd"])
+        if handler_name is None:
+            logger.warning(f"No handler for command: {msg['cmd']}")
+            return None
+        data = msg.get("data")
+        return getattr(self, handler_name)(data if data is not None else {})
+
+    def start_dispatcher(self) -> threading.Thread:
+        """
+        start a background thread which waits for commands and dispatches them
+        to the on_<command> handlers. idle cost is a thread blocked on the queue.
+        a handler's return value (or exception) is replied to the command's sender
+        """
+        if self._dispatcher and self._dispatcher.is_alive():
+            return self._dispatcher
+
+        self._dispatcher_stop.clear()
+        self._dispatcher = threading.Thread(target=self.__dispatch_loop, name="cradle-dispatcher", daemon=True)
+        self._dispatcher.start()
+        return self._dispatcher
+
+    def stop_dispatcher(self):
+        self._dispatcher_stop.set()
+        if self._dispatcher and self._dispatcher is not threading.current_thread():
+            self._dispatcher.join()
+        self._dispatcher = None
+
+    def __dispatch_loop(self):
+        while not self._dispatcher_stop.is_set():
+            msg = self.wait_msg(timeout=self.WAIT_POLL)
+            if msg is None:
+                continue
+            try:
+                self.reply(msg, result=self.dispatch(msg))
+            except Exception as e:
+                logger.error(f"Command handler failed for {msg['cmd']}: {e}")
+                self.reply(msg, error=str(e))
+
+    def __control_loop(self, stop: threading.Event):
+        """
+        harness requests which do not go through the job's own command handling (profiling).
+        idle cost is a thread blocked on the control queue
+        """
+        while not stop.is_set():
+            try:
+                msg = self._control_q.get(timeout=self.WAIT_POLL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            self.__send_reply(msg, TicketState.ACKED)
+            try:
+                self.__send_reply(msg, TicketState.DONE, result=profile(msg["kind"], msg.get("params", {})))
+            except Exception as e:
+                logger.error(f"Profiling failed: {e}")
+                self.__send_reply(msg, TicketState.FAILED, error=str(e))
+
+    # --------------------------
+    # command handlers (override)
+    # --------------------------
+    def on_start(self, data: dict[str, Any]):
+        pass
+
+    def on_stop(self, data: dict[str, Any]):
+        pass
+
+    def on_pause(self, data: dict[str, Any]):
+        pass
+
+    def on_resume(self, data: dict[str, Any]):
+        pass
+
+    def on_config(self, data: dict[str, Any]):
+        pass
+
+    def on_shutdown_requested(self, deadline: float | None):
+        """
+        the harness is stopping the job: persist what needs persisting and return from run().
+        called once, with the epoch time after which the harness escalates to SIGTERM
+        when it arrives with the STOP command, or with None on SIGTERM (after which run()
+        is unwound by SystemExit). the STOP command itself still goes to on_stop
+        """
+        pass
+
+    def on_data(self, blob: Blob):
+        """
+        bulk upload (POST /upload). blob.memoryview() / blob.numpy() view it without copying
+        """
+        pass
+
+    def set_status(self, status: dict[str, Any]):
+        """
+        publish the job status. overwrites the previous one, never blocks
+        """
+        self._status_slot.write(status)
+
+    def metrics(self) -> MetricsRegistry:
+        """
+        registry for the job's own counters, gauges and histograms, exported by the harness
+        on /metrics as job_<name>{job="<job id>"}:
+            processed = self.metrics().counter("processed_total", "items processed")
+            processed.inc()
+        updates are plain writes to shared memory
+        """
+        return self._metrics
+
+    def timer(self, name: str) -> Timing | contextlib.nullcontext:
+        """
+        time a block into the latency histogram `name`, cheap enough for hot loops:
+            with self.timer("tick"):
+                ...
+        count, min, max, mean and p50/p90/p99/p99.9 show on /status and /metrics.
+        a no-op when the job is not run by the harness
+        """
+        if self._metrics is None:
+            return contextlib.nullcontext()
+        return self._metrics.timer(name).time()
+
+    def count(self, name: str, n: float = 1):
+        """
+        add n to the counter `name`. a no-op when the job is not run by the harness
+        """
+        if self._metrics is not None:
+            self._metrics.counter(name).inc(n)
+
+    def save_checkpoint(self, state: Any) -> int:
+        """
+        persist state (anything picklable) as the job's latest checkpoint, replacing the
+        previous one atomically. numpy arrays and other large buffers are written straight
+        from memory. returns the checkpoint size in bytes
+        """
+        return self.__checkpoint_store().save(state)
+
+    def load_checkpoint(self) -> Any | None:
+        """
+        latest checkpoint or None. numpy arrays come back as copy-on-write views of the file
+        """
+        return self.__checkpoint_store().load()
+
+    def clear_checkpoint(self):
+        self.__checkpoint_store().clear()
+
+    def __checkpoint_store(self) -> CheckpointStore:
+        if self._checkpoints is None:
+            raise CheckpointError("No checkpoint store. Checkpoints are only available to jobs run by the harness")
+        return self._checkpoints
+
+    def on_restore(self, state: Any):
+        """
+        called before run() with the latest checkpoint when there is one, on a restart (and on
+        the first start with checkpoint.restore-on-start)
+        """
+        pass
+
+    def __restore(self):
+        if type(self).on_restore is Cradle.on_restore or self._checkpoints is None or not self._restore:
+            return
+        try:
+            state = self._checkpoints.load()
+        except CheckpointError as e:
+            logger.error(f"Not restoring from checkpoint: {e}")
+            return
+        if state is not None:
+            self.on_restore(state)
 
     def get_config(self) -> dict[str, Any]:
         return self._config
 
+    def _interrupt(self, thread_id: int):
+        """
+        unwind run() on a job thread the way SIGTERM unwinds it in a job process: Terminated is
+        raised in the thread at its next python instruction (a blocking call returns first)
+        and on_shutdown_requested runs after the unwinding, if STOP did not already run it
+        """
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(Terminated))
+
+    def _main(self) -> Any:
+        """
+        run the job in the job process. the dispatcher thread, if enabled, lives as long as run()
+        """
+        if self._dispatch:
+            self.start_dispatcher()
+        try:
+            return self.run()
+        except Terminated:
+            self._request_shutdown(None)
+            raise
+        finally:
+            if self._dispatch:
+                self.stop_dispatcher()
+
     def __call__(self):
-        res = self.run()
+        self._shutdown_requested = False
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.__on_sigterm)
+        self.__restore()
+        # stopped with the job: a job thread (execution: thread) shares the queue with its successor
+        control_stop = threading.Event()
+        if self._control_q is not None:
+            threading.Thread(target=self.__control_loop, args=(control_stop,), name="cradle-control", daemon=True).start()
+        try:
+            res = self._main()
+        finally:
+            control_stop.set()
         if self._exit_on_error and res:
             sys.exit(int(res))
         else:
@@ -5,6 +5,7 @@ from typing import Any
 
 from bqm.harness.conf.service_config import ServiceConfig
 from bqm.harness.file_launcher import FileLauncher
+from bqm.utils.export_cache import ExportCache
 from bqm.utils.gitx import GitRepo
 from bqm.utils.logconfig import LogFuzz
 from bqm.utils.mamba.mambax import Mamba
@@ -55,16 +56,23 @@ FileLauncher(config="{cfg_file}")
             raise CallableRepoLauncherClassError(msg)
 
         src_conf = conf["source"]
+        subfolder = src_conf.get("src-subfolder", ".")
         repo = GitRepo(
             repo_url=src_conf["repo"],
             branch=src_conf["branch"],
-            workdir=src_conf["workdir"],
+            workdir=src_conf.get("workdir"),
+            cache_dir=src_conf.get("cache-dir"),
+            commit=src_conf.get("commit"),
+            depth=src_conf.get("depth"),
+            filter=src_conf.get("filter"),
+            sparse=[subfolder] if src_conf.get("sparse", False) and subfolder not in (".", "") else None,
+            export=src_conf.get("export", False),
+            export_budget_mb=src_conf.get("export-budget-mb", ExportCache.DEFAULT_BUDGET_MB),
             force_offline=src_conf.get("use-local", True),
         )
         repo.print_info()
 
         # create path to source within the repo
-        subfolder = src_conf.get("src-subfolder", ".")
         target_file = src_conf["file-to-run"]
         checkout_path = repo.local_dir() / subfolder
         src_path = checkout_path / target_file
@@ -74,7 +82,7 @@ FileLauncher(config="{cfg_file}")
             if "name" in env_conf:
                 target_env = env_conf["name"]
                 auto_code, tmp_cfg_file = cls.make_delegated_launcher_script(conf)
-                mamba = Mamba()
+                mamba = Mamba.shared()
                 res = mamba.run_code(env=target_env, code=auto_code)
                 Path(tmp_cfg_file).unlink()
             else:
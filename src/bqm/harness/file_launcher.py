@@ -6,6 +6,7 @@ from bqm.harness.conf.service_config import ServiceConfig
 from bqm.harness.launcher import Launcher
 from bqm.utils.entry.runner import EntryPointScanner
 from bqm.utils.entry.wrapper import CallableWrapper
+from bqm.utils.export_cache import ExportCache
 from bqm.utils.gitx import GitRepo
 from bqm.utils.logconfig import LogFuzz
 
@@ -63,16 +64,23 @@ class CallableFileLauncherClass(type):
             raise CallableFileLauncherClassError(msg)
 
         src_conf = conf["source"]
+        subfolder = src_conf.get("src-subfolder", ".")
         repo = GitRepo(
             repo_url=src_conf["repo"],
             branch=src_conf["branch"],
-            workdir=src_conf["workdir"],
-            force_offline=True,
+            workdir=src_conf.get("workdir"),
+            cache_dir=src_conf.get("cache-dir"),
+            commit=src_conf.get("commit"),
+            depth=src_conf.get("depth"),
+            filter=src_conf.get("filter"),
+            sparse=[subfolder] if src_conf.get("sparse", False) and subfolder not in (".", "") else None,
+            export=src_conf.get("export", False),
+            export_budget_mb=src_conf.get("export-budget-mb", ExportCache.DEFAULT_BUDGET_MB),
+            force_offline=src_conf.get("use-local", True),
         )
         repo.print_info()
 
         # create path to source within the repo
-        subfolder = src_conf.get("src-subfolder", ".")
         target_file = src_conf["file-to-run"]
         target_entry_point = src_conf.get("entry-point", None)
 
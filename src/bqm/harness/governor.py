@@ -0,0 +1,215 @@
+import logging
+import os
+import resource
+import time
+from multiprocessing import Event, Process
+from typing import Any, Callable
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceGovernorError(Exception):
+    pass
+
+
+IONICE_CLASSES = {
+    "realtime": "IOPRIO_CLASS_RT",
+    "best-effort": "IOPRIO_CLASS_BE",
+    "idle": "IOPRIO_CLASS_IDLE",
+}
+
+
+class ResourceGovernor:
+    """
+    Applies the `resources` config section to a job process. The process applies it to itself
+    (see GovernedProcess) first thing after the fork, before the job, a warm spare's preloads
+    or any thread starts: affinity, nice and ionice set from outside only reach the main thread,
+    threads inherit them from the thread that creates them.
+
+        {
+            "cpu-affinity": [2, 3],                  # cores the job may run on
+            "nice": 5,                               # lowering it needs privileges
+            "ionice": {"class": "best-effort", "value": 4},
+            "rlimits": {"nofile": 4096, "as": [8e9, 10e9], "core": 0},   # soft or [soft, hard]
+            "memory": {...}                          # see MemoryWatchdog
+        }
+
+    Settings the platform does not support are logged and skipped rather than failing the job.
+    """
+
+    SETTINGS = ("cpu-affinity", "nice", "ionice", "rlimits")
+
+    def __init__(self, resources: dict[str, Any]):
+        self._resources = resources
+
+    def enabled(self) -> bool:
+        return any(key in self._resources for key in ResourceGovernor.SETTINGS)
+
+    def apply_here(self):
+        """
+        apply to the calling process, from its only thread
+        """
+        self.__apply(
+            os.getpid(),
+            {
+                "cpu-affinity": self.__own_affinity,
+                "nice": self.__own_nice,
+                "ionice": lambda ionice: self.__ionice(psutil.Process(), ionice),
+                "rlimits": self.__own_rlimits,
+            },
+        )
+
+    def apply(self, pid: int):
+        """
+        apply to another process by pid. fallback only: threads it already runs keep their settings
+        """
+        if not self.enabled():
+            return
+        try:
+            proc = psutil.Process(pid)
+        except psutil.NoSuchProcess:
+            return
+
+        self.__apply(
+            pid,
+            {
+                "cpu-affinity": proc.cpu_affinity,
+                "nice": proc.nice,
+                "ionice": lambda ionice: self.__ionice(proc, ionice),
+                "rlimits": lambda rlimits: self.__rlimits(proc, rlimits),
+            },
+        )
+
+    def __apply(self, pid: int, setters: dict[str, Callable[[Any], None]]):
+        for setting in ResourceGovernor.SETTINGS:
+            if setting not in self._resources:
+                continue
+            try:
+                setters[setting](self._resources[setting])
+            except (psutil.Error, AttributeError, ValueError, OSError, ResourceGovernorError) as e:
+                logger.error(f"Failed to apply {setting}={self._resources[setting]} to process {pid}: {e}")
+
+    def __own_affinity(self, cpus: list[int]):
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            psutil.Process().cpu_affinity(cpus)
+
+    def __own_nice(self, nice: int):
+        os.setpriority(os.PRIO_PROCESS, 0, nice)
+
+    def __own_rlimits(self, rlimits: dict[str, Any]):
+        for name, (soft, hard) in self.__limits(rlimits):
+            limit = getattr(resource, f"RLIMIT_{name.upper()}", None)
+            if limit is None:
+                raise ResourceGovernorError(f"Unknown rlimit: {name}")
+            resource.setrlimit(limit, (soft, hard))
+
+    def __ionice(self, proc: psutil.Process, ionice: dict[str, Any]):
+        io_class = IONICE_CLASSES.get(ionice.get("class", "best-effort"))
+        if io_class is None:
+            raise ResourceGovernorError(f"Unknown ionice class {ionice.get('class')}. One of: {list(IONICE_CLASSES)}")
+        if ionice.get("class") == "idle":
+            proc.ionice(getattr(psutil, io_class))
+        else:
+            proc.ionice(getattr(psutil, io_class), value=ionice.get("value", 4))
+
+    def __rlimits(self, proc: psutil.Process, rlimits: dict[str, Any]):
+        for name, limits in self.__limits(rlimits):
+            limit = getattr(psutil, f"RLIMIT_{name.upper()}", None)
+            if limit is None:
+                raise ResourceGovernorError(f"Unknown rlimit: {name}")
+            proc.rlimit(limit, limits)
+
+    def __limits(self, rlimits: dict[str, Any]):
+        for name, limit in rlimits.items():
+            soft, hard = (limit, limit) if not isinstance(limit, list) else limit
+            yield name, (int(soft), int(hard))
+
+
+class GovernedProcess(Process):
+    """
+    A job process which applies its resources to itself before running the job. governed()
+    tells the harness it did, so it only falls back to applying them from outside if not
+    """
+
+    def __init__(self, target: Callable, governor: ResourceGovernor, name: str | None = None):
+        super().__init__(target=target, name=name)
+        self._governor = governor
+        self._governed = Event()
+
+    def governed(self) -> bool:
+        return self._governed.is_set()
+
+    def govern(self):
+        self._governor.apply_here()
+        self._governed.set()
+
+    def run(self):
+        self.govern()
+        super().run()
+
+
+class MemoryWatchdog:
+    """
+    Checks the job's rss, as sampled by the ProcessSampler, against two thresholds:
+
+        "memory": {"soft-rss-mb": 2048, "soft-action": "alert", "hard-rss-mb": 4096, "hard-action": "restart"}
+
+    crossing a threshold triggers its action once; it re-arms when rss drops back below it.
+    actions: "alert" logs and counts the crossing, "restart" also restarts the job gracefully
+    """
+
+    def __init__(self, memory: dict[str, Any]):
+        self._levels = {}
+        for level, default_action in (("soft", "alert"), ("hard", "restart")):
+            threshold = memory.get(f"{level}-rss-mb")
+            if threshold is not None:
+                self._levels[level] = {"rss-mb": threshold, "action": memory.get(f"{level}-action", default_action)}
+        self._crossed: set[str] = set()
+        self._alerts = {level: 0 for level in self._levels}
+        self._last_alert = None
+
+    def enabled(self) -> bool:
+        return bool(self._levels)
+
+    def reset(self):
+        """
+        new process: thresholds re-arm
+        """
+        self._crossed.clear()
+
+    def check(self, snapshot: dict[str, Any]) -> str | None:
+        """
+        the action to take for this sample, if any. the hard threshold wins over the soft one
+        """
+        rss_mb = snapshot.get("mem-rss-mb")
+        if rss_mb is None:
+            return None
+
+        action = None
+        for level in ("soft", "hard"):
+            if level not in self._levels:
+                continue
+            threshold = self._levels[level]
+            if rss_mb < threshold["rss-mb"]:
+                self._crossed.discard(level)
+                continue
+            if level in self._crossed:
+                continue
+            self._crossed.add(level)
+            self._alerts[level] += 1
+            self._last_alert = {"level": level, "rss-mb": rss_mb, "threshold-mb": threshold["rss-mb"], "time": time.time()}
+            logger.warning(f"Process {snapshot.get('pid')} rss {rss_mb:.0f}MB crossed the {level} limit of {threshold['rss-mb']}MB")
+            action = threshold["action"] if action != "restart" else action
+        return action
+
+    def alerts(self) -> dict[str, int]:
+        return self._alerts
+
+    def state(self) -> dict[str, Any] | None:
+        if not self.enabled():
+            return None
+        return {"limits": self._levels, "alerts": self._alerts, "last-alert": self._last_alert}
@@ -0,0 +1,96 @@
+import logging
+import os
+import signal
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class JobThread:
+    """
+    Runs a job on a thread of the harness process (`execution: thread`) behind the subset of
+    the multiprocessing.Process interface the harness uses: start, pid, is_alive, sentinel,
+    join, exitcode, terminate and kill.
+
+    exitcode follows the process conventions: 0 when run() returns, the SystemExit code
+    when the job exits, 1 on an uncaught exception. sentinel is the read end of a pipe
+    written when the job finishes, so the harness can watch it on its event loop.
+
+    A thread cannot be signalled: terminate asks the job to unwind the way SIGTERM does
+    (see Cradle._interrupt). kill cannot stop a thread at all; the thread is abandoned,
+    reported with exit code -9, and left to finish in the background. Until it does it is a
+    zombie: it still holds the Cradle and reads its command queue.
+    """
+
+    def __init__(self, target: Callable, name: str | None = None):
+        self._target = target
+        self._thread = threading.Thread(target=self.__run, name=name, daemon=True)
+        self._exitcode = None
+        self._lock = threading.Lock()
+        self._sentinel, self._done = os.pipe()
+
+    @property
+    def pid(self) -> int:
+        return os.getpid()
+
+    @property
+    def sentinel(self) -> int:
+        return self._sentinel
+
+    @property
+    def exitcode(self) -> int | None:
+        return self._exitcode
+
+    def start(self):
+        self._thread.start()
+
+    def is_alive(self) -> bool:
+        return self._exitcode is None and self._thread.is_alive()
+
+    def zombie(self) -> bool:
+        """
+        abandoned by kill, but still running
+        """
+        return self._exitcode == -signal.SIGKILL and self._thread.is_alive()
+
+    def __run(self):
+        exitcode = 0
+        try:
+            self._target()
+        except SystemExit as e:
+            exitcode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException as e:
+            logger.exception(f"Job thread {self._thread.name} failed: {e}")
+            exitcode = 1
+        self.__finish(exitcode)
+
+    def __finish(self, exitcode: int):
+        with self._lock:
+            if self._exitcode is not None:
+                return
+            self._exitcode = exitcode
+            os.write(self._done, b"\0")
+
+    def terminate(self):
+        if self.is_alive():
+            self._target._interrupt(self._thread.ident)
+
+    def kill(self):
+        if not self.is_alive():
+            return
+        logger.error(f"Job thread {self._thread.name} cannot be killed. Abandoning it")
+        self._target._interrupt(self._thread.ident)
+        self.__finish(-signal.SIGKILL)
+
+    def join(self, timeout: float | None = None):
+        """
+        wait for the job to finish. an abandoned thread is not waited for
+        """
+        if self._exitcode is None or self._exitcode != -signal.SIGKILL:
+            self._thread.join(timeout)
+        with self._lock:
+            if self._exitcode is not None and self._done is not None:
+                os.close(self._done)
+                os.close(self._sentinel)
+                self._done = None
@@ -0,0 +1,77 @@
+import logging
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+
+class JsonResponseError(Exception):
+    pass
+
+
+JSON_BACKENDS = ["auto", "orjson", "msgspec", "stdlib"]
+
+
+def _encode_default(obj: Any) -> Any:
+    """
+    types the fast encoders do not know but the stdlib one does: named tuples (psutil's) become arrays
+    """
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson (Rust, several times faster than the stdlib encoder).
+    NaN and infinities become null where the stdlib encoder would fail. content orjson rejects
+    (integers beyond 64 bits) is rendered by the stdlib encoder
+    """
+
+    def render(self, content: Any) -> bytes:
+        try:
+            return orjson.dumps(content, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return super().render(content)
+
+
+class MsgspecResponse(JSONResponse):
+    """
+    JSONResponse rendered with msgspec's encoder (C), reused across responses. content msgspec
+    rejects is rendered by the stdlib encoder
+    """
+
+    ENCODER = msgspec.json.Encoder(enc_hook=_encode_default) if msgspec is not None else None
+
+    def render(self, content: Any) -> bytes:
+        try:
+            return MsgspecResponse.ENCODER.encode(content)
+        except (TypeError, ValueError, OverflowError, msgspec.EncodeError):
+            return super().render(content)
+
+
+def json_response_class(backend: str = "auto") -> type[JSONResponse]:
+    """
+    response class for harness.json: orjson or msgspec (JsonResponseError if not installed),
+    stdlib (starlette's JSONResponse), or auto: the fastest one installed
+    """
+    if backend not in JSON_BACKENDS:
+        raise JsonResponseError(f"Unknown json backend {backend}. One of: {JSON_BACKENDS}")
+    if backend in ("auto", "orjson") and orjson is not None:
+        return OrjsonResponse
+    if backend in ("auto", "msgspec") and msgspec is not None:
+        return MsgspecResponse
+    if backend in ("orjson", "msgspec"):
+        raise JsonResponseError(f"harness.json is {backend} but {backend} is not installed")
+    return JSONResponse
@@ -1,8 +1,10 @@
 import asyncio
+import inspect
 import sys
 from pathlib import Path
 from typing import Any, Callable
 
+from bqm.harness.async_cradle import AsyncCradle
 from bqm.harness.conf.service_config import ServiceConfig
 from bqm.harness.cradle import Cradle
 from bqm.harness.proc_impl import ProcessHarness
@@ -16,26 +18,47 @@ class LauncherError(Exception):
 
 
 class CallableLauncherClass(type):
+
+    @classmethod
+    def as_cradle(cls, job: Cradle | Callable) -> Cradle:
+        if isinstance(job, Cradle):
+            return job
+        elif inspect.iscoroutinefunction(job) or inspect.iscoroutinefunction(getattr(job, "__call__", None)):
+            return type("AnonymousAsyncCradle", (AsyncCradle,), {"run": job})()
+        elif isinstance(job, Callable):
+            return type("AnonymousCradle", (Cradle,), {"run": job})()
+        else:
+            raise LauncherError(f"Job must be a Cradle or a Callable. Dont know how to run {type(job)}")
+
     def __call__(
         cls,
-        job: Cradle | Callable,
+        job: Cradle | Callable | dict[str, Cradle | Callable],
         config: dict[str, Any] | Path | str | None = None,
         exit_on_completion: bool = False,
     ) -> int:
+        """
+        job: a Cradle, an AsyncCradle, a callable or a coroutine function (run on an event loop as an
+        AsyncCradle); or a {job id: job} dict to supervise several jobs behind one harness.
+        each job of a dict gets conf["jobs"][<job id>]["target-config"] if present, the shared
+        conf["target-config"] otherwise
+        """
 
         conf = ServiceConfig.get_config(config)
 
-        if isinstance(job, Cradle):
-            target = job
-        elif isinstance(job, Callable):
-            target = type("AnonymousCradle", (Cradle,), {"run": job})()
+        if isinstance(job, dict):
+            target = {job_id: cls.as_cradle(j) for job_id, j in job.items()}
         else:
-            raise LauncherError(f"Job must be a Cradle or a Callable. Dont know how to run {type(job)}")
+            target = cls.as_cradle(job)
 
         if "logging" in conf:
             LogFuzz.init_logging(conf["logging"])
 
-        target._config = conf.get("target-config", {})
+        if isinstance(target, dict):
+            jobs_conf = conf.get("jobs", {})
+            for job_id, t in target.items():
+                t._config = jobs_conf.get(job_id, {}).get("target-config", conf.get("target-config", {}))
+        else:
+            target._config = conf.get("target-config", {})
 
         exit_code = asyncio.run(ProcessHarness(config=conf).main(target))
 
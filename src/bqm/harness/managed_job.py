@@ -0,0 +1,394 @@
+import asyncio
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from multiprocessing import Process, Queue
+from typing import Any
+
+from bqm.harness.checkpoint import CheckpointStore, default_checkpoint_dir
+from bqm.harness.command_channel import CommandTicket, CommandTracker
+from bqm.harness.commands import Command
+from bqm.harness.conf.config_parser import ConfigParser
+from bqm.harness.cradle import Cradle
+from bqm.harness.governor import GovernedProcess, MemoryWatchdog, ResourceGovernor
+from bqm.harness.job_thread import JobThread
+from bqm.harness.metrics import MetricsRegistry
+from bqm.harness.proc_sampler import ProcessSampler
+from bqm.harness.restart_policy import RestartPolicy
+from bqm.harness.status_slot import StatusSlot
+from bqm.harness.warm_spare import WarmProcess
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedJob:
+    """
+    A single Cradle supervised by the harness: its process, command queue,
+    status slot, metrics registry and metrics sampler. A finished process is started again according
+    to the restart policy; the queue, status slot and metrics registry outlive the individual processes.
+    With a warm spare configured the next process is forked ahead of time and parked, so a
+    restart only has to release it. Only while the restart policy can still restart the job.
+
+    Shutting a job down is staged: the job is sent STOP with a deadline, then SIGTERM with
+    a second deadline and only then SIGKILL. A stage with a zero timeout is skipped.
+
+    Every new process applies the configured resources (affinity, nice, ionice, rlimits) to
+    itself before the job or any thread starts; the harness only applies them from outside if
+    it has not after GOVERN_GRACE. Its rss is watched on each sample; crossing a limit alerts or
+    restarts the job gracefully.
+
+    With `execution: thread` the job runs on a thread of the harness process instead (see
+    JobThread) and its queues are plain in-memory queues: commands are handed over without
+    pickling. Such a job shares the harness process, so it gets no resources, no sampling,
+    no memory watchdog and no warm spare. A thread abandoned by kill that still runs (a zombie)
+    would share the Cradle and its queues with a successor, so the job is not restarted then.
+    """
+
+    REPLY_POLL = 0.5
+    DEFAULT_STOP_TIMEOUT = 10.0
+    DEFAULT_TERM_TIMEOUT = 5.0
+    GOVERN_GRACE = 5.0
+
+    def __init__(self, job_id: str, cradle: Cradle, config: ConfigParser, tracker: CommandTracker):
+        self._id = job_id
+        self._cradle = cradle
+        self._tracker = tracker
+        self._threaded = config.get_execution(job_id) == "thread"
+        queue_type = queue.Queue if self._threaded else Queue
+        self._command_queue = queue_type()
+        self._reply_queue = queue_type()
+        self._control_queue = queue_type()
+        self._reply_reader = None
+        self._closing = threading.Event()
+        self._status_slot = StatusSlot(size=config.get_status_slot_size())
+        self._metrics = MetricsRegistry(slots=config.get_metrics_slots())
+        self._sampler = ProcessSampler(interval=config.get_sampler_interval(), on_sample=self.__on_sample)
+        resources = config.get_resources(job_id)
+        self._governor = ResourceGovernor(resources)
+        self._watchdog = MemoryWatchdog(resources.get("memory", {}))
+        self._restart_policy = RestartPolicy.from_config(config.get_restart())
+        warm_spare = config.get_warm_spare()
+        self._warm = warm_spare.get("enabled", False) and not self._threaded
+        self._preload = warm_spare.get("preload", [])
+        self._spare = None
+        self._process = None
+        self._exited = None
+        self._started_at = None
+        self._restarts = 0
+        self._consecutive_restarts = 0
+        self._last_exit_code = None
+        self._stopping = False
+        shutdown = config.get_shutdown()
+        self._stop_timeout = shutdown.get("stop-timeout", ManagedJob.DEFAULT_STOP_TIMEOUT)
+        self._term_timeout = shutdown.get("term-timeout", ManagedJob.DEFAULT_TERM_TIMEOUT)
+        self._shutdown = None
+        self._shutdown_task = None
+        self._restart_requested = False
+        cradle.set_queues(self._command_queue, self._status_slot, self._reply_queue, self._metrics, self._control_queue)
+        checkpoint = config.get_checkpoint()
+        cradle.set_checkpoint_store(
+            CheckpointStore(checkpoint.get("dir") or default_checkpoint_dir(config.get_port()), job_id, fsync=checkpoint.get("fsync", False))
+        )
+        # a checkpoint found at the first start may be a previous run's: only restored when asked for
+        self._restore_on_start = checkpoint.get("restore-on-start", False)
+
+    def id(self) -> str:
+        return self._id
+
+    def execution(self) -> str:
+        return "thread" if self._threaded else "process"
+
+    def process(self) -> Process | JobThread | None:
+        return self._process
+
+    def is_alive(self) -> bool:
+        return bool(self._process and self._process.is_alive())
+
+    def __fork_spare(self) -> WarmProcess:
+        spare = WarmProcess(target=self._cradle, governor=self._governor, preload=self._preload)
+        spare.start()
+        self.__check_governed(spare)
+        logger.info(f"Warm spare for job [{self._id}] parked. PID: [{spare.pid}]")
+        return spare
+
+    def __check_governed(self, proc: GovernedProcess):
+        """
+        fall back to applying the resources from the harness if the process has not applied them
+        itself within GOVERN_GRACE
+        """
+
+        def check():
+            if proc.is_alive() and not proc.governed():
+                logger.warning(f"Process {proc.pid} of job [{self._id}] did not apply its resources, applying them from the harness")
+                self._governor.apply(proc.pid)
+
+        if self._governor.enabled():
+            asyncio.get_running_loop().call_later(ManagedJob.GOVERN_GRACE, check)
+
+    def __on_exit(self, sentinel: int, exited: asyncio.Event):
+        asyncio.get_running_loop().remove_reader(sentinel)
+        exited.set()
+
+    def __read_replies(self, loop: asyncio.AbstractEventLoop):
+        """
+        reply reader thread: hand job replies over to the tracker on the event loop
+        """
+        while not self._closing.is_set():
+            try:
+                reply = self._reply_queue.get(timeout=ManagedJob.REPLY_POLL)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            loop.call_soon_threadsafe(self._tracker.resolve, reply)
+
+    def start(self):
+        if self._reply_reader is None:
+            self._reply_reader = threading.Thread(
+                target=self.__read_replies, args=(asyncio.get_running_loop(),), name=f"replies-{self._id}", daemon=True
+            )
+            self._reply_reader.start()
+
+        self._cradle.set_restore(self._restore_on_start or self._started_at is not None)
+        if self._warm:
+            if self._spare is None or not self._spare.is_alive():
+                self._spare = self.__fork_spare()
+            self._process = self._spare
+            self._process.release()
+            # the next spare only ever runs as a restart
+            self._cradle.set_restore(True)
+            self._spare = self.__fork_spare() if self._restart_policy.can_restart(self._restarts) else None
+        elif self._threaded:
+            self._process = JobThread(target=self._cradle, name=f"job-{self._id}")
+            self._process.start()
+        else:
+            self._process = GovernedProcess(target=self._cradle, governor=self._governor)
+            self._process.start()
+            self.__check_governed(self._process)
+        self._started_at = time.monotonic()
+        # the sentinel becomes readable when the process exits. watching it on the event loop
+        # costs no thread, however many jobs there are
+        self._exited = asyncio.Event()
+        asyncio.get_running_loop().add_reader(self._process.sentinel, self.__on_exit, self._process.sentinel, self._exited)
+        logger.info("+----------")
+        logger.info(f"| Launched target {'thread' if self._threaded else 'process'} [{self._id}]. PID: [{self._process.pid}]")
+        logger.info(f"|  argv: {' '.join(sys.argv[1:])}")
+        logger.info("+----------")
+
+        if not self._threaded:
+            self._watchdog.reset()
+            self._sampler.attach(self._process.pid)
+            self._sampler.start()
+
+    def __on_sample(self, snapshot: dict[str, Any]):
+        action = self._watchdog.check(snapshot)
+        if action == "restart" and self.is_alive() and self._shutdown_task is None:
+            alert = self._watchdog.state()["last-alert"]
+            self.shutdown(f"rss {alert['rss-mb']:.0f}MB over the {alert['level']} limit of {alert['threshold-mb']}MB", restart=True)
+
+    def send(self, cmd: Command, body: bytes = b"", content_type: str | None = None, blob: dict[str, Any] | None = None) -> CommandTicket:
+        """
+        queue a command with its raw payload. it is decoded in the job process.
+        blob: descriptor of a spooled upload, sent instead of a body
+        """
+        ticket = self._tracker.issue(self._id, cmd)
+        msg = {"id": ticket.id(), "cmd": cmd, "body": body, "content-type": content_type}
+        if blob is not None:
+            msg["blob"] = blob
+        self._command_queue.put(msg)
+        return ticket
+
+    def profile(self, kind: str, params: dict[str, Any]) -> CommandTicket:
+        """
+        ask the job process to profile itself (kind cpu or memory). the result arrives as the
+        ticket's result
+        """
+        ticket = self._tracker.issue(self._id, Command.PROFILE)
+        self._control_queue.put({"id": ticket.id(), "cmd": Command.PROFILE, "kind": kind, "params": params})
+        return ticket
+
+    def status(self) -> dict[str, Any] | None:
+        return self._status_slot.read()
+
+    def status_seq(self) -> int:
+        """
+        number of status updates published by the job so far
+        """
+        return self._status_slot.seq()
+
+    def queue_depth(self) -> int | None:
+        """
+        commands queued but not yet picked up by the job. None where the platform cannot tell
+        """
+        try:
+            return self._command_queue.qsize()
+        except NotImplementedError:
+            return None
+
+    def metrics(self) -> list[dict[str, Any]]:
+        """
+        counters, gauges, histograms and timers registered by the job
+        """
+        return self._metrics.collect()
+
+    def snapshot(self) -> tuple[dict[str, Any], float | None]:
+        return self._sampler.snapshot()
+
+    def watchdog(self) -> dict[str, Any] | None:
+        """
+        memory watchdog limits and alert counts. None if no limits are configured
+        """
+        return self._watchdog.state()
+
+    def zombie(self) -> bool:
+        """
+        the job thread was abandoned by kill but still runs
+        """
+        return self._threaded and self._process is not None and self._process.zombie()
+
+    def restarts(self) -> dict[str, Any]:
+        return {
+            "policy": self._restart_policy.policy(),
+            "count": self._restarts,
+            "last-exit-code": self._last_exit_code,
+            "zombie": self.zombie(),
+        }
+
+    def kill(self):
+        """
+        kill the process. a killed job is not restarted
+        """
+        self._stopping = True
+        if self._process:
+            self._process.kill()
+        self.__discard_spare()
+
+    def shutdown(self, reason: str = "requested", restart: bool = False) -> asyncio.Task:
+        """
+        start the staged shutdown in the background, or return the one already running.
+        with restart the job is started again afterwards whatever the restart policy says,
+        otherwise it is not restarted (this also turns a pending restart into a stop)
+        """
+        if not restart:
+            self._stopping = True
+            self._restart_requested = False
+        if self._shutdown_task is None:
+            self._restart_requested = restart
+            self._shutdown = {"reason": reason, "stage": "requested", "requested-at": time.time(), "stage-deadline": None, "exit-code": None}
+            self._shutdown_task = asyncio.create_task(self.__shutdown())
+        return self._shutdown_task
+
+    def shutdown_state(self) -> dict[str, Any] | None:
+        """
+        progress of the shutdown: {"reason", "stage": requested | stop | terminate | kill | done,
+        "requested-at", "stage-deadline", "exit-code"}. None unless a shutdown was requested.
+        exit-code is filled in once the process was reaped
+        """
+        return self._shutdown
+
+    def __enter_stage(self, stage: str, timeout: float | None = None):
+        self._shutdown["stage"] = stage
+        self._shutdown["stage-deadline"] = time.time() + timeout if timeout is not None else None
+        logger.warning(f"Shutting down job [{self._id}]: {stage}" + (f" (deadline {timeout}s)" if timeout is not None else ""))
+
+    async def __exited(self, exited: asyncio.Event, timeout: float) -> bool:
+        """
+        wait up to timeout seconds for the process to exit. does not reap it, wait() does
+        """
+        try:
+            await asyncio.wait_for(exited.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __shutdown(self):
+        process, exited_event = self._process, self._exited
+        exited = process is None or exited_event.is_set()
+
+        if not exited and self._stop_timeout > 0:
+            deadline = time.time() + self._stop_timeout
+            self.__enter_stage("stop", self._stop_timeout)
+            body = json.dumps({"shutdown": {"reason": self._shutdown["reason"], "deadline": deadline}}).encode("utf-8")
+            self.send(Command.STOP, body, "application/json")
+            exited = await self.__exited(exited_event, self._stop_timeout)
+
+        if not exited and self._term_timeout > 0:
+            self.__enter_stage("terminate", self._term_timeout)
+            process.terminate()
+            exited = await self.__exited(exited_event, self._term_timeout)
+
+        if not exited:
+            self.__enter_stage("kill")
+            process.kill()
+            await self.__exited(exited_event, ManagedJob.REPLY_POLL)
+
+        self.__discard_spare()
+        self.__enter_stage("done")
+
+    def __discard_spare(self):
+        if self._spare is not None:
+            self._spare.kill()
+            self._spare.join()
+            self._spare = None
+
+    async def wait(self) -> int:
+        """
+        wait (without blocking the event loop) for the job to finish, restarting its
+        process as the restart policy allows. returns the exit code of the last process
+        """
+        while True:
+            await self._exited.wait()
+            self._process.join()
+            exit_code = self._process.exitcode
+            self._last_exit_code = exit_code
+
+            if (self._restart_requested or self._restart_policy.should_restart(exit_code, self._restarts)) and self.__zombie_blocks_restart():
+                break
+
+            if self._restart_requested and not self._stopping:
+                await self._shutdown_task
+                self._shutdown["exit-code"] = exit_code
+                self._shutdown_task = None
+                self._restart_requested = False
+                self._restarts += 1
+                logger.warning(f"Restarting job [{self._id}]: {self._shutdown['reason']}")
+                self.start()
+                continue
+
+            if self._stopping or not self._restart_policy.should_restart(exit_code, self._restarts):
+                break
+
+            if time.monotonic() - self._started_at > self._restart_policy.stable_after():
+                self._consecutive_restarts = 0
+            delay = self._restart_policy.backoff(self._consecutive_restarts)
+            logger.warning(f"Job [{self._id}] exited with {exit_code}. Restart {self._restarts + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            if self._stopping:
+                break
+
+            self._restarts += 1
+            self._consecutive_restarts += 1
+            self.start()
+
+        if self._shutdown_task is not None:
+            await self._shutdown_task
+            self._shutdown["exit-code"] = exit_code
+        await self._sampler.stop()
+        return exit_code
+
+    def __zombie_blocks_restart(self) -> bool:
+        if not self.zombie():
+            return False
+        logger.error(f"Job [{self._id}] not restarted: its abandoned thread still runs and would take the commands of the new one")
+        return True
+
+    def close(self):
+        self._closing.set()
+        if self._reply_reader is not None:
+            self._reply_reader.join()
+        self.__discard_spare()
+        self._status_slot.close()
+        self._metrics.close()
@@ -0,0 +1,505 @@
+import math
+import re
+import struct
+import threading
+import time
+from bisect import bisect_left
+from enum import Enum
+from multiprocessing import shared_memory
+from typing import Any
+
+
+class MetricsError(Exception):
+    pass
+
+
+class MetricKind(str, Enum):
+    COUNTER = "counter"
+    GAUGE = "gauge"
+    HISTOGRAM = "histogram"
+    SUMMARY = "summary"
+
+
+# latency style default, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# quantiles reported for timers
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+METRIC_NAME = re.compile(r"^[a-zA-Z_:][a-zA-Z0-9_:]*$")
+
+
+class Counter:
+    """
+    monotonic value. only the job process (the single writer) updates it
+    """
+
+    def __init__(self, values: memoryview):
+        # float64 view straight onto the slot: an update is a plain store, no (un)packing
+        self._values = values
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise MetricsError(f"Counters only go up. Got: {amount}")
+        self._values[0] += amount
+
+    def value(self) -> float:
+        return self._values[0]
+
+    def release(self):
+        self._values.release()
+
+
+class Gauge(Counter):
+    """
+    value that goes up and down
+    """
+
+    def inc(self, amount: float = 1.0):
+        self._values[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._values[0] -= amount
+
+    def set(self, value: float):
+        self._values[0] = value
+
+
+class Histogram(Counter):
+    """
+    observations counted into fixed buckets (upper bounds, inclusive) plus +Inf
+    """
+
+    def __init__(self, values: memoryview, bounds: tuple[float, ...]):
+        super().__init__(values)
+        self._bounds = bounds
+
+    def observe(self, value: float):
+        values = self._values
+        values[MetricsRegistry.MAX_BUCKETS + bisect_left(self._bounds, value)] += 1
+        values[MetricsRegistry.SUM_INDEX] += value
+        values[MetricsRegistry.COUNT_INDEX] += 1
+
+
+class Timing:
+    """
+    context manager timing its block into a Timer
+    """
+
+    __slots__ = ("_timer", "_started")
+
+    def __init__(self, timer: "Timer"):
+        self._timer = timer
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._timer.observe(time.perf_counter() - self._started)
+
+
+class Timer(Counter):
+    """
+    HDR style latency histogram: log-linear buckets over microseconds, SUB_BUCKETS per power
+    of two, i.e. values are kept to within 1/SUB_BUCKETS (12.5%) from 1us to ~19h. Recording
+    is a few float stores. The harness derives quantiles from the buckets.
+        with timer.time():
+            ...
+    """
+
+    SUB_BITS = 3
+    SUB_BUCKETS = 1 << SUB_BITS
+    BUCKETS = 280
+    SUM_INDEX = BUCKETS
+    COUNT_INDEX = BUCKETS + 1
+    MIN_INDEX = BUCKETS + 2
+    MAX_INDEX = BUCKETS + 3
+    VALUES = BUCKETS + 4
+
+    @staticmethod
+    def bucket(seconds: float) -> int:
+        us = int(seconds * 1e6)
+        if us < Timer.SUB_BUCKETS:
+            return max(us, 0)
+        shift = us.bit_length() - Timer.SUB_BITS - 1
+        return min(Timer.SUB_BUCKETS * (shift + 1) + (us >> shift) - Timer.SUB_BUCKETS, Timer.BUCKETS - 1)
+
+    @staticmethod
+    def bucket_bounds(bucket: int) -> tuple[float, float]:
+        """
+        [lower, upper) of a bucket, in seconds
+        """
+        if bucket < Timer.SUB_BUCKETS:
+            return bucket / 1e6, (bucket + 1) / 1e6
+        shift, sub = divmod(bucket - Timer.SUB_BUCKETS, Timer.SUB_BUCKETS)
+        lower = (Timer.SUB_BUCKETS + sub) << shift
+        return lower / 1e6, (lower + (1 << shift)) / 1e6
+
+    def observe(self, seconds: float):
+        values = self._values
+        values[Timer.bucket(seconds)] += 1
+        values[Timer.SUM_INDEX] += seconds
+        count = values[Timer.COUNT_INDEX]
+        values[Timer.COUNT_INDEX] = count + 1
+        if count == 0 or seconds < values[Timer.MIN_INDEX]:
+            values[Timer.MIN_INDEX] = seconds
+        if seconds > values[Timer.MAX_INDEX]:
+            values[Timer.MAX_INDEX] = seconds
+
+    def time(self) -> Timing:
+        return Timing(self)
+
+    @staticmethod
+    def summarize(values: tuple[float, ...], quantiles: tuple[float, ...] = QUANTILES) -> dict[str, Any]:
+        """
+        {"count", "sum", "min", "max", "mean", "quantiles": {q: seconds}} from the raw values.
+        a quantile is the middle of its bucket, clamped to [min, max]
+        """
+        count = values[Timer.COUNT_INDEX]
+        low, high = values[Timer.MIN_INDEX], values[Timer.MAX_INDEX]
+        summary = {
+            "count": count,
+            "sum": values[Timer.SUM_INDEX],
+            "min": low if count else None,
+            "max": high if count else None,
+            "mean": values[Timer.SUM_INDEX] / count if count else None,
+            "quantiles": {},
+        }
+        if not count:
+            return summary
+
+        targets = sorted(quantiles)
+        seen = 0.0
+        for bucket in range(Timer.BUCKETS):
+            seen += values[bucket]
+            while targets and seen >= targets[0] * count:
+                lower, upper = Timer.bucket_bounds(bucket)
+                summary["quantiles"][targets.pop(0)] = min(max((lower + upper) / 2, low), high)
+            if not targets:
+                break
+        return summary
+
+
+class MetricsRegistry:
+    """
+    Job defined counters, gauges, histograms and timers kept in a shared memory segment. The
+    job process registers and updates them in place; the harness reads the segment when
+    /metrics or /status is requested. Neither side sends a message to the other.
+
+        | used: u32 | pad: 4 | slot 0 | slot 1 | ...
+
+        slot: | name: 64s | help: 128s | kind: u8 | buckets: u8 | span: u16 | pad: 4 | values: 35 x f64 |
+
+    counter and gauge values live in values[0]. a histogram stores its upper bounds in
+    values[0:16], its bucket counts (the last one is +Inf) in values[16:33], then sum and count.
+    a timer spans `span` consecutive slots: its values run on over the following slots
+    (which have no header of their own) and hold Timer.VALUES floats.
+
+    A slot is filled in before `used` is bumped, so the reader never sees a half registered
+    metric. Values are updated without locks: updates from several threads of the job may
+    race and lose an increment, a reader may see a histogram mid update.
+    Metrics are found again by name after the job restarts and keep their values.
+    """
+
+    HEADER = struct.Struct("<I4x")
+    SLOT_HEADER = struct.Struct("<64s128sBBH4x")
+    VALUE = struct.Struct("<d")
+    MAX_BUCKETS = 16
+    SUM_INDEX = 2 * MAX_BUCKETS + 1
+    COUNT_INDEX = SUM_INDEX + 1
+    VALUES = COUNT_INDEX + 1
+    SLOT_SIZE = SLOT_HEADER.size + VALUES * VALUE.size
+    DEFAULT_SLOTS = 256
+
+    KINDS = [MetricKind.COUNTER, MetricKind.GAUGE, MetricKind.HISTOGRAM, MetricKind.SUMMARY]
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, name: str | None = None):
+        """
+        slots: max number of metrics (a timer takes several). name: attach to an existing
+        registry instead of creating one
+        """
+        self._owner = name is None
+        size = MetricsRegistry.HEADER.size + slots * MetricsRegistry.SLOT_SIZE
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=size if self._owner else 0)
+        self._slots = slots
+        self._metrics: dict[str, Counter] = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return (MetricsRegistry, (self._slots, self._shm.name))
+
+    def name(self) -> str:
+        return self._shm.name
+
+    @staticmethod
+    def span(kind: MetricKind) -> int:
+        """
+        number of slots a metric of this kind takes
+        """
+        if kind != MetricKind.SUMMARY:
+            return 1
+        values_size = Timer.VALUES * MetricsRegistry.VALUE.size
+        return 1 + math.ceil(max(values_size - MetricsRegistry.VALUES * MetricsRegistry.VALUE.size, 0) / MetricsRegistry.SLOT_SIZE)
+
+    def __used(self) -> int:
+        return MetricsRegistry.HEADER.unpack_from(self._shm.buf, 0)[0]
+
+    def __offset(self, slot: int) -> int:
+        return MetricsRegistry.HEADER.size + slot * MetricsRegistry.SLOT_SIZE
+
+    def __read_header(self, slot: int) -> tuple[str, str, MetricKind, int, int]:
+        name, help, kind, buckets, span = MetricsRegistry.SLOT_HEADER.unpack_from(self._shm.buf, self.__offset(slot))
+        return (
+            name.rstrip(b"\0").decode("utf-8"),
+            help.rstrip(b"\0").decode("utf-8", "ignore"),
+            MetricsRegistry.KINDS[kind],
+            buckets,
+            max(span, 1),
+        )
+
+    def __values_count(self, kind: MetricKind) -> int:
+        return Timer.VALUES if kind == MetricKind.SUMMARY else MetricsRegistry.VALUES
+
+    def __values(self, slot: int, kind: MetricKind) -> tuple[float, ...]:
+        offset = self.__offset(slot) + MetricsRegistry.SLOT_HEADER.size
+        return struct.unpack_from(f"<{self.__values_count(kind)}d", self._shm.buf, offset)
+
+    def __slots(self):
+        """
+        (slot, header) of every registered metric
+        """
+        slot, used = 0, self.__used()
+        while slot < used:
+            header = self.__read_header(slot)
+            yield slot, header
+            slot += header[4]
+
+    def __register(self, name: str, help: str, kind: MetricKind, bounds: tuple[float, ...] = ()):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name) or self.__create(name, help, kind, bounds)
+        if type(metric) is not MetricsRegistry.TYPES[kind]:
+            raise MetricsError(f"Metric {name} is already registered with a different type")
+        return metric
+
+    def __create(self, name: str, help: str, kind: MetricKind, bounds: tuple[float, ...]):
+        if not METRIC_NAME.match(name) or len(name.encode("utf-8")) > 64:
+            raise MetricsError(f"Invalid metric name (at most 64 chars of [a-zA-Z0-9_:]): {name}")
+        if len(bounds) > MetricsRegistry.MAX_BUCKETS:
+            raise MetricsError(f"Histogram {name} has {len(bounds)} buckets, at most {MetricsRegistry.MAX_BUCKETS} are supported")
+        if list(bounds) != sorted(set(bounds)):
+            raise MetricsError(f"Histogram {name} buckets must be strictly increasing")
+
+        slot = next((s for s, header in self.__slots() if header[0] == name), None)
+        if slot is not None:
+            _, _, registered_kind, buckets, _ = self.__read_header(slot)
+            if registered_kind != kind or (kind == MetricKind.HISTOGRAM and tuple(self.__values(slot, kind)[:buckets]) != bounds):
+                raise MetricsError(f"Metric {name} is already registered with a different type or buckets")
+        else:
+            used, span = self.__used(), MetricsRegistry.span(kind)
+            if used + span > self._slots:
+                raise MetricsError(f"Metrics registry is full ({self._slots} slots). Increase harness.metrics-slots")
+            slot = used
+            offset = self.__offset(slot)
+            MetricsRegistry.SLOT_HEADER.pack_into(
+                self._shm.buf,
+                offset,
+                name.encode("utf-8"),
+                help.encode("utf-8")[:128],
+                MetricsRegistry.KINDS.index(kind),
+                len(bounds),
+                span,
+            )
+            values = [0.0] * self.__values_count(kind)
+            values[: len(bounds)] = bounds
+            struct.pack_into(f"<{len(values)}d", self._shm.buf, offset + MetricsRegistry.SLOT_HEADER.size, *values)
+            MetricsRegistry.HEADER.pack_into(self._shm.buf, 0, used + span)
+
+        start = self.__offset(slot) + MetricsRegistry.SLOT_HEADER.size
+        values = self._shm.buf[start : start + self.__values_count(kind) * MetricsRegistry.VALUE.size].cast("d")
+        if kind == MetricKind.HISTOGRAM:
+            metric = Histogram(values, bounds)
+        else:
+            metric = MetricsRegistry.TYPES[kind](values)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self.__register(name, help, MetricKind.COUNTER)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self.__register(name, help, MetricKind.GAUGE)
+
+    def histogram(self, name: str, help: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.__register(name, help, MetricKind.HISTOGRAM, tuple(float(b) for b in buckets))
+
+    def timer(self, name: str, help: str = "") -> Timer:
+        return self.__register(name, help, MetricKind.SUMMARY)
+
+    def collect(self) -> list[dict[str, Any]]:
+        """
+        current value of every registered metric:
+            {"name", "help", "kind", "value"} for counters and gauges
+            {"name", "help", "kind", "buckets": [(upper bound, cumulative count), ...], "sum", "count"} for histograms
+            {"name", "help", "kind", "count", "sum", "min", "max", "mean", "quantiles": {q: seconds}} for timers
+        """
+        metrics = []
+        for slot, (name, help, kind, buckets, _) in self.__slots():
+            values = self.__values(slot, kind)
+            metric = {"name": name, "help": help, "kind": kind}
+            if kind == MetricKind.HISTOGRAM:
+                counts = values[MetricsRegistry.MAX_BUCKETS : MetricsRegistry.MAX_BUCKETS + buckets + 1]
+                metric["buckets"] = cumulative(values[:buckets], counts)
+                metric["sum"] = values[MetricsRegistry.SUM_INDEX]
+                metric["count"] = values[MetricsRegistry.COUNT_INDEX]
+            elif kind == MetricKind.SUMMARY:
+                metric.update(Timer.summarize(values))
+            else:
+                metric["value"] = values[0]
+            metrics.append(metric)
+        return metrics
+
+    def close(self):
+        """
+        detach. the creating side also removes the segment
+        """
+        for metric in self._metrics.values():
+            metric.release()
+        self._metrics.clear()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+MetricsRegistry.TYPES = {MetricKind.COUNTER: Counter, MetricKind.GAUGE: Gauge, MetricKind.HISTOGRAM: Histogram, MetricKind.SUMMARY: Timer}
+
+
+def cumulative(bounds: tuple[float, ...], counts: tuple[float, ...]) -> list[tuple[float, float]]:
+    """
+    per bucket counts (the last one for +Inf) -> [(upper bound, cumulative count), ...]
+    """
+    total = 0.0
+    buckets = []
+    for bound, count in zip(list(bounds) + [math.inf], counts):
+        total += count
+        buckets.append((bound, total))
+    return buckets
+
+
+class RequestMetrics:
+    """
+    Harness side request counters and latency histograms, by route template
+    (e.g. /jobs/{job_id}/hb so the number of series does not grow with job ids or bad urls)
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self._bounds = tuple(buckets)
+        self._counts: dict[tuple[str, str, int], int] = {}
+        self._latency: dict[tuple[str, str], list[float]] = {}
+
+    def observe(self, route: str, method: str, status: int, seconds: float):
+        key = (route, method, status)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+        # [per bucket counts..., +Inf count, sum, count]
+        latency = self._latency.get((route, method))
+        if latency is None:
+            latency = self._latency[(route, method)] = [0.0] * (len(self._bounds) + 3)
+        latency[bisect_left(self._bounds, seconds)] += 1
+        latency[-2] += seconds
+        latency[-1] += 1
+
+    def counts(self) -> dict[tuple[str, str, int], int]:
+        return self._counts
+
+    def latency(self) -> dict[tuple[str, str], dict[str, Any]]:
+        return {
+            key: {"buckets": cumulative(self._bounds, values[:-2]), "sum": values[-2], "count": values[-1]}
+            for key, values in self._latency.items()
+        }
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every http request into a RequestMetrics. Requests that match
+    no route are counted under the route "<unmatched>"
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self._app = app
+        self._metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self._app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "<unmatched>")
+            self._metrics.observe(path, scope["method"], status[0], time.perf_counter() - started)
+
+
+class MetricsText:
+    """
+    Builds a scrape in the Prometheus text exposition format (version 0.0.4),
+    which OpenMetrics scrapers also accept. Samples of a metric must be added together.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: list[str] = []
+
+    @staticmethod
+    def __value(value: float) -> str:
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(float(value))
+
+    @staticmethod
+    def __labels(labels: dict[str, Any]) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels.items()
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def family(self, name: str, kind: MetricKind, help: str = ""):
+        help = help.replace("\\", "\\\\").replace("\n", "\\n")
+        self._lines.append(f"# HELP {name} {help}")
+        self._lines.append(f"# TYPE {name} {MetricKind(kind).value}")
+
+    def sample(self, name: str, value: float, labels: dict[str, Any] | None = None):
+        self._lines.append(f"{name}{MetricsText.__labels(labels)} {MetricsText.__value(value)}")
+
+    def histogram(self, name: str, buckets: list[tuple[float, float]], sum: float, count: float, labels: dict[str, Any] | None = None):
+        labels = labels or {}
+        for bound, total in buckets:
+            self.sample(f"{name}_bucket", total, {**labels, "le": MetricsText.__value(bound)})
+        self.sample(f"{name}_sum", sum, labels)
+        self.sample(f"{name}_count", count, labels)
+
+    def summary(self, name: str, quantiles: dict[float, float], sum: float, count: float, labels: dict[str, Any] | None = None):
+        labels = labels or {}
+        for q, value in quantiles.items():
+            self.sample(name, value, {**labels, "quantile": q})
+        self.sample(f"{name}_sum", sum, labels)
+        self.sample(f"{name}_count", count, labels)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -1,67 +1,200 @@
-import datetime as dt
+import time
 from multiprocessing import Process
 from typing import Any
 
-import psutil
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
 from bqm.harness.commands import Command
+from bqm.harness.metrics import MetricKind
 
 
 class MessageFactory:
 
-    def mk_hb_response(rqst: Request, process: Process = None, status: bool = True) -> JSONResponse:
+    # class of every response built here. the harness sets it from harness.json (see json_response_class)
+    RESPONSE: type[JSONResponse] = JSONResponse
+    # (epoch second, the second formatted): formatting the date and time once a second rather than per response
+    _second: tuple[int | None, str] = (None, "")
 
-        ps_proc = psutil.Process(process.pid)
+    def now() -> str:
+        """
+        local time as %Y-%m-%d %H:%M:%S.%f
+        """
+        now = time.time()
+        second = int(now)
+        cached = MessageFactory._second
+        if cached[0] != second:
+            cached = MessageFactory._second = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+        return f"{cached[1]}.{int((now - second) * 1e6):06d}"
+
+    def hb_content(process: Process = None, snapshot: dict[str, Any] = None, sampled_at: float | None = None) -> dict[str, Any]:
+        process_state = dict(snapshot) if snapshot else {"pid": process.pid if process else None}
+        process_state["sampled-at"] = sampled_at
+        process_state["snapshot-age-s"] = time.time() - sampled_at if sampled_at else None
+        return process_state
+
+    def metrics_content(metrics: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        job defined metrics for /status: name -> value for counters and gauges, name -> {"count", "sum"}
+        for histograms, name -> {"count", "sum", "min", "max", "mean", "p50", "p90", "p99", "p99.9"} for timers
+        """
+        content = {}
+        for metric in metrics:
+            if metric["kind"] == MetricKind.SUMMARY:
+                summary = {k: metric[k] for k in ("count", "sum", "min", "max", "mean")}
+                summary.update({f"p{q * 100:g}": v for q, v in metric["quantiles"].items()})
+                content[metric["name"]] = summary
+            elif metric["kind"] == MetricKind.HISTOGRAM:
+                content[metric["name"]] = {"count": metric["count"], "sum": metric["sum"]}
+            else:
+                content[metric["name"]] = metric["value"]
+        return content
+
+    def mk_hb_response(
+        rqst: Request, process: Process = None, snapshot: dict[str, Any] = None, sampled_at: float | None = None, status: bool = True
+    ) -> JSONResponse:
 
         service = {}
-        process_state = {
-            "pid": ps_proc.pid,
-            "name": ps_proc.name(),
-            "status": ps_proc.status(),
-            "cpu-pct": ps_proc.cpu_percent(interval=0.25),
-            "mem-rss-mb": ps_proc.memory_info().rss / (1024 * 1024),
-            "threads": ps_proc.num_threads(),
-            "open-files": ps_proc.open_files(),
-            "created": ps_proc.create_time(),
-        }
-        return JSONResponse(
+        return MessageFactory.RESPONSE(
             content={
                 "status": status,
-                "time": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "time": MessageFactory.now(),
                 "service": service,
-                "process": process_state,
+                "process": MessageFactory.hb_content(process, snapshot, sampled_at),
             }
         )
 
-    def mk_cmd_response(rqst: Request, cmd: Command, process: Process = None) -> JSONResponse:
-        return JSONResponse(
+    def mk_jobs_hb_response(rqst: Request, jobs: dict[str, dict[str, Any]]) -> JSONResponse:
+        """
+        jobs: job id -> {"status": alive, "process": hb_content}
+        """
+        return MessageFactory.RESPONSE(
+            content={
+                "status": all(j["status"] for j in jobs.values()),
+                "time": MessageFactory.now(),
+                "service": {},
+                "jobs": jobs,
+            }
+        )
+
+    def mk_cmd_response(rqst: Request, cmd: Command, process: Process = None, ticket: str | None = None) -> JSONResponse:
+        return MessageFactory.RESPONSE(
             content={
                 "status": "SENT",
                 "command": cmd,
-                "target-process": process.pid,
-                "time": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "ticket": ticket,
+                "target-process": process.pid if process else None,
+                "time": MessageFactory.now(),
+            }
+        )
+
+    def mk_ticket_response(rqst: Request, ticket: dict[str, Any], finished: bool = True) -> JSONResponse:
+        """
+        state of a command ticket. 202 while the job has not replied yet
+        """
+        return MessageFactory.RESPONSE(
+            status_code=200 if finished else 202,
+            content={
+                **ticket,
+                "time": MessageFactory.now(),
+            },
+        )
+
+    def mk_tickets_response(rqst: Request, cmd: Command, tickets: dict[str, dict[str, Any]]) -> JSONResponse:
+        """
+        tickets: job id -> ticket state. 202 while any job has not replied yet
+        """
+        return MessageFactory.RESPONSE(
+            status_code=200 if all(t["state"] in ("DONE", "FAILED") for t in tickets.values()) else 202,
+            content={
+                "command": cmd,
+                "jobs": tickets,
+                "time": MessageFactory.now(),
+            },
+        )
+
+    def mk_batch_response(rqst: Request, results: list[dict[str, Any]]) -> JSONResponse:
+        """
+        results: one {"command", "jobs": {job id -> ticket state}} per command of the batch, in order.
+        jobs which were not alive have {"state": "ERROR", "error"}. 202 while any job has not replied yet
+        """
+        finished = all(t["state"] in ("DONE", "FAILED", "ERROR") for r in results for t in r["jobs"].values())
+        return MessageFactory.RESPONSE(
+            status_code=200 if finished else 202,
+            content={
+                "command": Command.BATCH,
+                "results": results,
+                "time": MessageFactory.now(),
+            },
+        )
+
+    def mk_broadcast_cmd_response(rqst: Request, cmd: Command, targets: dict[str, dict[str, Any]]) -> JSONResponse:
+        """
+        targets: job id -> {"status": "SENT" | "ERROR", "ticket": id, "target-process": pid, ...}
+        """
+        return MessageFactory.RESPONSE(
+            content={
+                "status": "SENT" if all(t["status"] == "SENT" for t in targets.values()) else "PARTIAL",
+                "command": cmd,
+                "jobs": targets,
+                "time": MessageFactory.now(),
             }
         )
 
     def mk_cmd_err_response(rqst: Request, cmd: Command, error: str, process: Process = None, status_code: int = 500) -> JSONResponse:
-        return JSONResponse(
+        return MessageFactory.RESPONSE(
             status_code=status_code,
             content={
                 "command": cmd,
                 "status": "ERROR",
                 "error": error,
-                "target-process": process.pid,
-                "time": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "target-process": process.pid if process else None,
+                "time": MessageFactory.now(),
             },
         )
 
-    def mk_status_response(rqst: Request, status: dict[str, Any], process: Process = None) -> JSONResponse:
-        return JSONResponse(
+    def mk_status_response(
+        rqst: Request,
+        status: dict[str, Any],
+        process: Process = None,
+        restarts: dict[str, Any] = None,
+        shutdown: dict[str, Any] = None,
+        watchdog: dict[str, Any] = None,
+        metrics: list[dict[str, Any]] = None,
+    ) -> JSONResponse:
+        return MessageFactory.RESPONSE(
             content={
                 "process-status": status if status else {},
-                "target-process": process.pid,
-                "time": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "target-process": process.pid if process else None,
+                "restarts": restarts if restarts else {},
+                "shutdown": shutdown,
+                "memory-watchdog": watchdog,
+                "metrics": MessageFactory.metrics_content(metrics or []),
+                "time": MessageFactory.now(),
+            },
+        )
+
+    def mk_shutdown_response(rqst: Request, jobs: dict[str, dict[str, Any] | None]) -> JSONResponse:
+        """
+        jobs: job id -> shutdown progress (None for jobs not being shut down)
+        """
+        return MessageFactory.RESPONSE(
+            status_code=202,
+            content={
+                "command": Command.KILL,
+                "jobs": jobs,
+                "time": MessageFactory.now(),
+            },
+        )
+
+    def mk_jobs_status_response(rqst: Request, jobs: dict[str, dict[str, Any]]) -> JSONResponse:
+        """
+        jobs: job id -> {"process-status": status, "target-process": pid, "alive": bool, "restarts": {...}, "shutdown": {...},
+               "memory-watchdog": {...}, "metrics": metrics_content}
+        """
+        return MessageFactory.RESPONSE(
+            content={
+                "jobs": jobs,
+                "time": MessageFactory.now(),
             },
         )
@@ -1,18 +1,22 @@
 import asyncio
 import json
 import logging
-import queue
-import sys
-from multiprocessing import Process, Queue
+import time
 from typing import Any
 
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 from bqm.harness.base import ServiceInterface
+from bqm.harness.blob import DEFAULT_SPOOL_DIR, BlobError, BlobSpool
+from bqm.harness.command_channel import CommandTicket, CommandTracker
 from bqm.harness.commands import Command
 from bqm.harness.cradle import Cradle
+from bqm.harness.managed_job import ManagedJob
+from bqm.harness.metrics import MetricKind, MetricsText
 from bqm.harness.msg_factory import MessageFactory
+from bqm.harness.profiler import MAX_SECONDS
+from bqm.harness.streaming import StreamHub, Subscription
 
 logger = logging.getLogger(__name__)
 
@@ -22,101 +26,554 @@ class ProcessHarnessError(Exception):
 
 
 class ProcessHarness(ServiceInterface):
+    """
+    Runs one or more Cradles, each in its own process, behind a single HTTP server.
+    With a single job the root routes (/hb, /start, ...) address that job. With several
+    jobs the root routes aggregate (/hb, /status) or broadcast (commands) and individual
+    jobs are addressed with /jobs/{job_id}/...
+
+    Every command gets a ticket. The caller either waits for the job's reply with
+    ?wait=<seconds> or polls /commands/{ticket}.
+
+    Bulk data is POSTed to /upload. The body is streamed into a spool file on tmpfs and the
+    job receives a handle it maps, instead of the bytes.
+
+    Observers can subscribe to status changes and periodic metrics frames over
+    server sent events (/stream/status) or a websocket (/ws) instead of polling.
+
+    /metrics exports request, job process and job defined metrics for Prometheus.
+    /profile/cpu and /profile/memory have the job process profile itself for a while.
+    """
+
+    DEFAULT_JOB_ID = "main"
+
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
-        self._command_queue = Queue()
-        self._status_queue = Queue()
-        self._process = None
-        self._status = None
-        self._request_counts = {}
+        self._jobs: dict[str, ManagedJob] = {}
+        self._tracker = CommandTracker()
+        stream = self._config.get_stream()
+        self._stream = StreamHub(
+            poll_interval=stream.get("poll-interval", 0.05),
+            metrics_interval=stream.get("metrics-interval", self._config.get_sampler_interval()),
+        )
+        self._stream_keepalive = stream.get("keepalive", 15.0)
+        upload = self._config.get_upload()
+        self._spool = BlobSpool(
+            directory=upload.get("dir", DEFAULT_SPOOL_DIR),
+            max_bytes=upload.get("max-bytes"),
+            ttl=upload.get("ttl", BlobSpool.DEFAULT_TTL),
+        )
 
     async def job_is_alive(self) -> bool:
-        return self._process and self._process.is_alive()
+        return any(j.is_alive() for j in self._jobs.values())
 
-    async def _hb(self, req: Request):
-        if not await self.job_is_alive():
-            return MessageFactory.mk_cmd_err_response(req, cmd=Command.HB, error="Launched process is not alive", process=self._process)
-        return MessageFactory.mk_hb_response(req, process=self._process)
+    def __sole_job(self) -> ManagedJob | None:
+        if len(self._jobs) == 1:
+            return next(iter(self._jobs.values()))
+        return None
+
+    def __get_job(self, job_id: str) -> ManagedJob | None:
+        return self._jobs.get(job_id)
+
+    def __unknown_job(self, req: Request, cmd: Command, job_id: str) -> JSONResponse:
+        return MessageFactory.mk_cmd_err_response(req, cmd=cmd, error=f"Unknown job: {job_id}", status_code=404)
 
-    async def __wrap(self, req: Request, cmd: Command) -> JSONResponse:
-        if not await self.job_is_alive():
-            return MessageFactory.mk_cmd_err_response(req, cmd=cmd, error="Launched process is not alive", process=self._process)
+    def __wait_timeout(self, req: Request) -> float | None:
+        wait = req.query_params.get("wait")
+        if wait is None:
+            return None
+        try:
+            return float(wait)
+        except ValueError:
+            raise ProcessHarnessError(f"wait must be a number of seconds. Got: {wait}")
+
+    # ---------------
+    # per job actions
+    # ---------------
+    def __hb(self, req: Request, job: ManagedJob) -> JSONResponse:
+        if not job.is_alive():
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.HB, error="Launched process is not alive", process=job.process())
+        snapshot, sampled_at = job.snapshot()
+        return MessageFactory.mk_hb_response(req, process=job.process(), snapshot=snapshot, sampled_at=sampled_at)
+
+    def __send(self, cmd: Command, job: ManagedJob | None, **payload) -> dict[str, CommandTicket | None]:
+        """
+        send to the job, or broadcast to every job if none is addressed. job id -> ticket,
+        None for jobs which are not alive
+        """
+        targets = {job.id(): job} if job is not None else self._jobs
+        return {job_id: j.send(cmd, **payload) if j.is_alive() else None for job_id, j in targets.items()}
+
+    async def __respond(
+        self, req: Request, cmd: Command, job: ManagedJob | None, tickets: dict[str, CommandTicket | None], wait: float | None
+    ) -> JSONResponse:
+        if job is not None:
+            ticket = tickets[job.id()]
+            if ticket is None:
+                return MessageFactory.mk_cmd_err_response(req, cmd=cmd, error="Launched process is not alive", process=job.process())
+            if wait is None:
+                return MessageFactory.mk_cmd_response(req, cmd, job.process(), ticket.id())
+            finished = await ticket.wait(wait)
+            return MessageFactory.mk_ticket_response(req, ticket.as_dict(), finished)
+
+        sent = {job_id: t for job_id, t in tickets.items() if t is not None}
+        if wait is None:
+            targets = {
+                job_id: (
+                    {"status": "SENT", "ticket": t.id(), "target-process": self._jobs[job_id].process().pid}
+                    if t is not None
+                    else {"status": "ERROR", "error": "Launched process is not alive", "target-process": None}
+                )
+                for job_id, t in tickets.items()
+            }
+            return MessageFactory.mk_broadcast_cmd_response(req, cmd, targets)
+        await asyncio.gather(*(t.wait(wait) for t in sent.values()))
+        return MessageFactory.mk_tickets_response(req, cmd, {job_id: t.as_dict() for job_id, t in sent.items()})
 
+    async def __wrap(self, req: Request, cmd: Command, job: ManagedJob | None) -> JSONResponse:
+        """
+        forward the raw body to the job(s). it is decoded once, in the job process
+        """
         body = await req.body()
-        if body:
-            try:
-                data = json.loads(body)
-            except Exception as e:
-                msg = f"Failed to parse json: {body}. {e}"
-                logger.error(msg)
-                raise ProcessHarnessError(msg)
-        else:
-            data = {}
-        self._command_queue.put({"cmd": cmd, "data": data})
-        return MessageFactory.mk_cmd_response(req, cmd, self._process)
+        wait = self.__wait_timeout(req)
+        tickets = self.__send(cmd, job, body=body, content_type=req.headers.get("content-type"))
+        return await self.__respond(req, cmd, job, tickets, wait)
+
+    async def __upload(self, req: Request, job: ManagedJob | None) -> JSONResponse:
+        """
+        stream the body into a spool file and send the job(s) its handle. query parameters
+        (other than wait) travel with the handle
+        """
+        wait = self.__wait_timeout(req)
+        if job is not None and not job.is_alive():
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.DATA, error="Launched process is not alive", process=job.process())
+
+        params = {k: v for k, v in req.query_params.items() if k != "wait"}
+        size_hint = req.headers.get("content-length")
+        try:
+            blob = await self._spool.receive(req.stream(), req.headers.get("content-type"), params, int(size_hint) if size_hint else None)
+        except BlobError as e:
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.DATA, error=str(e), status_code=413)
+
+        tickets = self.__send(Command.DATA, job, blob=blob)
+        self._spool.release_when_done(blob["path"], [t for t in tickets.values() if t is not None])
+        return await self.__respond(req, Command.DATA, job, tickets, wait)
+
+    def __status(self, req: Request, job: ManagedJob) -> JSONResponse:
+        return MessageFactory.mk_status_response(req, job.status(), job.process(), job.restarts(), job.shutdown_state(), job.watchdog(), job.metrics())
+
+    def __kill(self, req: Request, job: ManagedJob):
+        """
+        staged shutdown in the background (STOP, SIGTERM, SIGKILL). ?now=true kills right away
+        """
+        if req.query_params.get("now", "false").lower() in ("1", "true", "yes"):
+            if job.process():
+                job.kill()
+                logger.warning(f"Killed managed process [{job.id()}]: {job.process().pid}")
+            return
+        job.shutdown(f"kill requested by {req.client.host if req.client else 'unknown'}")
+
+    # -----------
+    # root routes
+    # -----------
+    async def _hb(self, req: Request):
+        job = self.__sole_job()
+        if job:
+            return self.__hb(req, job)
+
+        jobs = {}
+        for job_id, j in self._jobs.items():
+            snapshot, sampled_at = j.snapshot()
+            jobs[job_id] = {"status": j.is_alive(), "process": MessageFactory.hb_content(j.process(), snapshot, sampled_at)}
+        return MessageFactory.mk_jobs_hb_response(req, jobs)
 
     async def _start(self, req: Request) -> JSONResponse:
-        return await self.__wrap(req, Command.START)
+        return await self.__wrap(req, Command.START, self.__sole_job())
 
     async def _stop(self, req: Request) -> JSONResponse:
-        return await self.__wrap(req, Command.STOP)
+        return await self.__wrap(req, Command.STOP, self.__sole_job())
 
     async def _pause(self, req: Request) -> JSONResponse:
-        return await self.__wrap(req, Command.PAUSE)
+        return await self.__wrap(req, Command.PAUSE, self.__sole_job())
 
     async def _resume(self, req: Request) -> JSONResponse:
-        return await self.__wrap(req, Command.RESUME)
+        return await self.__wrap(req, Command.RESUME, self.__sole_job())
 
     async def _data(self, req: Request) -> JSONResponse:
-        return await self.__wrap(req, Command.CONFIG)
+        return await self.__wrap(req, Command.CONFIG, self.__sole_job())
+
+    async def _upload(self, req: Request) -> JSONResponse:
+        return await self.__upload(req, self.__sole_job())
 
     async def _status(self, req: Request) -> JSONResponse:
-        try:
-            while True:
-                self._status = self._status_queue.get_nowait()
-        except queue.Empty:
-            pass
-        return MessageFactory.mk_status_response(req, self._status, self._process)
+        job = self.__sole_job()
+        if job:
+            return self.__status(req, job)
+
+        jobs = {
+            job_id: {
+                "process-status": j.status() or {},
+                "target-process": j.process().pid if j.process() else None,
+                "alive": j.is_alive(),
+                "restarts": j.restarts(),
+                "shutdown": j.shutdown_state(),
+                "memory-watchdog": j.watchdog(),
+                "metrics": MessageFactory.metrics_content(j.metrics()),
+            }
+            for job_id, j in self._jobs.items()
+        }
+        return MessageFactory.mk_jobs_status_response(req, jobs)
 
     async def _kill(self, req: Request) -> JSONResponse:
         logger.warning(f"!!!! Received KILL command from address: {req.client}")
         logger.warning(" ------------------------------")
-        if self._process:
-            self._process.kill()
-            logger.warning(f"Killed managed process: {self._process.pid}")
+        for job in self._jobs.values():
+            self.__kill(req, job)
         logger.warning(" ------------------------------")
+        return MessageFactory.mk_shutdown_response(req, {job_id: j.shutdown_state() for job_id, j in self._jobs.items()})
+
+    # ----------
+    # job routes
+    # ----------
+    async def _list_jobs(self, req: Request) -> JSONResponse:
+        return self._response_class(
+            content={
+                job_id: {"alive": j.is_alive(), "target-process": j.process().pid if j.process() else None, "execution": j.execution()}
+                for job_id, j in self._jobs.items()
+            }
+        )
+
+    async def _job_hb(self, req: Request, job_id: str) -> JSONResponse:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, Command.HB, job_id)
+        return self.__hb(req, job)
+
+    async def __job_cmd(self, req: Request, cmd: Command, job_id: str) -> JSONResponse:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, cmd, job_id)
+        return await self.__wrap(req, cmd, job)
+
+    async def _job_start(self, req: Request, job_id: str) -> JSONResponse:
+        return await self.__job_cmd(req, Command.START, job_id)
+
+    async def _job_stop(self, req: Request, job_id: str) -> JSONResponse:
+        return await self.__job_cmd(req, Command.STOP, job_id)
+
+    async def _job_pause(self, req: Request, job_id: str) -> JSONResponse:
+        return await self.__job_cmd(req, Command.PAUSE, job_id)
+
+    async def _job_resume(self, req: Request, job_id: str) -> JSONResponse:
+        return await self.__job_cmd(req, Command.RESUME, job_id)
 
-    async def main(self, job: Cradle) -> int:
+    async def _job_data(self, req: Request, job_id: str) -> JSONResponse:
+        return await self.__job_cmd(req, Command.CONFIG, job_id)
 
-        if not isinstance(job, Cradle):
-            raise ProcessHarnessError("Job you want to run must inherit from Cradle.")
+    async def _job_upload(self, req: Request, job_id: str) -> JSONResponse:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, Command.DATA, job_id)
+        return await self.__upload(req, job)
 
-        job.set_queues(self._command_queue, self._status_queue)
+    async def _job_status(self, req: Request, job_id: str) -> JSONResponse:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, Command.HB, job_id)
+        return self.__status(req, job)
+
+    async def _job_kill(self, req: Request, job_id: str) -> JSONResponse:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, Command.KILL, job_id)
+        logger.warning(f"!!!! Received KILL command for job [{job_id}] from address: {req.client}")
+        self.__kill(req, job)
+        return MessageFactory.mk_shutdown_response(req, {job_id: job.shutdown_state()})
+
+    # --------------
+    # batch commands
+    # --------------
+    BATCH_COMMANDS = {
+        "start": Command.START,
+        "stop": Command.STOP,
+        "pause": Command.PAUSE,
+        "resume": Command.RESUME,
+        "config": Command.CONFIG,
+    }
+
+    def __parse_batch(self, batch: Any) -> list[tuple[Command, ManagedJob | None, Any]]:
+        """
+        [{"command": "pause", "job": "a", "data": {...}}, ...] -> [(command, job or None for all jobs, data)].
+        the whole batch is rejected if any entry is invalid
+        """
+        if not isinstance(batch, list) or not batch:
+            raise ProcessHarnessError("Body must be a non empty list of commands")
+        parsed = []
+        for i, entry in enumerate(batch):
+            if not isinstance(entry, dict):
+                raise ProcessHarnessError(f"Command {i} must be an object. Got: {entry}")
+            cmd = ProcessHarness.BATCH_COMMANDS.get(entry.get("command"))
+            if cmd is None:
+                raise ProcessHarnessError(f"Command {i}: unknown command {entry.get('command')}. One of: {list(ProcessHarness.BATCH_COMMANDS)}")
+            job = None
+            if entry.get("job") is not None:
+                job = self.__get_job(entry["job"])
+                if job is None:
+                    raise ProcessHarnessError(f"Command {i}: unknown job {entry['job']}")
+            parsed.append((cmd, job, entry.get("data")))
+        return parsed
+
+    async def _commands(self, req: Request) -> JSONResponse:
+        """
+        send a list of commands in one request, in order. each goes to its job, or to every
+        job if it names none. with ?wait= the replies of all of them are waited for together
+        """
+        try:
+            wait = self.__wait_timeout(req)
+            batch = self.__parse_batch(json.loads(await req.body() or b"null"))
+        except (ValueError, ProcessHarnessError) as e:
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.BATCH, error=str(e), status_code=400)
+
+        sent = []
+        for cmd, job, data in batch:
+            if data is None:
+                sent.append((cmd, self.__send(cmd, job)))
+            else:
+                sent.append((cmd, self.__send(cmd, job, body=json.dumps(data).encode("utf-8"), content_type="application/json")))
+
+        if wait is not None:
+            await asyncio.gather(*(t.wait(wait) for _, tickets in sent for t in tickets.values() if t is not None))
+
+        not_alive = {"state": "ERROR", "error": "Launched process is not alive"}
+        results = [
+            {"command": cmd, "jobs": {job_id: t.as_dict() if t is not None else not_alive for job_id, t in tickets.items()}}
+            for cmd, tickets in sent
+        ]
+        return MessageFactory.mk_batch_response(req, results)
+
+    async def _command_ticket(self, req: Request, ticket_id: str) -> JSONResponse:
+        ticket = self._tracker.get(ticket_id)
+        if ticket is None:
+            return self._response_class(status_code=404, content={"detail": f"Unknown or expired command ticket: {ticket_id}"})
+        return MessageFactory.mk_ticket_response(req, ticket.as_dict(), ticket.finished())
+
+    # ---------
+    # streaming
+    # ---------
+    def __metrics_frame(self, job: ManagedJob) -> dict[str, Any]:
+        snapshot, sampled_at = job.snapshot()
+        return {
+            "alive": job.is_alive(),
+            "process": MessageFactory.hb_content(job.process(), snapshot, sampled_at),
+            "restarts": job.restarts(),
+        }
+
+    def __subscribe(self) -> Subscription:
+        """
+        new subscription primed with the current status of every job
+        """
+        sub = self._stream.subscribe()
+        for job_id, job in self._jobs.items():
+            sub.offer({"type": "status", "job": job_id, "seq": job.status_seq(), "time": time.time(), "status": job.status() or {}})
+        return sub
+
+    async def _stream_status(self, req: Request) -> StreamingResponse:
+        sub = self.__subscribe()
+
+        async def events():
+            try:
+                while True:
+                    frames = await sub.next(self._stream_keepalive)
+                    if frames is None:
+                        break
+                    if not frames:
+                        yield ": keepalive\n\n"
+                    for frame in frames:
+                        yield f"event: {frame['type']}\ndata: {json.dumps(frame, default=str)}\n\n"
+            finally:
+                self._stream.unsubscribe(sub)
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    async def _ws(self, ws: WebSocket):
+        await ws.accept()
+        sub = self.__subscribe()
+        try:
+            while True:
+                frames = await sub.next(self._stream_keepalive)
+                if frames is None:
+                    await ws.close()
+                    break
+                if not frames:
+                    frames = [{"type": "keepalive", "time": time.time()}]
+                for frame in frames:
+                    await ws.send_text(json.dumps(frame, default=str))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._stream.unsubscribe(sub)
+
+    # -------
+    # metrics
+    # -------
+    def __request_metrics(self, text: MetricsText):
+        text.family("harness_http_requests_total", MetricKind.COUNTER, "HTTP requests handled, by route template, method and status")
+        for (route, method, status), count in self._request_metrics.counts().items():
+            text.sample("harness_http_requests_total", count, {"route": route, "method": method, "status": status})
+
+        text.family("harness_http_request_duration_seconds", MetricKind.HISTOGRAM, "HTTP request latency, by route template and method")
+        for (route, method), latency in self._request_metrics.latency().items():
+            text.histogram("harness_http_request_duration_seconds", labels={"route": route, "method": method}, **latency)
+
+    def __job_metrics(self, text: MetricsText):
+        families = [
+            ("harness_job_up", MetricKind.GAUGE, "1 if the job process is alive"),
+            ("harness_job_command_queue_depth", MetricKind.GAUGE, "commands queued but not yet picked up by the job"),
+            ("harness_job_status_updates_total", MetricKind.COUNTER, "status updates published by the job. rate() gives the update rate"),
+            ("harness_job_restarts_total", MetricKind.COUNTER, "restarts of the job process"),
+            ("harness_job_cpu_percent", MetricKind.GAUGE, "cpu use of the job process over the last sampling interval"),
+            ("harness_job_rss_bytes", MetricKind.GAUGE, "resident memory of the job process"),
+            ("harness_job_threads", MetricKind.GAUGE, "threads of the job process"),
+            ("harness_job_memory_alerts_total", MetricKind.COUNTER, "rss limit crossings, by limit (soft, hard)"),
+        ]
+        samples = {name: [] for name, _, _ in families}
+        for job_id, job in self._jobs.items():
+            labels = {"job": job_id}
+            snapshot, _ = job.snapshot()
+            samples["harness_job_up"].append((labels, 1 if job.is_alive() else 0))
+            queue_depth = job.queue_depth()
+            if queue_depth is not None:
+                samples["harness_job_command_queue_depth"].append((labels, queue_depth))
+            samples["harness_job_status_updates_total"].append((labels, job.status_seq()))
+            samples["harness_job_restarts_total"].append((labels, job.restarts()["count"]))
+            if snapshot:
+                samples["harness_job_cpu_percent"].append((labels, snapshot["cpu-pct"]))
+                samples["harness_job_rss_bytes"].append((labels, snapshot["mem-rss-mb"] * 1024 * 1024))
+                samples["harness_job_threads"].append((labels, snapshot["threads"]))
+            watchdog = job.watchdog()
+            if watchdog:
+                for level, count in watchdog["alerts"].items():
+                    samples["harness_job_memory_alerts_total"].append(({**labels, "limit": level}, count))
+
+        for name, kind, help in families:
+            text.family(name, kind, help)
+            for labels, value in samples[name]:
+                text.sample(name, value, labels)
+
+        # job defined metrics. the same name registered by several jobs is one family labelled by job
+        job_families: dict[str, list] = {}
+        for job_id, job in self._jobs.items():
+            for metric in job.metrics():
+                job_families.setdefault(metric["name"], []).append((job_id, metric))
+
+        for name, series in job_families.items():
+            kind, help = series[0][1]["kind"], series[0][1]["help"]
+            text.family(f"job_{name}", kind, help)
+            for job_id, metric in series:
+                if metric["kind"] != kind:
+                    logger.warning(f"Skipping metric {name} of job [{job_id}]: it is a {metric['kind'].value}, another job registered it as a {kind.value}")
+                elif kind == MetricKind.HISTOGRAM:
+                    text.histogram(f"job_{name}", metric["buckets"], metric["sum"], metric["count"], {"job": job_id})
+                elif kind == MetricKind.SUMMARY:
+                    text.summary(f"job_{name}", metric["quantiles"], metric["sum"], metric["count"], {"job": job_id})
+                else:
+                    text.sample(f"job_{name}", metric["value"], {"job": job_id})
+
+    async def _metrics(self, req: Request) -> Response:
+        text = MetricsText()
+        self.__request_metrics(text)
+        self.__job_metrics(text)
+        return Response(content=text.render(), media_type=MetricsText.CONTENT_TYPE)
+
+    # ---------
+    # profiling
+    # ---------
+    PROFILE_KINDS = ["cpu", "memory"]
+    # allowance on top of the profiling window for the job to pick up the request and reply
+    PROFILE_GRACE = 10.0
+
+    async def __profile(self, req: Request, job: ManagedJob, kind: str) -> Response:
+        if kind not in ProcessHarness.PROFILE_KINDS:
+            return MessageFactory.mk_cmd_err_response(
+                req, cmd=Command.PROFILE, error=f"Unknown profile {kind}. One of: {ProcessHarness.PROFILE_KINDS}", status_code=404
+            )
+        params = dict(req.query_params)
+        try:
+            seconds = float(params.get("seconds", 10))
+        except ValueError:
+            seconds = -1
+        if not 0 < seconds <= MAX_SECONDS:
+            return MessageFactory.mk_cmd_err_response(
+                req, cmd=Command.PROFILE, error=f"seconds must be a number in (0, {MAX_SECONDS}]", status_code=400
+            )
+        if not job.is_alive():
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.PROFILE, error="Launched process is not alive", process=job.process())
+
+        ticket = job.profile(kind, params)
+        if not await ticket.wait(seconds + ProcessHarness.PROFILE_GRACE):
+            return MessageFactory.mk_cmd_err_response(
+                req, cmd=Command.PROFILE, error=f"No profile from the job. Poll /commands/{ticket.id()}", process=job.process(), status_code=504
+            )
+        result = ticket.as_dict()
+        if result["error"]:
+            return MessageFactory.mk_cmd_err_response(req, cmd=Command.PROFILE, error=result["error"], process=job.process())
+        return PlainTextResponse(result["result"])
+
+    async def _profile(self, req: Request, kind: str) -> Response:
+        job = self.__sole_job()
+        if job is None:
+            return MessageFactory.mk_cmd_err_response(
+                req, cmd=Command.PROFILE, error="Several jobs are running. Use /jobs/{job_id}/profile/" + kind, status_code=400
+            )
+        return await self.__profile(req, job, kind)
+
+    async def _job_profile(self, req: Request, job_id: str, kind: str) -> Response:
+        job = self.__get_job(job_id)
+        if job is None:
+            return self.__unknown_job(req, Command.PROFILE, job_id)
+        return await self.__profile(req, job, kind)
+
+    # ----
+    # main
+    # ----
+    async def main(self, job: Cradle | dict[str, Cradle]) -> int:
+        """
+        run a single job or a {job id: job} dict of jobs. returns once all jobs have
+        finished with the first non zero exit code (or 0)
+        """
+
+        jobs = job if isinstance(job, dict) else {ProcessHarness.DEFAULT_JOB_ID: job}
+        for job_id, cradle in jobs.items():
+            if not isinstance(cradle, Cradle):
+                raise ProcessHarnessError(f"Job you want to run must inherit from Cradle. Job [{job_id}] does not.")
+
+        self._jobs = {job_id: ManagedJob(job_id, cradle, self._config, self._tracker) for job_id, cradle in jobs.items()}
 
         self._start_server()
 
-        self._process = Process(target=job)
-        self._process.start()
-        logger.info("+----------")
-        logger.info(f"| Launched target process. PID: [{self._process.pid}]")
-        logger.info(f"|  argv: {' '.join(sys.argv[1:])}")
-        logger.info("+----------")
+        for managed in self._jobs.values():
+            managed.start()
+
+        self._stream.start(lambda: self._jobs, self.__metrics_frame)
 
-        # Wait asynchronously for the job to finish
-        exit_code = await self._wait_for_process()
+        # Wait asynchronously for the jobs to finish
+        exit_codes = await asyncio.gather(*(managed.wait() for managed in self._jobs.values()))
 
+        await self._stream.stop()
         await self.stop_server()
-        return exit_code
+        await self._spool.close()
+        for managed in self._jobs.values():
+            managed.close()
 
-    async def _wait_for_process(self) -> int:
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, self._process.join)
-        return self._process.exitcode
+        return next((code for code in exit_codes if code), 0)
 
     async def on_shutdown(self):
-        if await self.job_is_alive():
-            logger.error("+----------")
-            logger.error("| Launched job still alive but shutdown initaited")
-            logger.error(f"| Shutting down launched job due to server shutdown [{self._process.pid}]")
-            logger.error("+----------")
-            self._process.kill()
+        shutdowns = []
+        for job in self._jobs.values():
+            if job.is_alive():
+                logger.error("+----------")
+                logger.error("| Launched job still alive but shutdown initaited")
+                logger.error(f"| Shutting down launched job [{job.id()}] due to server shutdown [{job.process().pid}]")
+                logger.error("+----------")
+                shutdowns.append(job.shutdown("server shutdown"))
+        await asyncio.gather(*shutdowns)
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessSampler:
+    """
+    Samples psutil metrics of the launched process on a fixed cadence in the background.
+    Heartbeats are then served from the cached snapshot and never block the event loop.
+    cpu-pct is measured between two consecutive samples, i.e. over the sampling interval.
+    """
+
+    def __init__(self, interval: float = 1.0, on_sample: Callable[[dict[str, Any]], None] | None = None):
+        """
+        on_sample: called on the event loop with every snapshot taken in the background
+        """
+        self._interval = interval
+        self._on_sample = on_sample
+        self._ps_proc = None
+        self._snapshot = {}
+        self._sampled_at = None
+        self._task = None
+
+    def attach(self, pid: int):
+        """
+        (re)point the sampler at a process and take the first snapshot
+        """
+        self._ps_proc = psutil.Process(pid)
+        self._snapshot = {}
+        self._sampled_at = None
+        self.sample()
+
+    def sample(self) -> dict[str, Any]:
+        ps_proc = self._ps_proc
+        if ps_proc is None:
+            return self._snapshot
+
+        try:
+            with ps_proc.oneshot():
+                snapshot = {
+                    "pid": ps_proc.pid,
+                    "name": ps_proc.name(),
+                    "status": ps_proc.status(),
+                    "cpu-pct": ps_proc.cpu_percent(interval=None),
+                    "mem-rss-mb": ps_proc.memory_info().rss / (1024 * 1024),
+                    "threads": ps_proc.num_threads(),
+                    "open-files": ps_proc.open_files(),
+                    "created": ps_proc.create_time(),
+                }
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            # process went away between samples - keep the last snapshot, it only ages
+            return self._snapshot
+
+        self._snapshot = snapshot
+        self._sampled_at = time.time()
+        return snapshot
+
+    def snapshot(self) -> tuple[dict[str, Any], float | None]:
+        """
+        last sampled metrics and the time they were sampled at (epoch seconds)
+        """
+        return self._snapshot, self._sampled_at
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.__loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                snapshot = await loop.run_in_executor(None, self.sample)
+                if self._on_sample is not None and snapshot:
+                    self._on_sample(snapshot)
+            except Exception as e:
+                logger.warning(f"Process sampling failed: {e}")
@@ -0,0 +1,103 @@
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any
+
+
+class ProfilerError(Exception):
+    pass
+
+
+MAX_SECONDS = 600.0
+DEFAULT_INTERVAL = 0.01
+DEFAULT_LIMIT = 50
+FORMATS = ["collapsed", "top"]
+
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_INTERVAL) -> str:
+    """
+    sampling cpu profile of every thread but the calling one, in collapsed stack format
+    (one "thread;outer (file:line);...;inner (file:line) count" line per distinct stack),
+    ready for flamegraph.pl or speedscope. costs nothing until called; while sampling it
+    walks the frames of all threads every `interval` seconds
+    """
+    me = threading.get_ident()
+    labels: dict[Any, str] = {}
+    counts: Counter = Counter()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                stack.append(label)
+                frame = frame.f_back
+            if ident not in names:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            stack.append(names.get(ident, str(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def trace_allocations(seconds: float, fmt: str = "top", limit: int = DEFAULT_LIMIT, frames: int = 25) -> str:
+    """
+    memory allocated and not freed during the window, from two tracemalloc snapshots.
+        top: the `limit` source lines whose allocations grew the most
+        collapsed: allocation stacks (up to `frames` deep) weighted by bytes, for flame graphs
+    tracing is only switched on for the window unless the job already traces itself
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames if fmt == "collapsed" else 1)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+
+    if fmt == "collapsed":
+        stats = after.compare_to(before, "traceback")
+        return "".join(
+            ";".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback) + f" {stat.size_diff}\n"
+            for stat in stats
+            if stat.size_diff > 0
+        )
+
+    stats = after.compare_to(before, "lineno")
+    grown = sum(stat.size_diff for stat in stats)
+    lines = [f"# {grown / 1024:.1f} KiB allocated and not freed over {seconds}s. top {limit} lines:"]
+    lines += [str(stat) for stat in stats[:limit]]
+    return "\n".join(lines) + "\n"
+
+
+def profile(kind: str, params: dict[str, Any]) -> str:
+    """
+    run the profile requested by the harness: kind cpu or memory
+    """
+    seconds = float(params.get("seconds", 10))
+    if not 0 < seconds <= MAX_SECONDS:
+        raise ProfilerError(f"seconds must be in (0, {MAX_SECONDS}]. Got: {seconds}")
+    if kind == "cpu":
+        return sample_stacks(seconds, float(params.get("interval", DEFAULT_INTERVAL)))
+    if kind == "memory":
+        fmt = params.get("format", "top")
+        if fmt not in FORMATS:
+            raise ProfilerError(f"Unknown format {fmt}. One of: {FORMATS}")
+        return trace_allocations(seconds, fmt, int(params.get("limit", DEFAULT_LIMIT)), int(params.get("frames", 25)))
+    raise ProfilerError(f"Unknown profile: {kind}")
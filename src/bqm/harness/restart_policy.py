@@ -0,0 +1,86 @@
+import random
+from typing import Any
+
+
+class RestartPolicyError(Exception):
+    pass
+
+
+class RestartPolicy:
+    """
+    Decides if and when a finished job process is started again.
+        always     - restart whatever the exit code
+        on-failure - restart on a non zero exit code only
+        never      - do not restart (default)
+    Delays grow exponentially with the number of consecutive restarts and are jittered
+    so that jobs which crashed together do not come back in lock step.
+    """
+
+    ALWAYS = "always"
+    ON_FAILURE = "on-failure"
+    NEVER = "never"
+    POLICIES = [ALWAYS, ON_FAILURE, NEVER]
+
+    def __init__(
+        self,
+        policy: str = NEVER,
+        max_restarts: int = 5,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        backoff_multiplier: float = 2.0,
+        jitter: float = 0.1,
+    ):
+        if policy not in RestartPolicy.POLICIES:
+            raise RestartPolicyError(f"Unknown restart policy {policy}. Expected one of {RestartPolicy.POLICIES}")
+        self._policy = policy
+        self._max_restarts = max_restarts
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._backoff_multiplier = backoff_multiplier
+        self._jitter = jitter
+
+    @staticmethod
+    def from_config(conf: dict[str, Any] | None) -> "RestartPolicy":
+        conf = conf or {}
+        return RestartPolicy(
+            policy=conf.get("policy", RestartPolicy.NEVER),
+            max_restarts=conf.get("max-restarts", 5),
+            backoff_initial=conf.get("backoff-initial", 1.0),
+            backoff_max=conf.get("backoff-max", 60.0),
+            backoff_multiplier=conf.get("backoff-multiplier", 2.0),
+            jitter=conf.get("jitter", 0.1),
+        )
+
+    def policy(self) -> str:
+        return self._policy
+
+    def can_restart(self, restarts: int) -> bool:
+        """
+        could a process still be restarted, whatever it exits with, after restarts so far
+        """
+        return self._policy != RestartPolicy.NEVER and restarts < self._max_restarts
+
+    def should_restart(self, exit_code: int | None, restarts: int) -> bool:
+        """
+        exit_code of the finished process, restarts done so far
+        """
+        if self._policy == RestartPolicy.NEVER:
+            return False
+        if restarts >= self._max_restarts:
+            return False
+        if self._policy == RestartPolicy.ON_FAILURE:
+            return exit_code != 0
+        return True
+
+    def backoff(self, consecutive: int) -> float:
+        """
+        seconds to wait before the next restart after `consecutive` back to back restarts
+        """
+        delay = min(self._backoff_max, self._backoff_initial * self._backoff_multiplier**consecutive)
+        return max(0.0, delay * (1 + random.uniform(-self._jitter, self._jitter)))
+
+    def stable_after(self) -> float:
+        """
+        a process which stayed up this long resets the backoff
+        """
+        return self._backoff_max
@@ -0,0 +1,103 @@
+import json
+import struct
+from multiprocessing import shared_memory
+from typing import Any
+
+
+class StatusSlotError(Exception):
+    pass
+
+
+class StatusSlot:
+    """
+    Latest-value-wins status channel between the job (the single writer) and the harness (reader).
+    Backed by a shared memory segment guarded by a seqlock:
+
+        | seq: u64 | length: u32 | pad: 4 | payload (json) ...
+
+    The writer bumps seq to odd, copies the payload in, then bumps seq to even. A reader retries
+    while seq is odd or has moved during its copy. A writer killed mid-write leaves seq odd; the
+    next write (the restarted job's, the slot outlives it) starts from the following even seq. Neither side waits on the other and there is
+    no backlog - a reader only ever sees the latest status.
+    """
+
+    HEADER = struct.Struct("<QI4x")
+    SEQ = struct.Struct("<Q")
+    LENGTH = struct.Struct("<I")
+    DEFAULT_SIZE = 64 * 1024
+    MAX_READ_RETRIES = 1000
+
+    def __init__(self, size: int = DEFAULT_SIZE, name: str | None = None):
+        """
+        size: max payload bytes. name: attach to an existing slot instead of creating one
+        """
+        self._owner = name is None
+        self._shm = shared_memory.SharedMemory(name=name, create=self._owner, size=size + StatusSlot.HEADER.size if self._owner else 0)
+        self._capacity = self._shm.size - StatusSlot.HEADER.size
+        self._last_seq = 0
+        self._last_value = None
+
+    def __reduce__(self):
+        return (StatusSlot, (self._capacity, self._shm.name))
+
+    def name(self) -> str:
+        return self._shm.name
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    def seq(self) -> int:
+        """
+        number of completed writes so far
+        """
+        return StatusSlot.SEQ.unpack_from(self._shm.buf, 0)[0] // 2
+
+    def write(self, status: dict[str, Any]):
+        payload = json.dumps(status, default=str).encode("utf-8")
+        size = len(payload)
+        if size > self._capacity:
+            raise StatusSlotError(f"Status is {size} bytes, the status slot holds at most {self._capacity}. Increase harness.status-slot-size")
+
+        buf = self._shm.buf
+        seq = StatusSlot.SEQ.unpack_from(buf, 0)[0]
+        seq += seq & 1
+        StatusSlot.SEQ.pack_into(buf, 0, seq + 1)
+        start = StatusSlot.HEADER.size
+        buf[start : start + size] = payload
+        StatusSlot.LENGTH.pack_into(buf, StatusSlot.SEQ.size, size)
+        StatusSlot.SEQ.pack_into(buf, 0, seq + 2)
+
+    def read(self) -> dict[str, Any] | None:
+        """
+        latest status or None if the job never published one. if the writer keeps the slot busy
+        for longer than MAX_READ_RETRIES attempts the previously read value is returned
+        """
+        buf = self._shm.buf
+        start = StatusSlot.HEADER.size
+        for _ in range(StatusSlot.MAX_READ_RETRIES):
+            seq = StatusSlot.SEQ.unpack_from(buf, 0)[0]
+            if seq == 0:
+                return None
+            if seq & 1:
+                continue
+            if seq == self._last_seq:
+                return self._last_value
+
+            size = StatusSlot.LENGTH.unpack_from(buf, StatusSlot.SEQ.size)[0]
+            payload = bytes(buf[start : start + size])
+            if StatusSlot.SEQ.unpack_from(buf, 0)[0] != seq:
+                continue
+
+            self._last_seq = seq
+            self._last_value = json.loads(payload)
+            return self._last_value
+
+        return self._last_value
+
+    def close(self):
+        """
+        detach. the creating side also removes the segment
+        """
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    Mailbox of one stream subscriber. Holds only the latest frame per (type, job) key,
+    so a slow subscriber skips intermediate frames instead of building a backlog.
+    """
+
+    def __init__(self):
+        self._pending: dict[tuple[str, str], dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+        self._coalesced = 0
+        self._closed = False
+
+    def offer(self, frame: dict[str, Any]):
+        key = (frame["type"], frame.get("job"))
+        if key in self._pending:
+            self._coalesced += 1
+        self._pending[key] = frame
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    async def next(self, timeout: float) -> list[dict[str, Any]] | None:
+        """
+        frames accumulated since the last call. empty list on timeout, None once closed
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if self._closed:
+            return None
+        self._ready.clear()
+        frames = list(self._pending.values())
+        self._pending.clear()
+        return frames
+
+    def coalesced(self) -> int:
+        return self._coalesced
+
+
+class StreamHub:
+    """
+    Pushes job status changes and periodic metrics frames to subscribers.
+
+    Status changes are detected by polling the sequence number of each job's status slot
+    every `poll_interval` seconds, which is O(1) and never touches the job. Publishing only
+    fills subscriber mailboxes and never waits for a subscriber. Nothing is polled while
+    there are no subscribers.
+    """
+
+    def __init__(self, poll_interval: float = 0.05, metrics_interval: float = 1.0):
+        self._poll_interval = poll_interval
+        self._metrics_interval = metrics_interval
+        self._subscribers: set[Subscription] = set()
+        self._task = None
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription()
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, frame: dict[str, Any]):
+        for sub in self._subscribers:
+            sub.offer(frame)
+
+    def start(self, jobs: Callable[[], dict[str, Any]], metrics: Callable[[Any], dict[str, Any]]):
+        """
+        jobs: returns the current {job id: ManagedJob}. metrics: ManagedJob -> metrics frame body
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.__loop(jobs, metrics))
+
+    async def stop(self):
+        """
+        stop polling and close all subscriptions so open streams end
+        """
+        for sub in self._subscribers:
+            sub.close()
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __loop(self, jobs: Callable[[], dict[str, Any]], metrics: Callable[[Any], dict[str, Any]]):
+        seen: dict[str, int] = {}
+        last_metrics = 0.0
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            if not self._subscribers:
+                continue
+            try:
+                now = time.time()
+                for job_id, job in jobs().items():
+                    seq = job.status_seq()
+                    if seen.get(job_id) != seq:
+                        seen[job_id] = seq
+                        self.publish({"type": "status", "job": job_id, "seq": seq, "time": now, "status": job.status() or {}})
+
+                if now - last_metrics >= self._metrics_interval:
+                    last_metrics = now
+                    for job_id, job in jobs().items():
+                        self.publish({"type": "metrics", "job": job_id, "time": now, **metrics(job)})
+            except Exception as e:
+                logger.warning(f"Status streaming failed: {e}")
@@ -0,0 +1,61 @@
+import fcntl
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+# pin file -> its open file, holding the shared lock for as long as this process lives
+_held: dict[str, IO] = {}
+_held_lock = threading.Lock()
+
+
+def pin(path: str | Path) -> bool:
+    """
+    mark what path stands for (a cached worktree or snapshot) in use by this process, until unpin
+    or the process exits: a shared flock on path, inherited by forked children. False if path is
+    gone, e.g. removed while waiting for the lock
+    """
+    path = Path(path)
+    with _held_lock:
+        if str(path) in _held:
+            return True
+        try:
+            f = open(path, "r")
+        except FileNotFoundError:
+            return False
+        fcntl.flock(f, fcntl.LOCK_SH)
+        if not path.exists():
+            f.close()
+            return False
+        _held[str(path)] = f
+        return True
+
+
+def unpin(path: str | Path):
+    with _held_lock:
+        f = _held.pop(str(path), None)
+    if f is not None:
+        f.close()
+
+
+@contextmanager
+def unpinned(path: str | Path) -> Iterator[bool]:
+    """
+    with unpinned(path) as free: if free, no process (this one included) pins path and none can
+    until the block exits, so what it stands for can be removed
+    """
+    try:
+        f = open(path, "r")
+    except FileNotFoundError:
+        yield True
+        return
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,188 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tarfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import git
+
+from bqm.utils import cache_pins
+from bqm.utils.logconfig import LogFuzz
+
+logger = LogFuzz.make_logger(__name__)
+
+
+class ExportCacheError(Exception):
+    pass
+
+
+class ExportCache:
+    """
+    Read-only snapshots of commits: the files of the commit's tree (no .git), exported once and
+    never changed, so launching a pinned commit that was launched before is a directory lookup,
+    no git, no network. Addressed by the commit hash (and the exported folders, if not all).
+    Once the snapshots take more than budget_mb the least recently used ones are evicted, but
+    never one a process pins: a snapshot handed out by find or export is pinned until unpin (or
+    the process exits), as jobs run from it.
+
+        cache_dir/exports/<commit>[@sparse-<hash>]/       the files, read-only
+        cache_dir/exports/<commit>[@sparse-<hash>].json   {"commit", "message", "author", "date", "paths", "bytes"}
+                                                          its mtime is the last use, pinned while in use (see cache_pins)
+        cache_dir/exports/.lock
+    """
+
+    DEFAULT_BUDGET_MB = 10 * 1024
+
+    def __init__(self, cache_dir: str | Path, budget_mb: float = DEFAULT_BUDGET_MB):
+        self._dir = Path(cache_dir) / "exports"
+        self._budget = int(budget_mb * 1024 * 1024)
+        self._dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(commit: str, paths: list[str] | None = None) -> str:
+        if not paths:
+            return commit
+        return f"{commit}@sparse-{hashlib.sha1(' '.join(sorted(paths)).encode()).hexdigest()[:8]}"
+
+    @contextmanager
+    def __lock(self) -> Iterator[None]:
+        with open(self._dir / ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def find(self, commit: str, paths: list[str] | None = None) -> Path | None:
+        """
+        the snapshot of a commit (full hash, or abbreviated to at least 7 digits), None if it
+        was not exported. marks it used and pins it
+        """
+        commit = commit.lower()
+        if len(commit) == 40:
+            found = [self._dir / ExportCache.key(commit, paths)]
+        elif len(commit) >= 7:
+            suffix = ExportCache.key("", paths)
+            found = [p for p in self._dir.glob(f"{commit}*") if p.is_dir() and p.name[40:] == suffix]
+        else:
+            found = []
+        if len(found) != 1 or not found[0].with_name(f"{found[0].name}.json").exists():
+            return None
+
+        meta = found[0].with_name(f"{found[0].name}.json")
+        try:
+            os.utime(meta)
+        except FileNotFoundError:
+            return None
+        # False when evicted in between
+        return found[0] if cache_pins.pin(meta) else None
+
+    def unpin(self, snapshot: Path):
+        """
+        a snapshot handed out by find or export is no longer used by this process
+        """
+        cache_pins.unpin(snapshot.with_name(f"{snapshot.name}.json"))
+
+    def info(self, snapshot: Path) -> dict[str, Any]:
+        """
+        what was exported in a snapshot: commit, message, author, date, paths, bytes
+        """
+        return json.loads(snapshot.with_name(f"{snapshot.name}.json").read_text())
+
+    def export(self, repo: git.Git, commit: str, paths: list[str] | None = None) -> Path:
+        """
+        the snapshot of commit (a full hash, in repo) with only the given folders (all if None),
+        exported now unless it already is, and pinned. evicts the least recently used snapshots
+        beyond the budget
+        """
+        key = ExportCache.key(commit, paths)
+        snapshot = self._dir / key
+        with self.__lock():
+            if snapshot.with_name(f"{key}.json").exists():
+                snapshot.with_name(f"{key}.json").touch()
+                cache_pins.pin(snapshot.with_name(f"{key}.json"))
+                return snapshot
+
+            started = time.perf_counter()
+            tmp = self._dir / f".{key}.{os.getpid()}.tmp"
+            ExportCache.__remove(tmp)
+            try:
+                archive = repo.archive("--format=tar", commit, "--", *(paths or []), as_process=True)
+                with tarfile.open(fileobj=archive.stdout, mode="r|") as tar:
+                    tar.extractall(tmp, filter="data")
+                archive.wait()
+                head = repo.log("-1", "--format=%H%x00%an <%ae>%x00%cI%x00%B", commit).split("\0")
+            except (git.exc.GitCommandError, tarfile.TarError) as e:
+                ExportCache.__remove(tmp)
+                raise ExportCacheError(f"Could not export {commit}: {e}")
+
+            size = ExportCache.__read_only(tmp)
+            ExportCache.__remove(snapshot)
+            os.rename(tmp, snapshot)
+            meta = {"commit": head[0], "author": head[1], "date": head[2], "message": head[3].strip(), "paths": paths, "bytes": size}
+            snapshot.with_name(f"{key}.json").write_text(json.dumps(meta))
+            cache_pins.pin(snapshot.with_name(f"{key}.json"))
+            logger.info(f"📦 Exported {commit[:8]} to {snapshot} ({size / 1024 / 1024:.1f}MB in {time.perf_counter() - started:.2f}s)")
+
+            self.__evict()
+            return snapshot
+
+    def evict(self, budget_mb: float | None = None) -> list[Path]:
+        """
+        remove the least recently used snapshots no process pins until they take at most
+        budget_mb (default: the cache's budget). the removed snapshots
+        """
+        with self.__lock():
+            return self.__evict(budget=int(budget_mb * 1024 * 1024) if budget_mb is not None else None)
+
+    def __evict(self, budget: int | None = None) -> list[Path]:
+        budget = self._budget if budget is None else budget
+        metas = sorted(self._dir.glob("*.json"), key=lambda m: m.stat().st_mtime)
+        sizes = {m: json.loads(m.read_text()).get("bytes", 0) for m in metas}
+        total = sum(sizes.values())
+        removed = []
+        for meta in metas:
+            if total <= budget:
+                break
+            snapshot = meta.with_name(meta.name[: -len(".json")])
+            with cache_pins.unpinned(meta) as free:
+                if not free:
+                    continue
+                logger.info(f"🗑️ Evicting snapshot {snapshot.name} ({sizes[meta] / 1024 / 1024:.1f}MB)")
+                meta.unlink()
+                ExportCache.__remove(snapshot)
+            total -= sizes[meta]
+            removed.append(snapshot)
+        if total > budget:
+            logger.warning(f"Snapshots take {total / 1024 / 1024:.1f}MB, over the budget: the rest are in use")
+        return removed
+
+    @staticmethod
+    def __read_only(path: Path) -> int:
+        """
+        remove the write permissions of everything under path. the bytes of its files
+        """
+        size = 0
+        for root, dirs, files in os.walk(path, topdown=False):
+            for name in files:
+                file = os.path.join(root, name)
+                st = os.lstat(file)
+                size += st.st_size
+                if not stat.S_ISLNK(st.st_mode):
+                    os.chmod(file, st.st_mode & ~0o222)
+            os.chmod(root, os.stat(root).st_mode & ~0o222)
+        return size
+
+    @staticmethod
+    def __remove(path: Path):
+        if not path.exists():
+            return
+        for root, dirs, files in os.walk(path):
+            os.chmod(root, os.stat(root).st_mode | stat.S_IWUSR)
+        shutil.rmtree(path)
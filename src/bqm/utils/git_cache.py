@@ -0,0 +1,347 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+import git
+
+from bqm.utils import cache_pins
+from bqm.utils.logconfig import LogFuzz
+
+logger = LogFuzz.make_logger(__name__)
+
+
+class GitCacheError(Exception):
+    pass
+
+
+class GitCache:
+    """
+    Shared object store for the repos the launchers check out. One bare mirror per remote url
+    under cache_dir, fetched at most once every fetch_ttl seconds: launchers (processes) starting
+    together queue on a file lock per url, the first one fetches and the others find the mirror
+    fresh. Checkouts are worktrees of the mirror, so they cost no clone: anywhere (add_worktree)
+    or in the cache, one per commit (worktree), never moved while a job may run from it. A branch
+    only points at the worktree of its last checked out head. gc removes the worktrees no process
+    pins and nobody asked for in worktree_ttl seconds; worktree runs it every GC_INTERVAL seconds.
+    Whether a remote is reachable is remembered for reachable_ttl seconds, across processes.
+
+        cache_dir/
+            mirrors/<name>-<url hash>.git                  bare mirror
+            mirrors/<name>-<url hash>.json                 {"fetched", "reachable", "checked"}
+            worktrees/<name>-<url hash>/<commit>           worktree
+            worktrees/<name>-<url hash>/<commit>.used      last use, pinned while in use (see cache_pins)
+            worktrees/<name>-<url hash>/branches/<branch>  -> ../<commit>
+            locks/<name>-<url hash>.lock
+            gc.stamp                                       last gc
+    """
+
+    DEFAULT_CACHE_DIR = Path.home() / ".cache" / "bqm" / "git"
+    DEFAULT_FETCH_TTL = 30.0
+    DEFAULT_REACHABLE_TTL = 60.0
+    DEFAULT_WORKTREE_TTL = 7 * 24 * 3600.0
+    GC_INTERVAL = 3600.0
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        fetch_ttl: float = DEFAULT_FETCH_TTL,
+        reachable_ttl: float = DEFAULT_REACHABLE_TTL,
+        worktree_ttl: float = DEFAULT_WORKTREE_TTL,
+    ):
+        self._cache_dir = Path(cache_dir) if cache_dir else Path(os.environ.get("BQM_GIT_CACHE", GitCache.DEFAULT_CACHE_DIR))
+        self._fetch_ttl = fetch_ttl
+        self._reachable_ttl = reachable_ttl
+        self._worktree_ttl = worktree_ttl
+        (self._cache_dir / "mirrors").mkdir(parents=True, exist_ok=True)
+        (self._cache_dir / "locks").mkdir(parents=True, exist_ok=True)
+
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        return url.rstrip("/").replace(".git", "")
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        file name of the url in the cache: readable and unique
+        """
+        normalized = GitCache.normalize_url(url)
+        name = normalized.split("/")[-1].split(":")[-1] or "repo"
+        return f"{name}-{hashlib.sha1(normalized.encode()).hexdigest()[:12]}"
+
+    def mirror_dir(self, url: str) -> Path:
+        return self._cache_dir / "mirrors" / f"{GitCache.key(url)}.git"
+
+    @contextmanager
+    def lock(self, url: str) -> Iterator[None]:
+        """
+        exclusive across processes, per url. held while the mirror or its worktrees are changed
+        """
+        with open(self._cache_dir / "locks" / f"{GitCache.key(url)}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __state_file(self, url: str) -> Path:
+        return self._cache_dir / "mirrors" / f"{GitCache.key(url)}.json"
+
+    def __read_state(self, url: str) -> dict[str, Any]:
+        try:
+            return json.loads(self.__state_file(url).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def __update_state(self, url: str, **values):
+        state = self.__read_state(url)
+        state.update(values)
+        path = self.__state_file(url)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, path)
+
+    def is_reachable(self, url: str) -> bool:
+        """
+        can the remote be listed. the answer is reused for reachable_ttl seconds
+        """
+        state = self.__read_state(url)
+        if time.time() - state.get("checked", 0) < self._reachable_ttl:
+            return state["reachable"]
+
+        try:
+            git.cmd.Git().ls_remote("--heads", url)
+            logger.info(f"✅  Remote repo {url} is reachable")
+            reachable = True
+        except git.exc.GitCommandError as gce:
+            logger.warning(f"⚡ Remote repo {url} is not reachable. error: {gce}")
+            reachable = False
+        self.__update_state(url, reachable=reachable, checked=time.time())
+        return reachable
+
+    def has_mirror(self, url: str) -> bool:
+        return (self.mirror_dir(url) / "HEAD").exists()
+
+    def mirror(self, url: str) -> git.Git:
+        """
+        git commands run in the mirror, as it is, without touching the network. not a git.Repo:
+        once a worktree is sparse, core.bare lives in the mirror's config.worktree, which
+        GitPython does not read, and a git.Repo would take the mirror for a checkout
+        """
+        if not self.has_mirror(url):
+            raise GitCacheError(f"No mirror of {url} in {self._cache_dir}")
+        return git.Git(self.mirror_dir(url))
+
+    def fetch(self, url: str, max_age: float | None = None, filter: str | None = None) -> git.Git:
+        """
+        the mirror of url, cloned if missing, fetched unless it was fetched less than max_age
+        (default fetch_ttl) seconds ago, by this or any other process.
+        filter ("blob:none", "tree:0", ...: a partial clone) only applies when the mirror is cloned.
+        a partial mirror fetches the missing objects a checkout needs on demand, so it serves every
+        branch, commit and checkout, sparse or not. the mirror is never shallow: it is shared by
+        every user of the url, and a shallow one only has the default branch and the last commits
+        """
+        max_age = self._fetch_ttl if max_age is None else max_age
+        mirror_dir = self.mirror_dir(url)
+        with self.lock(url):
+            fetched = self.__read_state(url).get("fetched", 0)
+            if self.has_mirror(url) and time.time() - fetched < max_age:
+                logger.info(f"🚀  Mirror of {url} fetched {time.time() - fetched:.1f}s ago. Not fetching")
+                return git.Git(mirror_dir)
+
+            try:
+                if self.has_mirror(url):
+                    logger.info(f"⁉️  Fetching {url} into {mirror_dir}")
+                    mirror = git.Git(mirror_dir)
+                    # left shallow by an older version: complete it once
+                    unshallow = ["--unshallow"] if (mirror_dir / "shallow").exists() else []
+                    mirror.fetch("--prune", *unshallow, "origin")
+                else:
+                    mirror = self.__clone_mirror(url, filter)
+            except git.exc.GitCommandError as e:
+                self.__update_state(url, reachable=False, checked=time.time())
+                raise GitCacheError(f"Could not fetch {url}: {e}")
+
+            now = time.time()
+            self.__update_state(url, fetched=now, reachable=True, checked=now)
+            return mirror
+
+    def __clone_mirror(self, url: str, filter: str | None) -> git.Git:
+        """
+        clones next to the final location and renames, so an interrupted clone leaves no half mirror
+        """
+        mirror_dir = self.mirror_dir(url)
+        tmp = mirror_dir.with_name(f"{mirror_dir.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        logger.info(f"Cloning mirror of {url} into {mirror_dir} (filter: {filter})")
+        try:
+            git.Repo.clone_from(url=url, to_path=tmp.as_posix(), mirror=True, filter=filter)
+        except git.exc.GitCommandError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        os.replace(tmp, mirror_dir)
+        return git.Git(mirror_dir)
+
+    def resolve(self, url: str, ref: str) -> str:
+        """
+        commit hash of a branch, tag or (abbreviated) commit in the mirror
+        """
+        try:
+            return self.mirror(url).rev_parse("--verify", "--quiet", f"{ref}^{{commit}}")
+        except git.exc.GitCommandError as e:
+            raise GitCacheError(f"'{ref}' is not a branch, tag or commit of {url}: {e}")
+
+    @staticmethod
+    def set_sparse(repo: git.Repo, sparse: list[str] | None):
+        """
+        limit the checkout to the sparse directories (cone mode: plus the files at the top), or
+        check everything out again for None. the setting is per worktree
+        """
+        if sparse:
+            repo.git.sparse_checkout("set", "--cone", *sparse)
+        elif repo.git.config("--get", "core.sparseCheckout", with_exceptions=False) == "true":
+            repo.git.sparse_checkout("disable")
+
+    def add_worktree(self, url: str, path: str | Path, ref: str, sparse: list[str] | None = None) -> git.Repo:
+        """
+        check ref out at path as a worktree of the mirror: a new one, or path moved to ref if it
+        already is a worktree of this mirror. worktrees are detached, a branch checked out in a
+        worktree could not be updated by the next fetch. sparse: see set_sparse
+        """
+        path = Path(path)
+        commit = self.resolve(url, ref)
+        with self.lock(url):
+            mirror = self.mirror(url)
+            if (path / ".git").is_file() and not self.__is_worktree(mirror, path):
+                # moved, or its mirror was: relink rather than check out again
+                logger.warning(f"Repairing worktree {path}")
+                try:
+                    mirror.worktree("repair", path.as_posix())
+                except git.exc.GitCommandError as e:
+                    raise GitCacheError(f"{path} is a broken worktree which could not be repaired - fix manually: {e}")
+            if self.__is_worktree(mirror, path):
+                worktree = git.Repo(path)
+                GitCache.set_sparse(worktree, sparse)
+                if worktree.head.commit.hexsha != commit:
+                    logger.info(f"Moving worktree {path} to {ref} ({commit[:8]})")
+                    worktree.git.checkout("--detach", "--force", commit)
+                return worktree
+
+            logger.info(f"Adding worktree {path} at {ref} ({commit[:8]})")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            mirror.worktree("prune")
+            if not sparse:
+                mirror.worktree("add", "--detach", "--force", path.as_posix(), commit)
+                return git.Repo(path)
+
+            # sparse before the files are written, a partial mirror then only fetches the sparse ones
+            mirror.worktree("add", "--detach", "--force", "--no-checkout", path.as_posix(), commit)
+            worktree = git.Repo(path)
+            GitCache.set_sparse(worktree, sparse)
+            worktree.git.reset("--hard")
+            return worktree
+
+    @staticmethod
+    def __is_worktree(mirror: git.Git, path: Path) -> bool:
+        if not (path / ".git").is_file():
+            return False
+        listed = [line[len("worktree ") :] for line in mirror.worktree("list", "--porcelain").splitlines() if line.startswith("worktree ")]
+        return path.resolve().as_posix() in [Path(p).resolve().as_posix() for p in listed]
+
+    def __worktrees_dir(self, url: str) -> Path:
+        return self._cache_dir / "worktrees" / GitCache.key(url)
+
+    def worktree(self, url: str, ref: str, sparse: list[str] | None = None) -> git.Repo:
+        """
+        ref (a branch, tag or commit) checked out in the cache at its commit, shared by every
+        caller asking for that commit (and set of sparse directories). a worktree never moves:
+        once a branch moved on, the next caller gets the new head's worktree while the jobs
+        running from the old one keep it. the worktree is pinned by this process until unpin
+        (or exit), so gc leaves it alone
+        """
+        commit = self.resolve(url, ref)
+        suffix = f"@sparse-{hashlib.sha1(' '.join(sorted(sparse)).encode()).hexdigest()[:8]}" if sparse else ""
+        name = f"{commit}{suffix}"
+        path = self.__worktrees_dir(url) / name
+        while True:
+            worktree = self.add_worktree(url, path, commit, sparse)
+            stamp = path.with_name(f"{name}.used")
+            stamp.touch()
+            if cache_pins.pin(stamp) and (path / ".git").is_file():
+                break
+            # gc removed it in between
+            cache_pins.unpin(stamp)
+        if not (len(ref) >= 7 and commit.startswith(ref.lower())):
+            self.__point_branch(url, f"{ref.replace('/', '%')}{suffix}", name)
+        self.__maybe_gc()
+        return worktree
+
+    def unpin(self, path: str | Path):
+        """
+        a worktree handed out by worktree is no longer used by this process
+        """
+        path = Path(path)
+        cache_pins.unpin(path.with_name(f"{path.name}.used"))
+
+    def __point_branch(self, url: str, branch: str, name: str):
+        link = self.__worktrees_dir(url) / "branches" / branch
+        link.parent.mkdir(parents=True, exist_ok=True)
+        tmp = link.with_name(f".{branch}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        tmp.symlink_to(Path("..") / name)
+        os.replace(tmp, link)
+
+    def __maybe_gc(self):
+        stamp = self._cache_dir / "gc.stamp"
+        try:
+            if time.time() - stamp.stat().st_mtime < GitCache.GC_INTERVAL:
+                return
+        except FileNotFoundError:
+            pass
+        stamp.touch()
+        try:
+            self.gc(self._worktree_ttl)
+        except (GitCacheError, git.exc.GitCommandError) as e:
+            logger.warning(f"Repo cache gc failed: {e}")
+
+    def gc(self, max_idle: float = DEFAULT_WORKTREE_TTL) -> list[Path]:
+        """
+        remove the cache's worktrees nobody asked for in max_idle seconds and no process pins,
+        the branch pointers to them, and drop from the mirrors the worktrees deleted by hand
+        (anywhere). the removed paths
+        """
+        removed = []
+        for mirror_dir in sorted((self._cache_dir / "mirrors").glob("*.git")):
+            mirror = git.Git(mirror_dir)
+            url = mirror.config("--get", "remote.origin.url")
+            with self.lock(url):
+                for stamp in sorted(self.__worktrees_dir(url).glob("*.used")):
+                    idle = time.time() - stamp.stat().st_mtime
+                    if idle < max_idle:
+                        continue
+                    path = stamp.with_name(stamp.name[: -len(".used")])
+                    with cache_pins.unpinned(stamp) as free:
+                        if not free:
+                            logger.info(f"Keeping worktree {path}, unused for {idle / 3600:.1f}h but pinned by a running process")
+                            continue
+                        logger.info(f"🗑️ Removing worktree {path}, unused for {idle / 3600:.1f}h")
+                        try:
+                            mirror.worktree("remove", "--force", path.as_posix())
+                        except git.exc.GitCommandError:
+                            # not a worktree (any more): a leftover of the cache's own
+                            shutil.rmtree(path, ignore_errors=True)
+                        stamp.unlink(missing_ok=True)
+                    removed.append(path)
+                for link in (self.__worktrees_dir(url) / "branches").glob("*"):
+                    if link.is_symlink() and not link.exists():
+                        link.unlink()
+                mirror.worktree("prune")
+        return removed
@@ -5,6 +5,8 @@ from typing import Any
 
 import git
 
+from bqm.utils.export_cache import ExportCache, ExportCacheError
+from bqm.utils.git_cache import GitCache, GitCacheError
 from bqm.utils.logconfig import LogFuzz
 
 logger = LogFuzz.make_logger(__name__)
@@ -24,32 +26,79 @@ class GitRepo:
         always_clone: bool = False,
         offline_ok: bool = False,
         force_offline: bool = False,
+        cache_dir: str | Path | None = None,
+        fetch_ttl: float = GitCache.DEFAULT_FETCH_TTL,
+        commit: str | None = None,
+        filter: str | None = None,
+        sparse: list[str] | None = None,
+        export: bool = False,
+        export_budget_mb: float = ExportCache.DEFAULT_BUDGET_MB,
     ):
+        """
+        cache_dir: check the repo out as a worktree of a mirror shared by every GitRepo using the
+        same cache dir (see GitCache), fetched at most once every fetch_ttl seconds. without a
+        workdir the worktree is the cache's own for the commit (a branch's head), shared as well
+        and never moved under a running job.
+        commit: check out this commit rather than the head of the branch. with a cache, a commit
+        already in the mirror is checked out without touching the network.
+        filter: clone partially ("blob:none": no file contents but the checked out ones, "tree:0":
+        no trees either), sparse: check out these directories only (cone mode: plus the files at
+        the top). together a monorepo clone costs its history and the files of one folder.
+        depth: shallow clone. ignored with a cache: its mirror is shared and never shallow
+        export: no checkout but a read-only snapshot of the commit (see ExportCache) in the cache
+        dir (GitCache's default without one). a pinned commit exported before is found without git
+        or network; the mirror is only fetched for a branch or a commit it does not have yet.
+        snapshots beyond export_budget_mb are evicted, least recently used first
+        """
         self._repo_url = repo_url
         self._branch = branch
-        self._work_dir = Path(workdir) if workdir else Path(tempfile.mkdtemp())
+        self._commit = commit
+        self._cache = GitCache(cache_dir, fetch_ttl=fetch_ttl) if cache_dir or export else None
+        self._exports = ExportCache(self._cache.cache_dir(), export_budget_mb) if export else None
+        # the cache picks the directory of its worktrees (see __checkout_cached) or snapshots
+        self._keyed = self._cache is not None and (not workdir or export)
+        self._work_dir = Path(workdir) if workdir else None if self._keyed else Path(tempfile.mkdtemp())
         self._repo_name = repo_url.split("/")[-1].replace(".git", "")
-        self._repo_dir = self._work_dir / self._repo_name
+        self._repo_dir = None if self._keyed else self._work_dir / self._repo_name
         self._depth = depth
+        if depth is not None and self._cache is not None:
+            logger.info(f"⚡ depth {depth} ignored: the repo cache keeps full history (use filter to keep its mirror small)")
+        self._filter = filter
+        self._sparse = sparse or None
         self._force_clone = always_clone
         self._offline_ok = not always_clone and offline_ok
         self._cloned = False
         self._force_offline = force_offline
+        self._checked_out = branch if commit is None else None
 
-        if self._force_offline:
+        if self._exports is not None:
+            self._repo = None
+            self.__export()
+        elif self._force_offline:
             self._repo = self.get_offline_repo()
             logger.info(
                 f"🚀  FORCEDly Using a local clone of repo: {self._repo_url}. Commit: {self._repo.head.commit.hexsha[:8]} - {self._repo.head.commit.message.strip()}"
             )
+        elif self.__commit_cached():
+            self._repo = self.__checkout_cached(fetch=False)
         elif not self.__check_connection() and self._offline_ok:
             self._repo = self.get_offline_repo()
+        elif self._cache is not None:
+            self._repo = self.__checkout_cached(max_age=0 if always_clone else None)
         else:
             if not always_clone:
                 self._repo = self.__checkout_or_clone()
             else:
                 self._repo = self.__clone()
 
+        if commit is not None and self._cache is None:
+            self.checkout_commit(commit)
+
     def get_offline_repo(self) -> git.Repo:
+        if self._cache is not None and self._cache.has_mirror(self._repo_url):
+            logger.info(f"✅  OK. running in OFFLINE mode from the repo cache")
+            return self.__checkout_cached(fetch=False)
+
         existing_repo = self.__examine_offline_repo()
         if existing_repo:
             logger.info(f"✅  OK. running in OFFLINE mode")
@@ -60,6 +109,9 @@ class GitRepo:
             raise GitOperatorError(msg)
 
     def __check_connection(self) -> bool:
+        if self._cache is not None:
+            return self._cache.is_reachable(self._repo_url)
+
         try:
             git.cmd.Git().ls_remote(self._repo_url)
             logger.info(f"✅  Remote repo {self._repo_url} is reachabble")
@@ -68,11 +120,92 @@ class GitRepo:
             logger.warning(f"⚡ Remote repo {self._repo_url} is not reachabble. error: {gce}")
             return False
 
+    def __commit_cached(self) -> bool:
+        """
+        is the pinned commit in the mirror already
+        """
+        if self._cache is None or self._commit is None or not self._cache.has_mirror(self._repo_url):
+            return False
+        try:
+            self._cache.resolve(self._repo_url, self._commit)
+            return True
+        except GitCacheError:
+            return False
+
+    def __export(self, max_age: float | None = None):
+        """
+        the commit or the head of the branch as a read-only snapshot at the repo dir. fetch the
+        mirror first, unless offline or the pinned commit is in it already
+        """
+        previous = self._repo_dir
+        if self._commit is not None:
+            snapshot = self._exports.find(self._commit, self._sparse)
+            if snapshot is not None:
+                logger.info(f"🚀  Using snapshot {snapshot} of commit {self._commit}")
+                self._repo_dir = snapshot
+                self.__unpin_snapshot(previous)
+                return
+
+        try:
+            if not self._force_offline and not self.__commit_cached():
+                try:
+                    # a pinned commit not in the mirror is new: fetch whatever the mirror's age
+                    max_age = 0 if self._commit is not None else max_age
+                    self._cache.fetch(self._repo_url, max_age=max_age, filter=self._filter)
+                except GitCacheError as e:
+                    if not self._offline_ok or not self._cache.has_mirror(self._repo_url):
+                        raise
+                    logger.warning(f"⚡ {e}. Exporting from the mirror as it is")
+            commit = self._cache.resolve(self._repo_url, self._commit or self._branch)
+            self._repo_dir = self._exports.export(self._cache.mirror(self._repo_url), commit, self._sparse)
+        except (GitCacheError, ExportCacheError) as e:
+            logger.error(f"Error exporting from the repo cache: {e}")
+            raise GitOperatorError(f"Could not export {self._repo_url} ({self._commit or self._branch}): {e}")
+        self.__unpin_snapshot(previous)
+
+        self._cloned = True
+
+    def __unpin_snapshot(self, previous: Path | None):
+        if previous is not None and previous != self._repo_dir:
+            self._exports.unpin(previous)
+
+    def __checkout_cached(self, fetch: bool = True, max_age: float | None = None) -> git.Repo:
+        """
+        the commit or the branch, checked out at the repo dir (or the cache's worktree for it) as a
+        worktree of the cached mirror. fetch the mirror first if older than max_age (default: the
+        cache's fetch ttl)
+        """
+        if self._repo_dir is not None and self._repo_dir.exists() and not (self._repo_dir / ".git").is_file() and any(self._repo_dir.iterdir()):
+            msg = f"❌ Target directory {self._repo_dir} exists but is not a worktree of the repo cache - fix manually"
+            logger.warning(msg)
+            raise GitOperatorError(msg)
+
+        try:
+            if fetch:
+                self._cache.fetch(self._repo_url, max_age=max_age, filter=self._filter)
+            ref = self._commit or self._branch
+            if self._keyed:
+                previous = self._repo_dir
+                self._repo = self._cache.worktree(self._repo_url, ref, self._sparse)
+                self._repo_dir = Path(self._repo.working_tree_dir)
+                if previous is not None and previous != self._repo_dir:
+                    self._cache.unpin(previous)
+            else:
+                self._repo = self._cache.add_worktree(self._repo_url, self._repo_dir, ref, self._sparse)
+        except GitCacheError as e:
+            logger.error(f"Error checking out from the repo cache: {e}")
+            raise GitOperatorError(f"Could not check out {self._repo_url} ({self._commit or self._branch}) from the repo cache: {e}")
+
+        self._cloned = True
+        self._checked_out = None if self._commit else self._branch
+        logger.info(f"🚀 Current commit: {self._repo.head.commit.hexsha[:8]} - {self._repo.head.commit.message.strip()}")
+        return self._repo
+
     def __examine_offline_repo(self) -> bool:
         """
         when no connection, check if the local repo exists and is a clone of remote
         """
-        if self._repo_dir.exists() and (self._repo_dir / ".git").exists():
+        if self._repo_dir is not None and self._repo_dir.exists() and (self._repo_dir / ".git").exists():
             logger.info(f"Repository exists at {self._repo_dir}")
 
             existing_repo = git.Repo(self._repo_dir)
@@ -146,6 +279,7 @@ class GitRepo:
 
             logger.info(f"⁉️  Fetching latest changes from remote...")
             origin.fetch()
+            GitCache.set_sparse(self._repo, self._sparse)
 
             # Check if desired branch exists locally
             if self._branch not in self._repo.heads:
@@ -191,11 +325,43 @@ class GitRepo:
             self._cloned = True
             return self._repo
 
+        except GitOperatorError:
+            raise
         except Exception as e:
             logger.error(f"Error updating repository: {e}")
-            logger.info("Falling back to fresh clone")
-            shutil.rmtree(self._repo_dir)
-            return self.__clone()
+            return self.__recover()
+
+    def __recover(self) -> git.Repo:
+        """
+        bring a repo which failed to update to the remote branch in place: drop a stale index
+        lock, fetch again and force the branch to the remote head. only a repo git can no longer
+        read is cloned again
+        """
+        logger.info(f"⭕ Recovering {self._repo_dir} in place")
+        try:
+            index_lock = Path(self._repo.git_dir) / "index.lock"
+            if index_lock.exists():
+                logger.warning(f"🗑️ Removing stale {index_lock}")
+                index_lock.unlink()
+            self._repo.remotes.origin.fetch()
+            self._repo.git.checkout("--force", "-B", self._branch, f"origin/{self._branch}")
+            logger.info(f"🚀 Repository recovered at: {self._repo.head.commit.hexsha[:8]} - {self._repo.head.commit.message.strip()}")
+            self._cloned = True
+            return self._repo
+        except Exception as e:
+            if self.__readable():
+                raise GitOperatorError(f"Could not update {self._repo_dir} from {self._repo_url}: {e}")
+
+        logger.warning(f"{self._repo_dir} is corrupt. Falling back to fresh clone")
+        shutil.rmtree(self._repo_dir)
+        return self.__clone()
+
+    def __readable(self) -> bool:
+        try:
+            self._repo.git.rev_parse("--verify", "HEAD^{commit}")
+            return True
+        except Exception:
+            return False
 
     def __clone(self) -> git.Repo:
         """Clone repository fresh (original behavior)"""
@@ -218,13 +384,16 @@ class GitRepo:
             self._work_dir.mkdir(parents=True, exist_ok=True)
 
         try:
-            logger.info(f"Cloning {self._repo_url} (branch: {self._branch})")
+            logger.info(f"Cloning {self._repo_url} (branch: {self._branch}, filter: {self._filter}, sparse: {self._sparse})")
             self._repo = git.Repo.clone_from(
                 url=self._repo_url,
                 to_path=self._repo_dir.as_posix(),
                 branch=self._branch,
                 depth=self._depth,
+                filter=self._filter,
+                sparse=self._sparse is not None,
             )
+            GitCache.set_sparse(self._repo, self._sparse)
 
             self._cloned = True
 
@@ -244,13 +413,25 @@ class GitRepo:
         """Verify local repository exists and is valid"""
         if not self._repo_dir.exists():
             raise GitOperatorError(f"ERROR. Local repo dir does not exist {self._repo_dir}")
-        if not (self._repo_dir / ".git").exists():
+        if self._exports is None and not (self._repo_dir / ".git").exists():
             raise GitOperatorError(f"ERROR. Local repo dir exists {self._repo_dir} but does not seem to be a git repo.")
 
     def force_update(self):
         """Force update from remote (fetch and reset to remote HEAD)"""
         self.__check_local()
 
+        if self._exports is not None:
+            logger.info("Force updating snapshot...")
+            self.__export(max_age=0)
+            logger.info(f"✓ Snapshot at {self._repo_dir}")
+            return
+
+        if self._cache is not None:
+            logger.info("Force updating repository...")
+            self._repo = self.__checkout_cached(max_age=0)
+            logger.info("✓ Repository force updated to remote state")
+            return
+
         try:
             logger.info("Force updating repository...")
             origin = self._repo.remotes.origin
@@ -279,7 +460,16 @@ class GitRepo:
 
         try:
             logger.info(f"Checking out commit: {hash}")
-            self._repo.git.checkout(hash)
+            if self._exports is not None:
+                self._commit = hash
+                self.__export()
+            elif self._keyed:
+                # the cache's worktrees stay at their commit: move to the commit's own
+                self._commit = hash
+                self._repo = self.__checkout_cached(fetch=not self.__commit_cached(), max_age=0)
+            else:
+                self._repo.git.checkout(hash)
+            self._checked_out = None
         except Exception as e:
             logger.warning(f"Could not checkout commit: {e}")
             raise GitOperatorError(f"Could not checkout commit: {e}")
@@ -291,26 +481,55 @@ class GitRepo:
         try:
             logger.info(f"Checking out branch: {branch}")
 
-            if branch in self._repo.heads:
+            if self._exports is not None:
+                self._branch, self._commit = branch, None
+                self.__export()
+            elif self._keyed:
+                self._branch, self._commit = branch, None
+                self._repo = self.__checkout_cached()
+            elif self._cache is not None:
+                # worktrees of the mirror stay detached (see GitCache.add_worktree)
+                self._repo.git.checkout("--detach", self._cache.resolve(self._repo_url, branch))
+            elif branch in self._repo.heads:
                 self._repo.heads[branch].checkout()
             elif f"origin/{branch}" in [ref.name for ref in self._repo.remotes.origin.refs]:
                 self._repo.create_head(branch, self._repo.remotes.origin.refs[branch])
                 self._repo.heads[branch].checkout()
             else:
                 raise GitOperatorError(f"Branch '{branch}' not found locally or on remote")
+            self._checked_out = branch
 
         except Exception as e:
             logger.error(f"Could not checkout branch: {e}")
             raise GitOperatorError(f"Could not checkout branch: {e}")
 
+    def __branch_name(self) -> str:
+        if not self._repo.head.is_detached:
+            return self._repo.active_branch.name
+        # a worktree of the repo cache is detached at the head of its branch
+        return self._checked_out if self._cache is not None and self._checked_out else "DETACHED HEAD"
+
     def info(self) -> dict[str, Any]:
         """Get detailed repository information"""
         self.__check_local()
 
+        if self._exports is not None:
+            snapshot = self._exports.info(self._repo_dir)
+            return {
+                "url": self._repo_url,
+                "branch": f"{self._checked_out or 'DETACHED HEAD'} (read-only snapshot)",
+                "commit_hash": snapshot["commit"],
+                "commit_message": snapshot["message"],
+                "author": snapshot["author"],
+                "commit_date": snapshot["date"],
+                "is_dirty": False,
+                "untracked_files": [],
+            }
+
         try:
             info = {
                 "url": self._repo_url,
-                "branch": "DETACHED HEAD" if self._repo.head.is_detached else self._repo.active_branch.name,
+                "branch": self.__branch_name(),
                 "commit_hash": self._repo.head.commit.hexsha,
                 "commit_message": self._repo.head.commit.message.strip(),
                 "author": str(self._repo.head.commit.author),
@@ -1,5 +1,6 @@
 from bqm.utils.mamba.mambax import Mamba, MambaError
 from bqm.utils.mamba.package import Package, PackageList, PackageError
+from bqm.utils.mamba.runner import MambaRunner, MambaRunnerError, WarmShell
 
 
 __all__ = [
@@ -8,4 +9,7 @@ __all__ = [
     "Package",
     "PackageList",
     "PackageError",
+    "MambaRunner",
+    "MambaRunnerError",
+    "WarmShell",
 ]
@@ -134,7 +134,7 @@ class EnvManager:
         return recipe
 
     def setup(self):
-        mmb = Mamba()
+        mmb = Mamba.shared()
         env_name = self.name()
         if self.__use_existing_only():
             logger.info(" ❄️  EXISTING ONLY environment policy. Won't alter anything not already there. Ignoring any environment specs provided.")
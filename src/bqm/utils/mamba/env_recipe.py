@@ -182,8 +182,8 @@ class EnvRecipe:
     def create(self):
         if len(self._all_pkgs) < 1:
             logger.warning("WARNING. no packages specified. Creating and empty environment")
-        mamba = Mamba()
-        if mamba.env_exists(self._name):
+        mamba = Mamba.shared()
+        if mamba.env_exists(self._name, refresh=True):
             logger.warning(f" 💀 WARNING. Deleting existing environment: {self._name}")
             mamba.remove_env(self._name, waive_safety=True)
 
@@ -204,7 +204,7 @@ class EnvRecipe:
                 logger.error(f" ERROR. Unkown channel type: {ch}. This is likely a BUG")
 
     def verify(self) -> bool:
-        mamba = Mamba()
+        mamba = Mamba.shared()
         if not mamba.env_exists(self._name):
             logger.into(f" ⭕ WARNING. Target environment does not exist: {self._name}")
 
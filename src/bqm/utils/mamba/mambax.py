@@ -1,12 +1,13 @@
 import json
-import re
 import subprocess
 import tempfile
+import threading
 from pathlib import Path
 from typing import Any
 
 from bqm.utils.logconfig import LogFuzz
 from bqm.utils.mamba.package import PackageList
+from bqm.utils.mamba.runner import MambaRunner, MambaRunnerError
 
 logger = LogFuzz.make_logger(__name__)
 
@@ -16,21 +17,41 @@ class MambaError(Exception):
 
 
 class Mamba:
+    """
+    mamba environments of a miniforge install. the binaries are called directly (see MambaRunner),
+    warm_shell runs pip in an activated environment of one persistent bash session
+    """
+
+    __shared: dict[str, "Mamba"] = {}
+    __shared_lock = threading.Lock()
 
     def __init__(
         self,
         miniforge_path: str = "/opt/miniforge3",
+        warm_shell: bool = False,
     ):
         self.__check_miniforge_instl(miniforge_path)
         self._miniforge_path = miniforge_path
-        self._rc_file = self.__make_resource_file()
-        if not Path(self._rc_file).exists():
-            raise MambaError(f"Resrouce file created but does not exist: {self._rc_file}")
+        try:
+            self._runner = MambaRunner(miniforge_path, warm_shell=warm_shell)
+        except MambaRunnerError as e:
+            raise MambaError(f"Mamba cannot be run: {e}")
 
         self.test_mamba()
         self.__refresh_env_list()
         pass
 
+    @staticmethod
+    def shared(miniforge_path: str = "/opt/miniforge3") -> "Mamba":
+        """
+        one Mamba per miniforge install and process: checked once, its environments listed again
+        only when one is missing, created or removed (see env_exists)
+        """
+        with Mamba.__shared_lock:
+            if miniforge_path not in Mamba.__shared:
+                Mamba.__shared[miniforge_path] = Mamba(miniforge_path)
+            return Mamba.__shared[miniforge_path]
+
     def __check_miniforge_instl(self, mf_path: str):
         """
         do some cursory checks that miniforge exists and looks roughly sensible
@@ -45,65 +66,43 @@ class Mamba:
             raise MambaError(f"bins path {mfp_bin} does not exist")
 
         mamba_path = mfp_bin / "mamba"
-        if not mamba_path.exists():
+        if not mamba_path.exists() and not (mfp_bin / "conda").exists():
             raise MambaError(f"Specified mamba path {mamba_path} does not exist")
 
-    def __mamba_exec(
-        self, conda_cmd: str, env: str | None = None, capture_output: bool = True, use_conda: bool = False
-    ) -> subprocess.CompletedProcess:
+    def __mamba_exec(self, args: list[str], capture_output: bool = True, use_conda: bool = False) -> subprocess.CompletedProcess:
         """
-        launch a mamba command subprocess
-        always load the mamba rc
-        if provided, also activate the environment
+        mamba|conda <args>, environments given by prefix (-p)
         optionally use conda (if, e.g. mamba doesnt implement the conda command)
-        equivalent of:
-            source <rcfile> && activate -n <env> && mamba|conda <mamba_cmd>
         """
+        return self._runner.exec(args, capture_output=capture_output, use_conda=use_conda)
 
-        mamba = "mamba" if not use_conda else "conda"
-        activate_env = f" && {mamba} activate {env}" if env else ""
-        result = subprocess.run(
-            ["bash", "-c", f"source {self._rc_file} {activate_env} && {mamba} {conda_cmd}"],
-            executable="/bin/bash",
-            capture_output=capture_output,
-            text=True,
-        )
-        return result
-
-    def __mamba_exec_run(
-        self, run_cmd: str, env: str | None = None, capture_output: bool = False, use_conda: bool = False
-    ) -> subprocess.CompletedProcess:
+    def __mamba_exec_run(self, args: list[str], env: str | None = None, capture_output: bool = False) -> subprocess.CompletedProcess:
         """
-        specialised mamba mamba launch for mamba run.
+        specialised mamba launch for mamba run: python <args> in env
         """
         if env and not self.env_exists(env):
             raise MambaError(f"Error. Specified environment does not exist: {env}")
 
-        mamba = "mamba" if not use_conda else "conda"
-        activate_env = f" && {mamba} activate {env}" if env else ""
-        mamba_env = f" -n {env}" if env else ""
-        mamba_run_tty = " --live-stream" if not capture_output else ""
-
-        result = subprocess.run(
-            ["bash", "-c", f"source {self._rc_file}  && {mamba} run {mamba_env} {mamba_run_tty} python {run_cmd}"],
-            executable="/bin/bash",
-            capture_output=capture_output,
-            text=True,
-        )
-        return result
-
-    def __pip_exec(self, pip_cmd: str, env: str) -> subprocess.CompletedProcess:
-        result = subprocess.run(
-            ["bash", "-c", f"source {self._rc_file} && mamba activate {env} && pip {pip_cmd}"],
-            executable="/bin/bash",
-        )
-        return result
+        return self._runner.run(env, ["python", *args], capture_output=capture_output)
+
+    def __pip_exec(self, args: list[str], env: str, capture_output: bool = False) -> subprocess.CompletedProcess:
+        return self._runner.pip(env, args, capture_output=capture_output)
+
+    def __prefix(self, env: str) -> str:
+        try:
+            return self._runner.prefix(env).as_posix()
+        except MambaRunnerError as e:
+            raise MambaError(str(e))
 
     def __refresh_env_list(self):
         """
         when adding or deleting envs
         """
-        self._existing_envs = self.existing_environments()
+        try:
+            self._existing_envs = list(self._runner.prefixes(refresh=True))
+        except MambaRunnerError as e:
+            logger.error(str(e))
+            raise MambaError("Failed to list environemnts")
 
     def __as_list(self, strs: str | list[str]):
         if isinstance(strs, str):
@@ -161,7 +160,7 @@ class Mamba:
         """
         verify mamba can be run
         """
-        res = self.__mamba_exec("--version")
+        res = self.__mamba_exec(["--version"])
         if res.returncode != 0:
             raise MambaError("Mamba cannot be called")
 
@@ -169,20 +168,19 @@ class Mamba:
         """
         mamba env list
         """
-        res = self.__mamba_exec("env list")
-        if res.returncode != 0:
-            logger.error(res.stderr)
-            raise MambaError("Failed to list environemnts")
-        return [re.sub("\\ .*$", "", ln) for ln in res.stdout.split("\n") if len(ln) > 0 and not ln.strip().startswith("#")]
+        self.__refresh_env_list()
+        return list(self._existing_envs)
 
-    def env_exists(self, env: str) -> bool:
+    def env_exists(self, env: str, refresh: bool = False) -> bool:
         """
-        does a conda environemt already exist
+        does a conda environemt already exist. the list of environments is shared by the
+        process (see shared) and read again when env is not in it, or with refresh: another
+        launcher or process may have created it meanwhile
         """
-        if env in self._existing_envs:
+        if not refresh and env in self._existing_envs:
             return True
-        else:
-            return False
+        self.__refresh_env_list()
+        return env in self._existing_envs
 
     def env_has_pip(self, env: str) -> bool:
         """
@@ -195,10 +193,10 @@ class Mamba:
         """
         mamba create -n <env>
         """
-        if self.env_exists(env):
+        if self.env_exists(env, refresh=True):
             raise MambaError(f"Target environment {env} already exists")
 
-        res = self.__mamba_exec(f"create -n {env}")
+        res = self.__mamba_exec(["create", "-n", env, "-y"])
         if res.returncode != 0:
             logger.error(res.stderr)
             raise MambaError(f"Failed to create environment {env}")
@@ -215,9 +213,7 @@ class Mamba:
         if not self.env_exists(env):
             raise MambaError(f"Target environment {env} does NOT exist")
 
-        cmd = f"list -n {env} --json"
-
-        res = self.__mamba_exec(cmd)
+        res = self.__mamba_exec(["list", "-p", self.__prefix(env), "--json"])
         if res.returncode != 0:
             logger.error(res.stderr)
             raise MambaError(f"Failed to create environment {env}")
@@ -243,12 +239,11 @@ class Mamba:
         if isinstance(spec, list):
             spec = [str(s) for s in spec]
 
-        pck_spec_str = " ".join(p for p in spec)
+        channel = ["-c", channel] if channel else []
+        args = ["install", "-p", self.__prefix(env), *channel, *spec, "-y", "--json"]
+        cmd = " ".join(args)
 
-        channel = f"-c {channel}" if channel else ""
-        cmd = f"install -n {env} {channel} {pck_spec_str} -y  --json"
-
-        res = self.__mamba_exec(cmd)
+        res = self.__mamba_exec(args)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -280,12 +275,11 @@ class Mamba:
 
         pspecs = self.__line_up_packagespecs(package, version, build)
 
-        pck_spec_str = " ".join(mk_pkg_str(p) for p in pspecs)
-
-        channel = f"-c {channel}" if channel else ""
-        cmd = f"install -n {env} {channel} {pck_spec_str} -y  --json"
+        channel = ["-c", channel] if channel else []
+        args = ["install", "-p", self.__prefix(env), *channel, *[mk_pkg_str(p) for p in pspecs], "-y", "--json"]
+        cmd = " ".join(args)
 
-        res = self.__mamba_exec(cmd)
+        res = self.__mamba_exec(args)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -304,13 +298,10 @@ class Mamba:
         if not Path(file).exists():
             raise MambaError(f"File {file} does not exist.")
 
-        envv = f"-n {env}" if env else ""
-        cmd = f"run {envv} python {file}"
-
-        res = self.__mamba_exec(cmd, capture_output=False)
+        res = self.__mamba_exec_run([str(file)], env=env, capture_output=False)
 
         if res.returncode != 0:
-            raise MambaError(f"Error {res.returncode} while trying to run python file {cmd}")
+            raise MambaError(f"Error {res.returncode} while trying to run python file {file}")
 
     def run_code(
         self,
@@ -318,11 +309,10 @@ class Mamba:
         code: str,
     ):
 
-        run_cmd = f"-c '{code}'"
-        res = self.__mamba_exec_run(env=env, run_cmd=run_cmd, capture_output=False)
+        res = self.__mamba_exec_run(["-c", code], env=env, capture_output=False)
 
         if res.returncode != 0:
-            raise MambaError(f"Error {res.returncode} while trying to run python file {run_cmd}")
+            raise MambaError(f"Error {res.returncode} while trying to run python code in {env}")
 
     def pip_install(
         self,
@@ -345,13 +335,12 @@ class Mamba:
             raise MambaError(f"Target environment {env} does not have pip installed. Install first.")
 
         pspecs = self.__line_up_packagespecs(package, version, None)
-        pck_spec_str = " ".join(mk_pkg_str(p) for p in pspecs)
 
-        pkg_index = f"--index-url {index_url}" if index_url else ""
+        pkg_index = ["--index-url", index_url] if index_url else []
+        args = ["install", *pkg_index, *[mk_pkg_str(p) for p in pspecs]]
+        cmd = " ".join(args)
 
-        cmd = f"install {pkg_index} {pck_spec_str} "
-
-        res = self.__pip_exec(cmd, env)
+        res = self.__pip_exec(args, env)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -373,8 +362,6 @@ class Mamba:
         if isinstance(spec, list):
             spec = [str(s) for s in spec]
 
-        pck_spec_str = " ".join(p for p in spec)
-
         if not self.env_exists(env):
             raise MambaError(f"Target environment {env} does NOT exist")
 
@@ -382,11 +369,11 @@ class Mamba:
         if "pip" not in installed.all():
             raise MambaError(f"Target environment {env} does not have pip installed. Install first.")
 
-        pkg_index = f"--index-url {index_url}" if index_url else ""
-
-        cmd = f"install {pkg_index} {pck_spec_str} "
+        pkg_index = ["--index-url", index_url] if index_url else []
+        args = ["install", *pkg_index, *spec]
+        cmd = " ".join(args)
 
-        res = self.__pip_exec(cmd, env)
+        res = self.__pip_exec(args, env)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -408,9 +395,10 @@ class Mamba:
 
         checked_file = self.__check_pip_reqs(reqs_file, reqs_str)
 
-        cmd = f"install -r {checked_file}"
+        args = ["install", "-r", str(checked_file)]
+        cmd = " ".join(args)
 
-        res = self.__pip_exec(cmd, env)
+        res = self.__pip_exec(args, env)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -429,7 +417,7 @@ class Mamba:
             raise MambaError(f"Target environment {env} does not have PIP installed")
 
         cmd = "list"
-        res = self.__pip_exec(cmd, env)
+        res = self.__pip_exec([cmd], env, capture_output=True)
 
         if res.returncode != 0:
             logger.error(res.stderr)
@@ -484,40 +472,18 @@ class Mamba:
         if not waive_safety:
             raise MambaError(f"Dangerous operation - conda environment {env} will be deleted. You must set the 'waive_safety' flag explicitly.")
 
-        if not self.env_exists(env):
+        if not self.env_exists(env, refresh=True):
             raise MambaError(f"Target environment {env} doesn NOT exist.")
 
-        res = self.__mamba_exec(f"env remove -n {env} -y")
+        res = self.__mamba_exec(["env", "remove", "-p", self.__prefix(env), "-y"])
         if res.returncode != 0:
             logger.error(res.stderr)
             raise MambaError(f"Failed to create environment {env}")
 
         self.__refresh_env_list()
 
-    def __make_resource_file(self) -> str:
-        rc_file = tempfile.mktemp()
-        with open(rc_file, "w") as f:
-            f.write(self.__init_string())
-        return rc_file
-
-    def __init_string(self) -> str:
-        return f"""
-            # >>> conda initialize >>>
-            # !! Contents within this block are managed by 'conda init' !!
-            __conda_setup="$('{self._miniforge_path}/bin/conda' 'shell.bash' 'hook' 2> /dev/null)"
-            if [ $? -eq 0 ]; then
-                eval "$__conda_setup"
-            else
-                if [ -f "{self._miniforge_path}/etc/profile.d/conda.sh" ]; then
-                    . "{self._miniforge_path}/etc/profile.d/conda.sh"
-                else
-                    export PATH="{self._miniforge_path}/bin:$PATH"
-                fi
-            fi 
-            unset __conda_setup
-
-            if [ -f "{self._miniforge_path}/etc/profile.d/mamba.sh" ]; then
-                . "{self._miniforge_path}/etc/profile.d/mamba.sh"
-            fi
-            # <<< conda initialize <<<
+    def close(self):
+        """
+        ends the warm shell, if any
         """
+        self._runner.close()
@@ -0,0 +1,203 @@
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from bqm.utils.logconfig import LogFuzz
+
+logger = LogFuzz.make_logger(__name__)
+
+
+class MambaRunnerError(Exception):
+    pass
+
+
+class WarmShell:
+    """
+    One bash session with the conda shell hook sourced once, running commands one at a time.
+    Each command runs in a subshell (an activation does not outlive it), with its output in
+    files, and the session reports its exit code after a sentinel on stdout
+    """
+
+    SENTINEL = "__bqm_warm_shell_done__"
+
+    def __init__(self, rc_file: str | Path):
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            ["/bin/bash", "--noprofile", "--norc"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        res = self.run(f"source {shlex.quote(str(rc_file))}", subshell=False)
+        if res.returncode != 0:
+            self.close()
+            raise MambaRunnerError(f"Could not source {rc_file} in the warm shell: {res.stderr}")
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def run(self, command: str, subshell: bool = True) -> subprocess.CompletedProcess:
+        """
+        run a bash command line in the session, its output captured
+        """
+        with self._lock, tempfile.TemporaryDirectory() as tmp:
+            if not self.alive():
+                raise MambaRunnerError(f"Warm shell exited with {self._proc.returncode}")
+
+            out, err = Path(tmp) / "out", Path(tmp) / "err"
+            line = f"( {command} )" if subshell else command
+            self._proc.stdin.write(f"{line} > {out} 2> {err} < /dev/null; echo \"{WarmShell.SENTINEL} $?\"\n")
+            self._proc.stdin.flush()
+            while True:
+                reply = self._proc.stdout.readline()
+                if not reply:
+                    raise MambaRunnerError(f"Warm shell exited while running: {command}")
+                if reply.startswith(WarmShell.SENTINEL):
+                    break
+            return subprocess.CompletedProcess(command, int(reply.split()[1]), out.read_text(), err.read_text())
+
+    def close(self):
+        if self.alive():
+            self._proc.stdin.close()
+            self._proc.wait()
+
+
+class MambaRunner:
+    """
+    Runs mamba (conda, if the install has no mamba), pip and python of a miniforge install
+    without a shell: the binaries and the environments' prefixes are resolved once, environments
+    are addressed by prefix (-p) and nothing sources the conda shell hook per call.
+    pip runs as the environment's python -m pip with the environment's bin first on the PATH;
+    with warm_shell it runs properly activated instead, in one bash session which sourced the
+    hook once (see WarmShell)
+    """
+
+    def __init__(self, miniforge_path: str | Path, warm_shell: bool = False):
+        self._root = Path(miniforge_path)
+        self._conda = self._root / "bin" / "conda"
+        mamba = self._root / "bin" / "mamba"
+        self._mamba = mamba if mamba.exists() else self._conda
+        if not self._mamba.exists():
+            raise MambaRunnerError(f"Neither {mamba} nor {self._conda} exist")
+
+        self._environ = {**os.environ, "MAMBA_ROOT_PREFIX": str(self._root)}
+        self._prefixes = None
+        self._lock = threading.Lock()
+        self._rc_file = None
+        self._shell = None
+        if warm_shell:
+            fd, self._rc_file = tempfile.mkstemp(prefix="bqm-mamba-", suffix=".rc")
+            with os.fdopen(fd, "w") as f:
+                f.write(self.hook_script())
+            self._shell = WarmShell(self._rc_file)
+
+    def binary(self, use_conda: bool = False) -> Path:
+        return self._conda if use_conda else self._mamba
+
+    def exec(self, args: list[str], capture_output: bool = True, use_conda: bool = False) -> subprocess.CompletedProcess:
+        """
+        mamba|conda <args>, no shell
+        """
+        return subprocess.run([self.binary(use_conda).as_posix(), *args], env=self._environ, capture_output=capture_output, text=True)
+
+    def prefixes(self, refresh: bool = False) -> dict[str, Path]:
+        """
+        name (the prefix itself for environments outside the envs dirs) -> prefix of every
+        environment, listed once and then on refresh
+        """
+        with self._lock:
+            if self._prefixes is not None and not refresh:
+                return self._prefixes
+
+            res = self.exec(["env", "list", "--json"])
+            if res.returncode != 0:
+                raise MambaRunnerError(f"Failed to list environments: {res.stderr}")
+            self._prefixes = {}
+            for p in json.loads(res.stdout)["envs"]:
+                prefix = Path(p)
+                if prefix == self._root:
+                    self._prefixes["base"] = prefix
+                elif prefix.parent.name == "envs":
+                    self._prefixes[prefix.name] = prefix
+                else:
+                    self._prefixes[p] = prefix
+            return self._prefixes
+
+    def prefix(self, env: str | None) -> Path:
+        """
+        prefix of a named environment, the base one for None
+        """
+        if env is None:
+            return self._root
+        prefixes = self.prefixes()
+        if env not in prefixes:
+            raise MambaRunnerError(f"Environment {env} does not exist")
+        return prefixes[env]
+
+    def activated_environ(self, env: str | None) -> dict[str, str]:
+        """
+        what activating the environment sets, short of its activate.d scripts
+        """
+        prefix = self.prefix(env)
+        return {
+            **self._environ,
+            "PATH": f"{prefix / 'bin'}{os.pathsep}{self._environ.get('PATH', '')}",
+            "CONDA_PREFIX": str(prefix),
+            "CONDA_DEFAULT_ENV": env or "base",
+        }
+
+    def run(self, env: str | None, args: list[str], capture_output: bool = False) -> subprocess.CompletedProcess:
+        """
+        mamba run -p <prefix> <args>: activated by mamba itself, streamed live unless captured
+        """
+        live = [] if capture_output else ["--live-stream"]
+        return self.exec(["run", "-p", self.prefix(env).as_posix(), *live, *args], capture_output=capture_output)
+
+    def pip(self, env: str, args: list[str], capture_output: bool = True) -> subprocess.CompletedProcess:
+        """
+        pip <args> in the environment. in the warm shell the output is always captured
+        """
+        if self._shell is not None:
+            activate = "mamba" if self._mamba != self._conda else "conda"
+            return self._shell.run(f"{activate} activate {shlex.quote(self.prefix(env).as_posix())} && pip {shlex.join(args)}")
+
+        python = self.prefix(env) / "bin" / "python"
+        return subprocess.run([python.as_posix(), "-m", "pip", *args], env=self.activated_environ(env), capture_output=capture_output, text=True)
+
+    def close(self):
+        if self._shell is not None:
+            self._shell.close()
+            self._shell = None
+        if self._rc_file is not None:
+            Path(self._rc_file).unlink(missing_ok=True)
+            self._rc_file = None
+
+    def hook_script(self) -> str:
+        """
+        the bash block conda init writes, for this install
+        """
+        return f"""
+            # >>> conda initialize >>>
+            # !! Contents within this block are managed by 'conda init' !!
+            __conda_setup="$('{self._root}/bin/conda' 'shell.bash' 'hook' 2> /dev/null)"
+            if [ $? -eq 0 ]; then
+                eval "$__conda_setup"
+            else
+                if [ -f "{self._root}/etc/profile.d/conda.sh" ]; then
+                    . "{self._root}/etc/profile.d/conda.sh"
+                else
+                    export PATH="{self._root}/bin:$PATH"
+                fi
+            fi
+            unset __conda_setup
+
+            if [ -f "{self._root}/etc/profile.d/mamba.sh" ]; then
+                . "{self._root}/etc/profile.d/mamba.sh"
+            fi
+            # <<< conda initialize <<<
+        """
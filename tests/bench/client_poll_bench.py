@@ -0,0 +1,94 @@
+"""
+N-harness polling: /hb and /status of every harness, ROUNDS times, with
+  - requests.get                 a new TCP connection per call (what ad hoc tooling does)
+  - requests.Session             keep-alive, one harness after the other
+  - bqm.harness.client.Fleet     keep-alive pool, all harnesses in parallel
+
+    python tests/bench/client_poll_bench.py [harnesses] [rounds]
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from multiprocessing import Process
+
+import requests
+
+from bqm.harness import Cradle, Launcher
+from bqm.harness.client import Fleet
+
+BASE_PORT = 3300
+
+
+class IdleJob(Cradle):
+    def run(self, *args):
+        threading.Event().wait()
+
+
+def harness(port: int):
+    logging.disable(logging.CRITICAL)
+    Launcher(job=IdleJob(), config={"harness": {"interface": "127.0.0.1", "port": port}})
+
+
+def wait_up(urls: list[str]):
+    for url in urls:
+        while True:
+            try:
+                requests.get(f"{url}/hb", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.2)
+
+
+def report(name: str, calls: int, seconds: float, rounds: int):
+    print(f"{name:<28} {calls / seconds:>8.0f} calls/s   {seconds / rounds * 1000:>8.1f} ms per round")
+
+
+def bench_requests(urls: list[str], rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for url in urls:
+            requests.get(f"{url}/hb").json()
+            requests.get(f"{url}/status").json()
+    report("requests.get", 2 * len(urls) * rounds, time.perf_counter() - started, rounds)
+
+
+def bench_session(urls: list[str], rounds: int):
+    with requests.Session() as session:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for url in urls:
+                session.get(f"{url}/hb").json()
+                session.get(f"{url}/status").json()
+        report("requests.Session", 2 * len(urls) * rounds, time.perf_counter() - started, rounds)
+
+
+async def bench_fleet(urls: list[str], rounds: int):
+    async with Fleet(urls) as fleet:
+        await fleet.hb()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(fleet.hb(), fleet.status())
+        report("Fleet (async, pooled)", 2 * len(urls) * rounds, time.perf_counter() - started, rounds)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    urls = [f"http://127.0.0.1:{BASE_PORT + i}" for i in range(n)]
+    harnesses = [Process(target=harness, args=(BASE_PORT + i,)) for i in range(n)]
+    for h in harnesses:
+        h.start()
+    try:
+        wait_up(urls)
+        print(f"{n} harnesses, {rounds} rounds of /hb + /status")
+        bench_requests(urls, rounds)
+        bench_session(urls, rounds)
+        asyncio.run(bench_fleet(urls, rounds))
+    finally:
+        for h in harnesses:
+            h.terminate()
+        for h in harnesses:
+            h.join()
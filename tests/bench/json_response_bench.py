@@ -0,0 +1,105 @@
+"""
+JSON encoder of the harness responses (harness.json): stdlib, orjson, msgspec (those installed)
+  - render          MessageFactory hb / status responses built and rendered, in process
+  - /hb, /status    requests/sec against one harness per encoder, CONNECTIONS keep-alive
+                    connections hammering the route for SECONDS
+
+    python tests/bench/json_response_bench.py [seconds] [connections]
+"""
+
+import asyncio
+import importlib.util
+import logging
+import sys
+import threading
+import time
+from multiprocessing import Process
+
+import httpx
+import requests
+
+from bqm.harness import Cradle, Launcher
+from bqm.harness.json_response import json_response_class
+from bqm.harness.msg_factory import MessageFactory
+
+BASE_PORT = 3400
+BACKENDS = [b for b in ("stdlib", "orjson", "msgspec") if b == "stdlib" or importlib.util.find_spec(b) is not None]
+RENDER_ROUNDS = 20000
+
+
+def job_status() -> dict:
+    return {"stage": "running", "progress": 0.42, "items": [{"id": i, "name": f"item-{i}", "score": i * 0.5} for i in range(50)]}
+
+
+class StatusJob(Cradle):
+    def run(self, *args):
+        self.set_status(job_status())
+        for i in range(8):
+            self.count(f"events_{i}")
+        threading.Event().wait()
+
+
+def harness(port: int, backend: str):
+    logging.disable(logging.CRITICAL)
+    Launcher(job=StatusJob(), config={"harness": {"interface": "127.0.0.1", "port": port, "json": backend}})
+
+
+def wait_up(url: str):
+    while True:
+        try:
+            requests.get(f"{url}/hb", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+
+
+def bench_render(backend: str):
+    MessageFactory.RESPONSE = json_response_class(backend)
+    process = {"pid": 1, "name": "job", "status": "sleeping", "cpu-pct": 0.0, "mem-rss-mb": 42.0, "threads": 3, "open-files": []}
+    hb = {"status": True, "time": "", "service": {"pid": 1, "status": "running"}, "process": process}
+    status = {"process-status": job_status(), "target-process": 1, "metrics": {f"events_{i}": i for i in range(8)}}
+    started = time.perf_counter()
+    for _ in range(RENDER_ROUNDS):
+        MessageFactory.RESPONSE(content={**hb, "time": MessageFactory.now()})
+        MessageFactory.RESPONSE(content={**status, "time": MessageFactory.now()})
+    seconds = time.perf_counter() - started
+    print(f"{backend:<8} render        {2 * RENDER_ROUNDS / seconds:>10.0f} responses/s")
+
+
+async def bench_route(backend: str, url: str, route: str, seconds: float, connections: int):
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(limits=limits) as client:
+        await client.get(f"{url}{route}")
+        calls = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal calls
+            while time.perf_counter() < deadline:
+                (await client.get(f"{url}{route}")).raise_for_status()
+                calls += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+    print(f"{backend:<8} {route:<13} {calls / elapsed:>10.0f} requests/s")
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    for backend in BACKENDS:
+        bench_render(backend)
+    for i, backend in enumerate(BACKENDS):
+        port = BASE_PORT + i
+        url = f"http://127.0.0.1:{port}"
+        h = Process(target=harness, args=(port, backend))
+        h.start()
+        try:
+            wait_up(url)
+            time.sleep(1)
+            for route in ("/hb", "/status"):
+                asyncio.run(bench_route(backend, url, route, seconds, connections))
+        finally:
+            h.terminate()
+            h.join()
@@ -0,0 +1,57 @@
+"""
+Mamba command spawning, seconds per call (ROUNDS calls each):
+  - bash+rc     bash -c "source <rc> && [activate &&] mamba|pip ...", the hook sourced per call
+  - direct      MambaRunner: the binary / the env's python -m pip called directly, -p <prefix>
+  - warm shell  MambaRunner(warm_shell=True): pip activated in the one bash session
+
+    python tests/bench/mamba_runner_bench.py [miniforge path] [env] [rounds]
+"""
+
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+
+from bqm.utils.mamba.runner import MambaRunner
+
+ROUNDS = 5
+
+
+def timed(label: str, call, rounds: int):
+    call()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        res = call()
+        assert res.returncode == 0, res.stderr
+    print(f"{label:<26} {(time.perf_counter() - started) / rounds:>8.3f} s/call")
+
+
+def bash_rc(rc_file: str, command: str) -> subprocess.CompletedProcess:
+    return subprocess.run(["bash", "-c", f"source {rc_file} && {command}"], capture_output=True, text=True)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    miniforge = sys.argv[1] if len(sys.argv) > 1 else "/opt/miniforge3"
+    env = sys.argv[2] if len(sys.argv) > 2 else "base"
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else ROUNDS
+
+    runner = MambaRunner(miniforge)
+    warm = MambaRunner(miniforge, warm_shell=True)
+    mamba = runner.binary().name
+    prefix = runner.prefix(env).as_posix()
+    with tempfile.NamedTemporaryFile("w", suffix=".rc") as rc:
+        rc.write(runner.hook_script())
+        rc.flush()
+
+        timed("bash+rc    --version", lambda: bash_rc(rc.name, f"{mamba} --version"), rounds)
+        timed("direct     --version", lambda: runner.exec(["--version"]), rounds)
+        timed("bash+rc    env list", lambda: bash_rc(rc.name, f"{mamba} env list"), rounds)
+        timed("direct     env list", lambda: runner.exec(["env", "list", "--json"]), rounds)
+        timed("bash+rc    list", lambda: bash_rc(rc.name, f"{mamba} list -n {env} --json"), rounds)
+        timed("direct     list", lambda: runner.exec(["list", "-p", prefix, "--json"]), rounds)
+        timed("bash+rc    pip list", lambda: bash_rc(rc.name, f"{mamba} activate {env} && pip list"), rounds)
+        timed("direct     pip list", lambda: runner.pip(env, ["list"]), rounds)
+        timed("warm shell pip list", lambda: warm.pip(env, ["list"]), rounds)
+    warm.close()
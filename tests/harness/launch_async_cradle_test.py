@@ -0,0 +1,52 @@
+import asyncio
+import logging
+
+from bqm.harness import AsyncCradle, Launcher
+
+logger = logging.getLogger(__name__)
+
+
+class TestJob(AsyncCradle):
+    """
+    asyncio job:
+      - run() is a coroutine on a loop managed by the harness
+      - commands are dispatched to async on_<command> handlers on the same loop
+    """
+
+    def __init__(self):
+        super().__init__(dispatch=True)
+        self._done = asyncio.Event()
+        self._ticks = 0
+
+    async def on_config(self, data):
+        await asyncio.sleep(0.1)
+        self.set_status(status={"ticks": self._ticks, "last": data})
+        return {"ticks": self._ticks}
+
+    async def on_stop(self, data):
+        logger.warning("Got STOP")
+        self._done.set()
+
+    async def tick(self):
+        while True:
+            with self.timer("tick"):
+                await asyncio.sleep(1)
+            self._ticks += 1
+
+    async def run(self, *args):
+        logger.info(" ----> user task START")
+        ticker = asyncio.create_task(self.tick())
+        await self._done.wait()
+        ticker.cancel()
+        logger.info(" <---- DONE user task")
+
+
+Launcher(
+    job=TestJob(),
+    config={
+        "harness": {
+            "interface": "0.0.0.0",
+            "port": 3000,
+        },
+    },
+)
@@ -0,0 +1,46 @@
+import logging
+import threading
+
+from bqm.harness import Cradle, Launcher
+
+logger = logging.getLogger(__name__)
+
+
+class TestJob(Cradle):
+    """
+    idle job driven purely by commands. no polling loop:
+      - commands are dispatched to on_<command> handlers on a background thread
+      - the main thread just blocks until STOP
+    """
+
+    def __init__(self):
+        super().__init__(dispatch=True)
+        self._done = threading.Event()
+        self._ticks = 0
+
+    def on_start(self, data):
+        logger.warning(f"Got START: {data}")
+
+    def on_config(self, data):
+        self._ticks += 1
+        self.set_status(status={"configs": self._ticks, "last": data})
+
+    def on_stop(self, data):
+        logger.warning("Got STOP")
+        self._done.set()
+
+    def run(self, *args):
+        logger.info(" ----> user task START")
+        self._done.wait()
+        logger.info(" <---- DONE user task")
+
+
+Launcher(
+    job=TestJob(),
+    config={
+        "harness": {
+            "interface": "0.0.0.0",
+            "port": 3000,
+        },
+    },
+)
@@ -0,0 +1,58 @@
+import logging
+import threading
+
+from bqm.harness import Cradle, Launcher
+
+logger = logging.getLogger(__name__)
+
+
+class TestJob(Cradle):
+
+    def __init__(self):
+        super().__init__(dispatch=True)
+        self._done = threading.Event()
+
+    def on_config(self, data):
+        self.set_status(status={"config": self.get_config(), "data": data})
+
+    def on_stop(self, data):
+        self._done.set()
+
+    def run(self, *args):
+        logger.info(f" ----> user task START. config: {self.get_config()}")
+        self._done.wait()
+        logger.info(" <---- DONE user task")
+
+
+def tick(self, *args):
+    self.set_status(status={"ticks": 0})
+    while True:
+        msg = self.wait_msg()
+        logger.info(f"received command: {msg}")
+
+
+# one harness, one port, three jobs:
+#   curl http://127.0.0.1:3000/hb              (all jobs)
+#   curl http://127.0.0.1:3000/jobs/job-a/hb   (a single job)
+#   curl http://127.0.0.1:3000/pause           (broadcast to all jobs)
+Launcher(
+    job={
+        "job-a": TestJob(),
+        "job-b": TestJob(),
+        "ticker": tick,
+    },
+    config={
+        "harness": {
+            "interface": "0.0.0.0",
+            "port": 3000,
+        },
+        "target-config": {
+            "a": 1,
+        },
+        "jobs": {
+            "job-b": {
+                "target-config": {"a": 2},
+            },
+        },
+    },
+)
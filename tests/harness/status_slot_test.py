@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+import signal
+
+from bqm.harness.status_slot import StatusSlot
+
+
+def torn_write(slot: StatusSlot):
+    """
+    a writer killed mid-write: seq left odd, half a payload in the slot
+    """
+    buf = slot._shm.buf
+    seq = StatusSlot.SEQ.unpack_from(buf, 0)[0]
+    StatusSlot.SEQ.pack_into(buf, 0, seq + 1)
+    buf[StatusSlot.HEADER.size : StatusSlot.HEADER.size + 5] = b'{"tor'
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def write(slot: StatusSlot, status: dict):
+    slot.write(status)
+
+
+if __name__ == "__main__":
+    slot = StatusSlot(size=1024)
+    try:
+        slot.write({"n": 1})
+        assert slot.read() == {"n": 1}
+
+        p = multiprocessing.Process(target=torn_write, args=(slot,))
+        p.start()
+        p.join()
+        assert p.exitcode == -signal.SIGKILL
+        # the interrupted write never completed: still the last good value
+        assert slot.read() == {"n": 1}
+
+        for n in range(2, 5):
+            p = multiprocessing.Process(target=write, args=(slot, {"n": n}))
+            p.start()
+            p.join()
+            assert slot.read() == {"n": n}, slot.read()
+            assert StatusSlot.SEQ.unpack_from(slot._shm.buf, 0)[0] % 2 == 0
+
+        print("status slot OK after an interrupted write")
+    finally:
+        slot.close()